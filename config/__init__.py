@@ -1,6 +1,18 @@
 """
 配置模块
 """
-from .prompts import get_batch_prompt, BATCH_EVALUATION_PROMPT
+from .prompts import (
+    get_batch_prompt, get_single_prompt, get_problem_major_prompt, get_packed_prompt,
+    get_delta_prompt, format_scoring_rubric,
+    SCORING_RUBRIC,
+    BATCH_EVALUATION_PROMPT, SINGLE_EVALUATION_PROMPT, PROBLEM_MAJOR_EVALUATION_PROMPT,
+    PACKED_EVALUATION_PROMPT, DELTA_EVALUATION_PROMPT
+)
 
-__all__ = ['get_batch_prompt', 'BATCH_EVALUATION_PROMPT']
+__all__ = [
+    'get_batch_prompt', 'get_single_prompt', 'get_problem_major_prompt', 'get_packed_prompt',
+    'get_delta_prompt', 'format_scoring_rubric',
+    'SCORING_RUBRIC',
+    'BATCH_EVALUATION_PROMPT', 'SINGLE_EVALUATION_PROMPT', 'PROBLEM_MAJOR_EVALUATION_PROMPT',
+    'PACKED_EVALUATION_PROMPT', 'DELTA_EVALUATION_PROMPT'
+]
@@ -1,5 +1,13 @@
 # 评价提示词配置
 
+# 评分标准（各项及分值，所有评价提示词共用）
+SCORING_RUBRIC = (
+    ('正确性', 50),
+    ('代码规范', 20),
+    ('程序效率', 15),
+    ('代码可读性', 15),
+)
+
 # 批量评价提示词（一次性评价一个学生的所有题目）
 BATCH_EVALUATION_PROMPT = """
 你是一位经验丰富的C++编程教师。请对以下学生的所有C++作业代码进行批量评价。
@@ -13,10 +21,7 @@ BATCH_EVALUATION_PROMPT = """
 评价要求：
 1. 逐题评价，每道题单独给出评价和分数
 2. 评分标准（每题总分100）：
-   - 正确性：50分
-   - 代码规范：20分
-   - 程序效率：15分
-   - 代码可读性：15分
+{scoring_rubric}
 3. 每道题评价包括：优点、需要改进的地方
 4. **重要**：对于需要改进的地方，必须基于学生提交的代码给出具体的改进示范代码
 5. **重要**：每道题之间必须用 === 分隔
@@ -49,6 +54,257 @@ BATCH_EVALUATION_PROMPT = """
 ...（依此类推）
 """
 
+# 单题评价提示词（用于补充评价解析失败的题目）
+SINGLE_EVALUATION_PROMPT = """
+你是一位经验丰富的C++编程教师。请对以下学生的一道C++作业题目进行评价。
+
+学生信息：
+- 姓名：{student_name}
+- 学号：{student_id}
+- 作业周次：第{week}周
+- 题目：{problem_name}
+
+评价要求：
+1. 评分标准（总分100）：
+{scoring_rubric}
+2. 评价包括：优点、需要改进的地方
+3. **重要**：对于需要改进的地方，必须基于学生提交的代码给出具体的改进示范代码
+
+以下是该题目的代码：
+
+文件名: {file_name}
+
+{code_block}
+{facts}
+请按以下格式输出评价：
+
+### {problem_name}
+**分数**: XX/100
+
+**优点**:
+-
+
+**需要改进**:
+-
+
+**改进示范**:
+```cpp
+// 针对上述问题的改进代码
+```
+"""
+
+# 按题目跨学生批量评价提示词（一次评价多名学生提交的同一道题）
+PROBLEM_MAJOR_EVALUATION_PROMPT = """
+你是一位经验丰富的C++编程教师。请对以下{num_students}名学生提交的同一道C++作业题目分别进行评价。
+
+作业信息：
+- 作业周次：第{week}周
+- 题目：{problem_name}
+- 学生数量：{num_students}名
+
+评价要求：
+1. 逐个学生评价，每名学生单独给出评价和分数，学生之间互不影响
+2. 评分标准（每名学生总分100）：
+{scoring_rubric}
+3. 每名学生的评价包括：优点、需要改进的地方
+4. **重要**：对于需要改进的地方，必须基于该学生提交的代码给出具体的改进示范代码
+5. **重要**：每名学生的评价必须以 "### 学生N:" 开头，学生之间必须用 === 分隔
+
+以下是各学生提交的代码：
+
+{all_codes}
+
+请按以下格式输出评价（每名学生之间用===分隔）：
+
+### 学生1: [学号 姓名]
+**分数**: XX/100
+
+**优点**:
+-
+
+**需要改进**:
+-
+
+**改进示范**:
+```cpp
+// 针对上述问题的改进代码
+```
+
+===
+
+### 学生2: [学号 姓名]
+**分数**: XX/100
+
+...（依此类推）
+"""
+
+# 多学生合并评价提示词（将多名题目较少的学生合并为一次请求）
+PACKED_EVALUATION_PROMPT = """
+你是一位经验丰富的C++编程教师。请对以下{num_students}名学生的C++作业代码分别进行评价。
+
+作业信息：
+- 作业周次：第{week}周
+- 学生数量：{num_students}名
+
+评价要求：
+1. 逐个学生、逐题评价，每道题单独给出评价和分数，学生之间互不影响
+2. 评分标准（每题总分100）：
+{scoring_rubric}
+3. 每道题评价包括：优点、需要改进的地方
+4. **重要**：对于需要改进的地方，必须基于学生提交的代码给出具体的改进示范代码
+5. **重要**：每名学生的评价必须以 "## 学生N:" 单独一行开头，该学生的每道题之间必须用 === 分隔
+
+以下是各学生的题目代码：
+
+{all_codes}
+
+请按以下格式输出评价：
+
+## 学生1: [学号 姓名]
+
+### 题目1: [题目名称]
+**分数**: XX/100
+
+**优点**:
+-
+
+**需要改进**:
+-
+
+**改进示范**:
+```cpp
+// 针对上述问题的改进代码
+```
+
+===
+
+### 题目2: [题目名称]
+**分数**: XX/100
+
+...
+
+## 学生2: [学号 姓名]
+
+### 题目1: [题目名称]
+...（依此类推）
+"""
+
+# 近似重复代码的差异评价提示词（参考代表代码的评价，只分析差异部分）
+DELTA_EVALUATION_PROMPT = """
+你是一位经验丰富的C++编程教师。以下学生的代码与另一份已经评价过的代码高度相似，
+请参考已有评价，重点分析两份代码的差异，给出该学生这道题的完整评价。
+
+学生信息：
+- 姓名：{student_name}
+- 学号：{student_id}
+- 作业周次：第{week}周
+- 题目：{problem_name}
+
+评分标准（总分100）：
+{scoring_rubric}
+
+参考代码的已有评价：
+
+{reference_evaluation}
+
+该学生代码相对参考代码的差异（unified diff，- 为参考代码，+ 为该学生代码）：
+
+```diff
+{diff}
+```
+{facts}
+要求：
+1. 差异不影响评价的方面可以沿用已有评价，差异带来的变化必须在评价和分数中体现
+2. **重要**：改进示范必须基于该学生自己的代码
+
+请按以下格式输出评价：
+
+### {problem_name}
+**分数**: XX/100
+
+**优点**:
+-
+
+**需要改进**:
+-
+
+**改进示范**:
+```cpp
+// 针对上述问题的改进代码
+```
+"""
+
+# 自适应详略要求（附加在提示词末尾）：先给出分数和一句话总评，只有低于阈值的题目才输出改进示范代码
+ADAPTIVE_VERBOSITY_NOTE = """
+**输出详略要求（优先于上面的要求）**：
+1. 每道题先给出"**分数**"，紧接着用一句话给出"**总评**"，然后再写其他内容
+2. 分数低于 {threshold} 分的题目按上面的格式完整评价，包括"**改进示范**"代码
+3. 分数不低于 {threshold} 分的题目省略"**改进示范**"部分，"**优点**"和"**需要改进**"各不超过两条，保持简短
+4. 题目之间的分隔方式和标题格式保持不变
+"""
+
+
+def get_adaptive_verbosity_note(threshold):
+    """
+    获取自适应详略要求
+
+    Args:
+        threshold: 低于该分数的题目才需要改进示范代码
+
+    Returns:
+        附加在提示词末尾的要求
+    """
+    return ADAPTIVE_VERBOSITY_NOTE.format(threshold=threshold)
+
+
+def format_scoring_rubric(indent=""):
+    """
+    将评分标准格式化为列表
+
+    Args:
+        indent: 每行的缩进（嵌套在编号列表中时使用）
+
+    Returns:
+        格式化后的评分标准
+    """
+    return "\n".join(f"{indent}- {name}：{points}分" for name, points in SCORING_RUBRIC)
+
+
+def format_problem_code(problem):
+    """
+    生成题目的代码部分：与参考答案高度相似时只给出差异，否则给出完整代码
+
+    Args:
+        problem: 题目信息，'prompt_diff' 为与参考答案的差异（可选）
+
+    Returns:
+        格式化后的代码块
+    """
+    diff = problem.get('prompt_diff')
+    if diff:
+        return ("（该代码与参考答案高度相似，以下只给出差异及上下文：- 为参考答案，+ 为学生代码，"
+                f"未列出的部分与参考答案相同）\n\n```diff\n{diff}\n```")
+    code = problem.get('prompt_code', problem.get('code', ''))
+    return f"```cpp\n{code}\n```"
+
+
+def format_problem_facts(problem):
+    """
+    生成题目的客观信息（本地编译测试结果等），附在代码之后
+
+    Args:
+        problem: 题目信息，'facts' 为客观信息列表（可选，如编译测试结果、代码统计指标）
+
+    Returns:
+        格式化后的文本，没有客观信息时返回空字符串
+    """
+    facts = problem.get('facts')
+    if not facts:
+        return ""
+    lines = "\n".join(f"- {fact}" for fact in facts)
+    return f"\n**客观信息**（本地编译运行或静态统计得到，评分时以此为准，评价中无需再推测或复述这些内容）:\n{lines}\n"
+
+
 def get_batch_prompt(student_name, student_id, all_problems, week="02"):
     """
     获取批量评价提示词（一次评价所有题目）
@@ -61,7 +317,10 @@ def get_batch_prompt(student_name, student_id, all_problems, week="02"):
                 {
                     'problem_name': '第1关-求三位数',
                     'file_name': 'main.cpp',
-                    'code': '代码内容...'
+                    'code': '代码内容...',
+                    'prompt_code': '压缩后的代码...',  # 可选，存在时优先使用
+                    'facts': ['编译通过，测试用例通过 3/5'],  # 可选，本地得到的客观信息
+                    'prompt_diff': '与参考答案的差异...'  # 可选，存在时代替完整代码
                 },
                 ...
             ]
@@ -75,16 +334,13 @@ def get_batch_prompt(student_name, student_id, all_problems, week="02"):
     for idx, problem in enumerate(all_problems, 1):
         problem_name = problem.get('problem_name', f'题目{idx}')
         file_name = problem.get('file_name', 'main.cpp')
-        code = problem.get('code', '')
 
         codes_text += f"""
 ### 题目{idx}: {problem_name}
 文件名: {file_name}
 
-```cpp
-{code}
-```
-
+{format_problem_code(problem)}
+{format_problem_facts(problem)}
 """
         
     # 选择提示词模板
@@ -92,6 +348,7 @@ def get_batch_prompt(student_name, student_id, all_problems, week="02"):
 
     # 格式化提示词
     return template.format(
+        scoring_rubric=format_scoring_rubric("   "),
         student_name=student_name,
         student_id=student_id or '无',
         week=week,
@@ -99,3 +356,143 @@ def get_batch_prompt(student_name, student_id, all_problems, week="02"):
         all_codes=codes_text
     )
 
+
+def get_single_prompt(student_name, student_id, problem, week="02"):
+    """
+    获取单题评价提示词（只包含一道题的代码和评分标准）
+
+    Args:
+        student_name: 学生姓名
+        student_id: 学号
+        problem: 题目信息，格式同 get_batch_prompt 中 all_problems 的元素
+        week: 周次
+
+    Returns:
+        格式化后的提示词
+    """
+    return SINGLE_EVALUATION_PROMPT.format(
+        scoring_rubric=format_scoring_rubric("   "),
+        student_name=student_name,
+        student_id=student_id or '无',
+        week=week,
+        problem_name=problem.get('problem_name', '未知题目'),
+        file_name=problem.get('file_name', 'main.cpp'),
+        code_block=format_problem_code(problem),
+        facts=format_problem_facts(problem)
+    )
+
+
+def get_problem_major_prompt(problem_name, submissions, week="02"):
+    """
+    获取按题目跨学生批量评价的提示词（一次评价多名学生的同一道题）
+
+    Args:
+        problem_name: 题目名称
+        submissions: 各学生对该题的提交列表
+            [
+                {
+                    'student_name': '张三',
+                    'student_id': '2024001',
+                    'file_name': 'main.cpp',
+                    'code': '代码内容...',
+                    'prompt_code': '压缩后的代码...'  # 可选，存在时优先使用
+                },
+                ...
+            ]
+        week: 周次
+
+    Returns:
+        格式化后的提示词
+    """
+    codes_text = ""
+    for idx, submission in enumerate(submissions, 1):
+        student_label = f"{submission.get('student_id') or '无'} {submission.get('student_name', '')}".strip()
+        file_name = submission.get('file_name', 'main.cpp')
+
+        codes_text += f"""
+### 学生{idx}: {student_label}
+文件名: {file_name}
+
+{format_problem_code(submission)}
+{format_problem_facts(submission)}
+"""
+
+    return PROBLEM_MAJOR_EVALUATION_PROMPT.format(
+        scoring_rubric=format_scoring_rubric("   "),
+        week=week,
+        problem_name=problem_name,
+        num_students=len(submissions),
+        all_codes=codes_text
+    )
+
+
+def get_packed_prompt(students, week="02"):
+    """
+    获取多学生合并评价提示词（一次请求评价多名学生的所有题目）
+
+    Args:
+        students: 学生列表
+            [
+                {
+                    'student_name': '张三',
+                    'student_id': '2024001',
+                    'all_problems': [...]  # 格式同 get_batch_prompt 的 all_problems
+                },
+                ...
+            ]
+        week: 周次
+
+    Returns:
+        格式化后的提示词
+    """
+    codes_text = ""
+    for student_idx, student in enumerate(students, 1):
+        student_label = f"{student.get('student_id') or '无'} {student.get('student_name', '')}".strip()
+        codes_text += f"""
+## 学生{student_idx}: {student_label}
+"""
+        for idx, problem in enumerate(student.get('all_problems', []), 1):
+            problem_name = problem.get('problem_name', f'题目{idx}')
+            file_name = problem.get('file_name', 'main.cpp')
+
+            codes_text += f"""
+### 题目{idx}: {problem_name}
+文件名: {file_name}
+
+{format_problem_code(problem)}
+{format_problem_facts(problem)}
+"""
+
+    return PACKED_EVALUATION_PROMPT.format(
+        scoring_rubric=format_scoring_rubric("   "),
+        week=week,
+        num_students=len(students),
+        all_codes=codes_text
+    )
+
+
+def get_delta_prompt(student_name, student_id, problem, reference_evaluation, diff, week="02"):
+    """
+    获取近似重复代码的差异评价提示词
+
+    Args:
+        student_name: 学生姓名
+        student_id: 学号
+        problem: 题目信息，格式同 get_batch_prompt 中 all_problems 的元素
+        reference_evaluation: 代表代码的已有评价
+        diff: 代表代码与该学生代码的差异（unified diff）
+        week: 周次
+
+    Returns:
+        格式化后的提示词
+    """
+    return DELTA_EVALUATION_PROMPT.format(
+        scoring_rubric=format_scoring_rubric(),
+        student_name=student_name,
+        student_id=student_id or '无',
+        week=week,
+        problem_name=problem.get('problem_name', '未知题目'),
+        reference_evaluation=reference_evaluation,
+        diff=diff or '（无差异）',
+        facts=format_problem_facts(problem)
+    )
@@ -0,0 +1,198 @@
+"""
+代码压缩模块
+在生成提示词之前精简学生代码，减少token消耗和API延迟
+（仅用于提示词，PDF报告中仍展示原始代码）
+"""
+import re
+from typing import List, Optional
+
+
+# 看起来像代码的注释行（被注释掉的代码），用于识别"死注释"
+# 只看关键字不够（"if the input is negative" 是说明），必须带有代码语法
+_DEAD_CODE_PATTERN = re.compile(
+    r'(;\s*$'                                   # 以分号结尾（包括 return x;）
+    r'|[{}]'                                    # 花括号
+    r'|^\s*#\s*(include|define)\b'              # 预处理指令
+    r'|\b(cout\s*<<|cin\s*>>|(printf|scanf)\s*\()'  # 输入输出语句
+    r'|^\s*(if|for|while|switch)\s*\(.*\)\s*($|[{;]|\w.*;)'  # 带括号条件的控制语句
+    r'|^\s*(int|long|double|float|char|bool|string|void|auto)\s+\w+\s*(=|;|\[|\(.*\)))'  # 变量/函数声明
+)
+
+# 在线评测平台模板中反复出现的样板行（如头歌的 Begin/End 标记）
+DEFAULT_BOILERPLATE_PATTERNS = [
+    r'^\s*/\*+\s*(Begin|End)\s*\*+/\s*$',
+    r'^\s*//\s*[-*=\s]*(Begin|End)[-*=\s]*$',
+    r'^\s*/\*+\s*请在(此|这里|下面).*\*+/\s*$',
+    r'^\s*//\s*请在(此|这里|下面).*$',
+]
+
+
+def split_comments(code: str):
+    """
+    将代码切分为代码段和注释段（正确跳过字符串和字符字面量）
+
+    Args:
+        code: 代码
+
+    Yields:
+        (kind, text)，kind 为 code、line_comment 或 block_comment
+    """
+    n = len(code)
+    i = 0
+    start = 0
+    while i < n:
+        ch = code[i]
+        if ch == '"' or ch == "'":
+            # 跳过字面量
+            i += 1
+            while i < n and code[i] != ch and code[i] != '\n':
+                i += 2 if code[i] == '\\' else 1
+            i += 1
+        elif ch == '/' and i + 1 < n and code[i + 1] in '/*':
+            if i > start:
+                yield 'code', code[start:i]
+            if code[i + 1] == '/':
+                end = code.find('\n', i)
+                end = n if end == -1 else end
+                yield 'line_comment', code[i:end]
+            else:
+                end = code.find('*/', i + 2)
+                end = n if end == -1 else end + 2
+                yield 'block_comment', code[i:end]
+            i = start = end
+        else:
+            i += 1
+    if start < n:
+        yield 'code', code[start:]
+
+
+class CodeCompactor:
+    """代码压缩器"""
+
+    def __init__(
+        self,
+        strip_dead_comments: bool = True,
+        collapse_whitespace: bool = True,
+        max_lines: int = 0,
+        max_chars: int = 0,
+        boilerplate_patterns: Optional[List[str]] = None
+    ):
+        """
+        初始化压缩器
+
+        Args:
+            strip_dead_comments: 是否删除被注释掉的代码和模板样板注释（说明性注释会保留，用于评价可读性）
+            collapse_whitespace: 是否去除行尾空白并合并连续空行
+            max_lines: 每个文件最多保留的行数，0表示不限制（默认不截断，截断会让模型看不到后面的代码）
+            max_chars: 每个文件最多保留的字符数，0表示不限制
+            boilerplate_patterns: 需要删除的样板行正则列表，默认使用 DEFAULT_BOILERPLATE_PATTERNS
+        """
+        self.strip_dead_comments = strip_dead_comments
+        self.collapse_whitespace = collapse_whitespace
+        self.max_lines = max_lines
+        self.max_chars = max_chars
+
+        patterns = DEFAULT_BOILERPLATE_PATTERNS if boilerplate_patterns is None else boilerplate_patterns
+        self.boilerplate_patterns = [re.compile(p, re.IGNORECASE) for p in patterns]
+
+    def compact(self, code: str) -> str:
+        """
+        压缩一个文件的代码
+
+        Args:
+            code: 原始代码
+
+        Returns:
+            压缩后的代码
+        """
+        if not code:
+            return code
+
+        code = code.replace('\r\n', '\n').replace('\r', '\n')
+
+        if self.strip_dead_comments:
+            code = self._remove_boilerplate(code)
+            code = self._remove_dead_comments(code)
+
+        if self.collapse_whitespace:
+            code = self._collapse_whitespace(code)
+
+        return self._truncate(code)
+
+    def _remove_boilerplate(self, code: str) -> str:
+        """删除模板样板行"""
+        lines = code.split('\n')
+        kept = [line for line in lines
+                if not any(p.match(line) for p in self.boilerplate_patterns)]
+        return '\n'.join(kept)
+
+    def _remove_dead_comments(self, code: str) -> str:
+        """删除内容看起来像代码的注释，保留说明性注释"""
+        result = []
+        for kind, text in split_comments(code):
+            if kind == 'code' or not self._is_dead_comment(kind, text):
+                result.append(text)
+            elif kind == 'block_comment':
+                # 保留换行，避免相邻两行代码被拼接
+                result.append('\n' * text.count('\n'))
+        return ''.join(result)
+
+    def _is_dead_comment(self, kind: str, text: str) -> bool:
+        """
+        判断注释是否为被注释掉的代码
+
+        Args:
+            kind: line_comment 或 block_comment
+            text: 注释全文（包含注释符号）
+
+        Returns:
+            是否为死注释
+        """
+        if kind == 'line_comment':
+            body = text[2:]
+            return bool(_DEAD_CODE_PATTERN.search(body))
+
+        body = text[2:-2] if text.endswith('*/') else text[2:]
+        lines = [line.strip().lstrip('*') for line in body.split('\n')]
+        lines = [line for line in lines if line.strip()]
+        if not lines:
+            return True
+        code_like = sum(1 for line in lines if _DEAD_CODE_PATTERN.search(line))
+        return code_like * 2 > len(lines)
+
+    @staticmethod
+    def _collapse_whitespace(code: str) -> str:
+        """去除行尾空白，合并连续空行，去掉首尾空行"""
+        lines = []
+        for line in code.split('\n'):
+            line = line.rstrip()
+            if not line and (not lines or not lines[-1]):
+                continue
+            lines.append(line)
+        while lines and not lines[-1]:
+            lines.pop()
+        return '\n'.join(lines)
+
+    def _truncate(self, code: str) -> str:
+        """按行数和字符数截断过长的代码，并添加可见的截断标记"""
+        lines = code.split('\n')
+        total_lines = len(lines)
+        truncated = False
+
+        if self.max_lines and len(lines) > self.max_lines:
+            lines = lines[:self.max_lines]
+            truncated = True
+
+        if self.max_chars:
+            length = 0
+            for idx, line in enumerate(lines):
+                length += len(line) + 1
+                if length > self.max_chars:
+                    lines = lines[:idx] if idx else [line[:self.max_chars]]
+                    truncated = True
+                    break
+
+        if truncated:
+            lines.append(f"// ……（代码过长，已省略后 {total_lines - len(lines)} 行，共 {total_lines} 行）……")
+
+        return '\n'.join(lines)
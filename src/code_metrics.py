@@ -0,0 +1,195 @@
+"""
+代码静态指标模块
+在本地统计可以机械测量的代码指标（有效行数、函数数、嵌套深度、圈复杂度、命名、魔法数字等），
+作为简短的客观信息提供给模型，模型无需再用大段文字描述这些方面
+"""
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+from triage import strip_comments
+
+
+# 文件数少于该值时直接在当前进程计算（进程池启动开销大于计算本身）
+MIN_FILES_FOR_POOL = 32
+
+# 指标说明（汇总表格的列和提示词中的描述）
+METRIC_LABELS = {
+    'loc': '有效代码行数',
+    'functions': '函数数',
+    'max_nesting': '最大嵌套深度',
+    'complexity': '最大圈复杂度',
+    'magic_numbers': '魔法数字',
+    'naming_violations': '命名不规范',
+    'using_namespace_std': 'using namespace std',
+}
+
+# 判定分支（圈复杂度）
+_DECISION_PATTERN = re.compile(r'\b(if|for|while|case|catch)\b|&&|\|\||\?')
+
+# 不是函数体的花括号前缀
+_CONTROL_KEYWORDS = {'if', 'for', 'while', 'switch', 'catch', 'do', 'else', 'try'}
+
+# 函数头：以 ) 结尾（允许 const/noexcept/override 等修饰），前面是函数名
+_FUNCTION_HEADER_PATTERN = re.compile(
+    r'(\w+)\s*\([^;{}]*\)\s*(?:const|noexcept|override|final|\s)*(?::[^;{}]*)?$'
+)
+
+# 变量声明中的名称（基本类型和常见的标准库类型）
+_DECLARATION_PATTERN = re.compile(
+    r'\b(?:int|long|short|unsigned|float|double|char|bool|string|auto|size_t|vector<[^;(){}]*>)\s*[&*]?\s+'
+    r'([A-Za-z_]\w*)\s*(?=[=;,\[)(])'
+)
+
+# 数字字面量
+_NUMBER_PATTERN = re.compile(r'(?<![\w.])(\d+\.?\d*(?:[eE][+-]?\d+)?)[uUlLfF]*(?![\w.])')
+
+# 不视为魔法数字的常见数值
+_ALLOWED_NUMBERS = {'0', '1', '2', '10', '100', '0.0', '1.0', '2.0', '0.5'}
+
+
+def _function_spans(code: str) -> List[tuple]:
+    """
+    找出所有函数体的范围
+
+    Returns:
+        [(函数名, 函数体开始的'{'下标, 对应'}'下标, 函数体开始时的花括号深度), ...]
+    """
+    spans = []
+    stack = []          # 每个未闭合的'{'：(下标, 是否为函数体, 函数名)
+    segment_start = 0   # 当前语句（花括号前的头部）开始的位置
+    in_function = 0
+
+    for pos, char in enumerate(code):
+        if char == '{':
+            header = code[segment_start:pos].strip()
+            match = _FUNCTION_HEADER_PATTERN.search(header)
+            is_function = (
+                not in_function and match is not None and match.group(1) not in _CONTROL_KEYWORDS
+                and not re.match(r'^(struct|class|namespace|enum|union)\b', header)
+            )
+            stack.append((pos, is_function, match.group(1) if is_function else ''))
+            if is_function:
+                in_function += 1
+            segment_start = pos + 1
+        elif char == '}':
+            if stack:
+                start, is_function, name = stack.pop()
+                if is_function:
+                    in_function -= 1
+                    spans.append((name, start, pos, len(stack)))
+            segment_start = pos + 1
+        elif char == ';':
+            segment_start = pos + 1
+
+    return spans
+
+
+def _max_nesting(body: str) -> int:
+    """函数体内花括号的最大嵌套深度（函数体本身为0）"""
+    depth = deepest = 0
+    for char in body:
+        if char == '{':
+            depth += 1
+            deepest = max(deepest, depth)
+        elif char == '}':
+            depth -= 1
+    return deepest
+
+
+def _naming_violations(code: str) -> int:
+    """
+    统计不符合命名规范的变量名和函数名：
+    大小写与下划线混用（如 My_value）、以大写字母开头（大写开头通常留给类型，全大写的常量除外）
+    """
+    violations = 0
+    for name in set(_DECLARATION_PATTERN.findall(code)):
+        if name.isupper():
+            continue  # 全大写视为常量
+        if '_' in name.strip('_') and any(c.isupper() for c in name):
+            violations += 1
+        elif name[0].isupper():
+            violations += 1
+    return violations
+
+
+def _magic_numbers(code: str) -> int:
+    """统计常量定义以外出现的魔法数字"""
+    count = 0
+    for line in code.split('\n'):
+        stripped = line.strip()
+        if stripped.startswith('#') or re.search(r'\b(const|constexpr)\b', stripped):
+            continue
+        count += sum(1 for number in _NUMBER_PATTERN.findall(stripped) if number not in _ALLOWED_NUMBERS)
+    return count
+
+
+def compute_metrics(code: str) -> Dict:
+    """
+    计算一份代码的静态指标
+
+    Args:
+        code: 原始代码
+
+    Returns:
+        {'loc', 'functions', 'max_nesting', 'complexity', 'magic_numbers', 'naming_violations', 'using_namespace_std'}
+    """
+    code = strip_comments((code or '').replace('\r\n', '\n').replace('\r', '\n'))
+    spans = _function_spans(code)
+
+    complexity = 1
+    nesting = 0
+    for _, start, end, _ in spans:
+        body = code[start + 1:end]
+        complexity = max(complexity, 1 + len(_DECISION_PATTERN.findall(body)))
+        nesting = max(nesting, _max_nesting(body))
+
+    return {
+        'loc': sum(1 for line in code.split('\n') if line.strip() and line.strip() not in ('{', '}')),
+        'functions': len(spans),
+        'max_nesting': nesting,
+        'complexity': complexity,
+        'magic_numbers': _magic_numbers(code),
+        'naming_violations': _naming_violations(code),
+        'using_namespace_std': bool(re.search(r'\busing\s+namespace\s+std\s*;', code)),
+    }
+
+
+def compute_all(codes: List[str], workers: Optional[int] = None) -> List[Dict]:
+    """
+    计算多份代码的静态指标（文件较多时使用进程池）
+
+    Args:
+        codes: 代码列表
+        workers: 进程数，None时使用CPU核数
+
+    Returns:
+        与codes一一对应的指标
+    """
+    if len(codes) < MIN_FILES_FOR_POOL:
+        return [compute_metrics(code) for code in codes]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(compute_metrics, codes, chunksize=16))
+
+
+def format_metrics_summary(metrics: Dict) -> str:
+    """
+    生成提示词中使用的一行指标摘要
+
+    Args:
+        metrics: compute_metrics 的返回值
+
+    Returns:
+        如 "代码统计: 有效代码 23 行，2 个函数，最大嵌套深度 3，最大圈复杂度 5，魔法数字 2 个，命名不规范 1 处，使用了 using namespace std"
+    """
+    parts = [
+        f"有效代码 {metrics['loc']} 行",
+        f"{metrics['functions']} 个函数",
+        f"最大嵌套深度 {metrics['max_nesting']}",
+        f"最大圈复杂度 {metrics['complexity']}",
+        f"魔法数字 {metrics['magic_numbers']} 个",
+        f"命名不规范 {metrics['naming_violations']} 处",
+    ]
+    if metrics['using_namespace_std']:
+        parts.append("使用了 using namespace std")
+    return "代码统计: " + "，".join(parts)
@@ -0,0 +1,159 @@
+"""
+重复提交去重模块
+对每道题的代码计算规范化哈希，相同的代码只调用一次API，评价结果复用给所有重复提交
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+
+
+# 字符串和字符字面量（其中的空白是程序行为的一部分，规范化时原样保留）
+_LITERAL_PATTERN = re.compile(r'"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'')
+
+# 规范化期间代替字面量的占位符
+_PLACEHOLDER_PATTERN = re.compile(r'\x00(\d+)\x00')
+
+
+def normalize_code(code: str) -> str:
+    """
+    规范化代码：统一换行符，合并空白，并去掉标点两侧的空白
+    （只有空白差异的两份代码规范化后完全相同；字符串和字符字面量原样保留，
+    如 printf("%d %d") 与 printf("%d%d") 规范化后仍然不同）
+
+    Args:
+        code: 原始代码
+
+    Returns:
+        规范化后的代码
+    """
+    code = (code or '').replace('\r\n', '\n').replace('\r', '\n')
+    literals = []
+
+    def _hold(match):
+        literals.append(match.group(0))
+        return f"\x00{len(literals) - 1}\x00"
+
+    code = _LITERAL_PATTERN.sub(_hold, code)
+    code = re.sub(r'\s+', ' ', code).strip()
+    code = re.sub(r' ?([^\w\s]) ?', r'\1', code)
+    return _PLACEHOLDER_PATTERN.sub(lambda m: literals[int(m.group(1))], code)
+
+
+def code_hash(problem_name: str, code: str) -> str:
+    """
+    计算(题目, 代码)的规范化内容哈希
+
+    Args:
+        problem_name: 题目名称
+        code: 原始代码
+
+    Returns:
+        十六进制哈希字符串
+    """
+    content = f"{problem_name}\0{normalize_code(code)}"
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+
+def evaluation_fingerprint(*parts: str) -> str:
+    """
+    计算评价条件的指纹（模型、提示词模板等任一部分变化时指纹都会变化）
+
+    Args:
+        parts: 决定评价结果的各项条件
+
+    Returns:
+        十六进制指纹（前12位）
+    """
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update(str(part).encode('utf-8') + b'\0')
+    return digest.hexdigest()[:12]
+
+
+class DedupIndex:
+    """去重索引（按周次持久化到输出目录，后续运行可继续复用）"""
+
+    def __init__(self, output_dir: str = "./output", week: str = "02", fingerprint: str = ""):
+        """
+        初始化去重索引，并加载输出目录中本周已有的索引
+
+        条目按评价条件的指纹区分：更换模型或修改提示词后，旧条件下的评价不会被复用。
+
+        Args:
+            output_dir: 输出目录
+            week: 周次
+            fingerprint: 评价条件的指纹（见 evaluation_fingerprint）
+        """
+        self.index_path = os.path.join(output_dir, f"第{week}周_去重索引.json")
+        self.fingerprint = fingerprint
+        self.entries: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f)
+                print(f"✓ 已加载去重索引: {self.index_path} ({len(self.entries)} 条)")
+            except (OSError, ValueError) as e:
+                print(f"⚠ 去重索引加载失败，将重新建立: {str(e)}")
+                self.entries = {}
+
+    def _key(self, problem_name: str, code: str) -> str:
+        """索引键：评价条件指纹 + 代码的规范化哈希"""
+        return f"{self.fingerprint}:{code_hash(problem_name, code)}"
+
+    def lookup(self, problem_name: str, code: str) -> Optional[Dict]:
+        """
+        查找相同代码的已有评价
+
+        Args:
+            problem_name: 题目名称
+            code: 原始代码
+
+        Returns:
+            已有的索引条目 {'evaluation', 'score', 'source', ...}，不存在时返回None
+        """
+        with self._lock:
+            return self.entries.get(self._key(problem_name, code))
+
+    def record(self, problem_name: str, code: str, evaluation_data: Dict, source: str, replace: bool = False):
+        """
+        记录一份代码的评价结果（已存在时保留最早的记录）
+
+        Args:
+            problem_name: 题目名称
+            code: 原始代码
+            evaluation_data: 评价数据 {'evaluation': ..., 'score': ...}
+            source: 首次提交该代码的学生（学号 姓名）
+            replace: 是否替换已有的记录（重新评价时使用新的评价）
+        """
+        key = self._key(problem_name, code)
+        entry = {
+            'problem_name': problem_name,
+            'evaluation': evaluation_data['evaluation'],
+            'score': evaluation_data['score'],
+            'source': source,
+            'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        }
+        with self._lock:
+            if replace:
+                self.entries[key] = entry
+            else:
+                self.entries.setdefault(key, entry)
+
+    def save(self) -> str:
+        """
+        保存索引到输出目录
+
+        Returns:
+            索引文件路径
+        """
+        with self._lock:
+            with open(self.index_path, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f, ensure_ascii=False, indent=2)
+        print(f"✓ 已保存去重索引: {self.index_path} ({len(self.entries)} 条)")
+        return self.index_path
@@ -0,0 +1,410 @@
+"""
+评价结果解析模块
+使用预编译的正则对模型回复做一次线性扫描，同时识别题目标题、分数行、=== 分隔符和代码块，
+再在扫描结果上选择分割方式，避免对整段回复反复执行多种分割策略和逐条正则搜索
+（回复很长时，例如100KB的推理模型输出，解析耗时仍保持线性）
+"""
+import re
+from typing import Dict, List, Optional, Tuple
+
+
+# 分隔符行：=== 单独成行
+_SEPARATOR_PATTERN = re.compile(r'^\s*={3,}\s*$')
+
+# 代码块围栏
+_FENCE_PATTERN = re.compile(r'^\s*(```|~~~)')
+
+# 代码块未闭合时（如回复被截断），遇到 Markdown 题目标题即视为代码块结束
+_CODE_ESCAPE_PATTERN = re.compile(r'^\s*#{2,6}\s*(?:题目\s*\d+|第\s*\d+\s*[关题])')
+
+# 题目标题行：### 题目1: ...、【题目1: ...】、第1关: ...、**第2题**：...
+_HEADER_PATTERN = re.compile(
+    r'^\s*(?P<mark>#{1,6}|【|\*\*)?\s*'
+    r'(?:题目\s*(?P<number>\d+)|第\s*(?P<ordinal>\d+)\s*[关题])'
+    r'(?P<rest>.*)$'
+)
+
+# 没有标题标记（#、【、**）的行，需要在题号后出现冒号或】才视为标题，避免误判正文
+_HEADER_END_PATTERN = re.compile(r'[:：】]')
+
+# 分数：带标签的分数（分数/得分/评分/总分/score）、N/100、N分
+_SCORE_PATTERN = re.compile(
+    r'(?:\*\*)?(?P<label>分数|得分|评分|总分|score)(?:\*\*)?\s*[:：]\s*(?:\*\*)?\s*'
+    r'(?P<labeled>\d+)(?P<out_of>\s*/\s*100)?'
+    r'|(?<!\d)(?P<ratio>\d+)\s*/\s*100'
+    r'|(?<!\d)(?P<points>\d+)\s*分',
+    re.IGNORECASE
+)
+
+# 各类分数的置信度
+CONFIDENCE_LABELED_OUT_OF = 1.0   # **分数**: 85/100
+CONFIDENCE_LABELED = 0.9          # 分数: 85
+CONFIDENCE_RATIO = 0.7            # 85/100
+CONFIDENCE_POINTS = 0.5           # 85分
+CONFIDENCE_KEYWORD = 0.3          # 根据评价关键词推断
+CONFIDENCE_NONE = 0.0             # 未找到分数，使用默认分数
+
+# 没有明确分数时根据关键词推断（按顺序优先）
+KEYWORD_SCORES = [
+    (['优秀', '很好', '完美', 'excellent', 'perfect'], 90),
+    (['良好', '不错', 'good', 'well'], 80),
+    (['一般', '还可以', 'average', 'ok'], 70),
+    (['需要改进', '有问题', 'poor', 'bad'], 60),
+    (['很差', '错误很多', 'terrible', 'fail'], 40),
+]
+_KEYWORD_PATTERN = re.compile('|'.join(
+    f'(?P<k{rank}>' + '|'.join(re.escape(word) for word in words) + ')'
+    for rank, (words, _) in enumerate(KEYWORD_SCORES)
+))
+
+# 未能提取分数时使用的默认分数
+DEFAULT_SCORE = 75
+
+
+class _Line:
+    """扫描得到的一行"""
+
+    __slots__ = ('kind', 'text', 'number', 'score', 'confidence', 'keyword')
+
+    def __init__(self, kind: str, text: str):
+        self.kind = kind          # text / blank / separator / header / code
+        self.text = text
+        self.number = None        # 题目标题中的"题目N"序号
+        self.score = None         # 该行最可信的分数
+        self.confidence = CONFIDENCE_NONE
+        self.keyword = None       # 该行出现的最高优先级关键词序号
+
+
+def scan_evaluation(text: str) -> List[_Line]:
+    """
+    一次线性扫描模型回复，识别每一行的类型以及其中的分数
+
+    代码块中的内容不参与标题、分隔符和分数的识别（未闭合的代码块在下一个 Markdown 题目标题处结束）。
+
+    Args:
+        text: 模型回复
+
+    Returns:
+        行列表
+    """
+    lines = []
+    in_code = False
+    for raw in (text or '').replace('\r\n', '\n').replace('\r', '\n').split('\n'):
+        if _FENCE_PATTERN.match(raw):
+            in_code = not in_code
+            lines.append(_Line('code', raw))
+            continue
+        if in_code and not _CODE_ESCAPE_PATTERN.match(raw):
+            lines.append(_Line('code', raw))
+            continue
+        in_code = False
+        if not raw.strip():
+            lines.append(_Line('blank', raw))
+            continue
+        if _SEPARATOR_PATTERN.match(raw):
+            lines.append(_Line('separator', raw))
+            continue
+
+        line = _Line('text', raw)
+        header = _HEADER_PATTERN.match(raw)
+        if header and (header.group('mark') or _HEADER_END_PATTERN.search(header.group('rest'))):
+            line.kind = 'header'
+            if header.group('number'):
+                line.number = int(header.group('number'))
+
+        for match in _SCORE_PATTERN.finditer(raw):
+            score, confidence = _classify_score(match)
+            if score is not None and confidence > line.confidence:
+                line.score, line.confidence = score, confidence
+
+        lowered = raw.lower()
+        for match in _KEYWORD_PATTERN.finditer(lowered):
+            rank = int(match.lastgroup[1:])
+            if line.keyword is None or rank < line.keyword:
+                line.keyword = rank
+
+        lines.append(line)
+    return lines
+
+
+def _classify_score(match) -> Tuple[Optional[int], float]:
+    """将一次分数匹配转换为 (分数, 置信度)，超出0-100的分数视为无效"""
+    if match.group('labeled') is not None:
+        value = match.group('labeled')
+        confidence = CONFIDENCE_LABELED_OUT_OF if match.group('out_of') else CONFIDENCE_LABELED
+    elif match.group('ratio') is not None:
+        value, confidence = match.group('ratio'), CONFIDENCE_RATIO
+    else:
+        value, confidence = match.group('points'), CONFIDENCE_POINTS
+
+    score = int(value)
+    if 0 <= score <= 100:
+        return score, confidence
+    return None, CONFIDENCE_NONE
+
+
+def _join(lines: List[_Line]) -> str:
+    """将行列表拼接为文本"""
+    return '\n'.join(line.text for line in lines).strip()
+
+
+def _score_lines(lines: List[_Line]) -> Tuple[Optional[int], float]:
+    """
+    在已扫描的行中选择分数：置信度最高者优先，同等置信度取最先出现的；
+    没有明确分数时根据关键词推断
+
+    Returns:
+        (分数, 置信度)，都没有时分数为None
+    """
+    score, confidence, keyword = None, CONFIDENCE_NONE, None
+    for line in lines:
+        if line.score is not None and line.confidence > confidence:
+            score, confidence = line.score, line.confidence
+        if line.keyword is not None and (keyword is None or line.keyword < keyword):
+            keyword = line.keyword
+
+    if score is None and keyword is not None:
+        return KEYWORD_SCORES[keyword][1], CONFIDENCE_KEYWORD
+    return score, confidence
+
+
+def is_complete_evaluation(text: str, min_length: int) -> bool:
+    """
+    评价文本是否完整：长度不少于 min_length，或者虽然很短但带有明确标注的分数
+    （自适应详略模式下分数较高的题目只有分数和一句话总评）
+
+    Args:
+        text: 一道题（或一名学生）的评价文本
+        min_length: 没有明确标注的分数时要求的最短长度
+
+    Returns:
+        是否完整
+    """
+    text = (text or '').strip()
+    return len(text) >= min_length or _score_lines(scan_evaluation(text))[1] >= CONFIDENCE_LABELED
+
+
+def extract_score(text: str) -> Tuple[Optional[int], float]:
+    """
+    从评价文本中提取分数
+
+    Args:
+        text: 评价文本
+
+    Returns:
+        (分数0-100, 置信度0-1)，未找到时为 (None, 0.0)
+    """
+    return _score_lines(scan_evaluation(text))
+
+
+def _split_by_separator(lines: List[_Line]) -> List[List[_Line]]:
+    """按 === 分隔符分组，去掉空组"""
+    groups, current = [], []
+    for line in lines:
+        if line.kind == 'separator':
+            groups.append(current)
+            current = []
+        else:
+            current.append(line)
+    groups.append(current)
+    return [g for g in groups if any(line.text.strip() for line in g)]
+
+
+def _split_by_header(lines: List[_Line]) -> List[List[_Line]]:
+    """按题目标题行分组（标题行保留在组内，第一个标题之前的前言丢弃）"""
+    groups = []
+    for line in lines:
+        if line.kind == 'header':
+            groups.append([line])
+        elif groups and line.kind != 'separator':
+            groups[-1].append(line)
+    return groups
+
+
+def _split_by_paragraph(lines: List[_Line]) -> List[List[_Line]]:
+    """按空行分段（代码块内的空行不分段）"""
+    groups, current = [], []
+    for line in lines:
+        if line.kind in ('blank', 'separator'):
+            if current:
+                groups.append(current)
+                current = []
+        else:
+            current.append(line)
+    if current:
+        groups.append(current)
+    return groups
+
+
+def _starts_with_header(group: List[_Line]) -> bool:
+    """分组的第一个非空行是否为题目标题"""
+    first = next((line for line in group if line.kind != 'blank'), None)
+    return first is not None and first.kind == 'header'
+
+
+def _is_complete(section: str, section_lines: List[_Line], min_section_length: int) -> bool:
+    """在已扫描的行上判断段落是否完整（见 is_complete_evaluation）"""
+    return len(section) >= min_section_length or _score_lines(section_lines)[1] >= CONFIDENCE_LABELED
+
+
+def _drop_preamble(groups: List[List[_Line]], expected: int) -> List[List[_Line]]:
+    """分组数多于题目数时，丢弃开头不含标题的分组（如"以下是评价结果："）"""
+    start = 0
+    while len(groups) - start > expected and not any(line.kind == 'header' for line in groups[start]):
+        start += 1
+    return groups[start:]
+
+
+def split_sections(lines: List[_Line], expected: int) -> Tuple[List[List[_Line]], str]:
+    """
+    在扫描结果上选择分割方式
+
+    依次尝试：=== 分隔符、题目标题（有"题目N"序号时按序号对应）、段落重组（仅在没有任何标题时）。
+    返回的分组数少于题目数时表示分割失败。
+
+    Args:
+        lines: scan_evaluation 的结果
+        expected: 题目数量
+
+    Returns:
+        (分组列表, 分割方式)，分割方式为 separator、header、numbered_header、paragraph
+    """
+    if any(line.kind == 'separator' for line in lines):
+        groups = _drop_preamble(_split_by_separator(lines), expected)
+        if len(groups) >= expected:
+            return groups, 'separator'
+
+    groups = _split_by_header(lines)
+    if groups:
+        numbered = {}
+        for group in groups:
+            numbered.setdefault(group[0].number, group)
+        if all(n in numbered for n in range(1, expected + 1)):
+            return [numbered[n] for n in range(1, expected + 1)], 'numbered_header'
+        # 有标题但数量不足（如回复被截断）时不再按段落重组，交由调用方按标题逐题查找
+        return groups, 'header'
+
+    paragraphs = _split_by_paragraph(lines)
+    if len(paragraphs) > expected and expected > 0:
+        # 将段落按题目数量平均分配
+        per_problem = len(paragraphs) // expected
+        groups = []
+        for i in range(expected):
+            start = i * per_problem
+            end = start + per_problem if i < expected - 1 else len(paragraphs)
+            groups.append([line for paragraph in paragraphs[start:end] for line in paragraph])
+        return groups, 'paragraph'
+    return paragraphs, 'paragraph'
+
+
+def find_problem_section(lines: List[_Line], problem_name: str, problem_index: int) -> List[_Line]:
+    """
+    在扫描结果中查找特定题目的评价段落（分割失败时使用）
+
+    Args:
+        lines: scan_evaluation 的结果
+        problem_name: 题目名称
+        problem_index: 题目序号
+
+    Returns:
+        该题目的行列表，未找到时为空列表
+    """
+    return _find_in_header_groups(_split_by_header(lines), problem_name, problem_index)
+
+
+def _find_in_header_groups(groups: List[List[_Line]], problem_name: str, problem_index: int) -> List[_Line]:
+    """在按标题分好的组中查找特定题目：优先按"题目N"序号，其次按题目名称"""
+    for group in groups:
+        if group[0].number == problem_index:
+            return group
+    for group in groups:
+        if problem_name and problem_name in group[0].text:
+            return group
+    return []
+
+
+def parse_batch_evaluation(text: str, problems: List[Dict], min_section_length: int = 50) -> Dict:
+    """
+    解析批量评价结果，提取每道题的评价、分数和分数置信度
+
+    Args:
+        text: 批量评价的完整文本
+        problems: 题目列表
+        min_section_length: 段落少于该长度（且没有明确标注的分数）时视为分割错误
+
+    Returns:
+        {
+            'method': 分割方式（empty / fallback 或 split_sections 的分割方式）,
+            'sections': 分组数,
+            'evaluations': [{'evaluation': ..., 'score': 85, 'score_confidence': 1.0, 'parsed': True}, ...]
+        }
+    """
+    evaluations = []
+
+    if not text or len(text.strip()) < 10:
+        for idx, problem in enumerate(problems):
+            problem_name = problem.get('problem_name', f'题目{idx+1}')
+            evaluations.append({
+                'evaluation': f"【题目{idx+1}: {problem_name}】\n\nAI评价失败，未能获取到评价内容。请检查API配置或网络连接。",
+                'score': 70,  # 默认分数
+                'score_confidence': CONFIDENCE_NONE,
+                'parsed': False
+            })
+        return {'method': 'empty', 'sections': 0, 'evaluations': evaluations}
+
+    lines = scan_evaluation(text)
+    groups, method = split_sections(lines, len(problems))
+
+    if len(groups) < len(problems):
+        # 分割结果不足：逐题查找对应的标题段落，找不到时使用完整评价内容
+        header_groups = _split_by_header(lines)
+        whole_score = None
+        for idx, problem in enumerate(problems):
+            problem_name = problem.get('problem_name', f'题目{idx+1}')
+            section_lines = _find_in_header_groups(header_groups, problem_name, idx + 1)
+            section = _join(section_lines)
+            parsed = _is_complete(section, section_lines, min_section_length + 1)
+
+            if parsed:
+                score, confidence = _score_lines(section_lines)
+            else:
+                section = f"【题目{idx+1}: {problem_name}】\n\n{text}"
+                if whole_score is None:
+                    whole_score = _score_lines(lines)
+                score, confidence = whole_score
+            evaluations.append({
+                'evaluation': section,
+                'score': score if score is not None else DEFAULT_SCORE,
+                'score_confidence': confidence,
+                'parsed': parsed
+            })
+        return {'method': 'fallback', 'sections': len(groups), 'evaluations': evaluations}
+
+    for idx, problem in enumerate(problems):
+        section_lines = groups[idx]
+        section = _join(section_lines)
+        parsed = True
+
+        # 内容太短（且没有明确标注的分数）时可能是分割错误，合并相邻的分组；下一组以自己的题目标题开头时是另一道题，
+        # 不能合并（否则会用到下一道题的分数），该题标记为未解析，交给补充评价
+        if not _is_complete(section, section_lines, min_section_length):
+            if idx + 1 < len(groups) and not _starts_with_header(groups[idx + 1]):
+                section_lines = section_lines + groups[idx + 1]
+                section = f"{section}\n\n{_join(groups[idx + 1])}"
+            else:
+                parsed = False
+
+        # 添加题目标识（如果没有的话）
+        problem_name = problem.get('problem_name', f'题目{idx+1}')
+        if not any(line.kind == 'header' for line in section_lines):
+            section = f"【题目{idx+1}: {problem_name}】\n\n{section}"
+
+        score, confidence = _score_lines(section_lines)
+        evaluations.append({
+            'evaluation': section,
+            'score': score if score is not None else DEFAULT_SCORE,
+            'score_confidence': confidence,
+            'parsed': parsed
+        })
+
+    return {'method': method, 'sections': len(groups), 'evaluations': evaluations}
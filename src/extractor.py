@@ -2,42 +2,200 @@
 ZIP文件处理模块
 负责解压和扫描作业文件
 """
+import hashlib
 import zipfile
 import os
+import shutil
+import tempfile
 from pathlib import Path
+import re
 from typing import List, Dict
 
 
+# 支持的C++文件扩展名
+CPP_EXTENSIONS = ('.cpp', '.cc', '.cxx', '.c', '.h', '.hpp')
+
+# 头文件扩展名（合并到同一道题中，不单独作为题目）
+HEADER_EXTENSIONS = ('.h', '.hpp')
+
+# main函数定义
+_MAIN_PATTERN = re.compile(r'^\s*(?:int|void|signed)?\s*main\s*\(', re.MULTILINE)
+
+
+def combine_sources(sources: List[tuple]) -> str:
+    """
+    合并一道题的多个文件，每个文件前加文件名分隔行（只有一个文件时原样返回）
+
+    Args:
+        sources: [(文件名, 文件内容), ...]
+
+    Returns:
+        合并后的代码
+    """
+    if len(sources) == 1:
+        return sources[0][1]
+    return '\n'.join(f"// ===== {name} =====\n{code.rstrip()}\n" for name, code in sources)
+
+
 class HomeworkExtractor:
     """作业文件提取器"""
 
-    def __init__(self, zip_path: str, extract_path: str = "./data/extracted"):
+    # 未指定解压路径时，每次运行在该目录下使用独立的子目录，同时运行的多个任务互不覆盖
+    EXTRACT_ROOT = "./data/extracted"
+
+    def __init__(self, zip_path, extract_path: str = None):
         """
         初始化提取器
 
         Args:
-            zip_path: ZIP文件路径
-            extract_path: 解压目标路径
+            zip_path: ZIP文件路径，或按顺序叠加的多个ZIP文件路径（后面的ZIP中出现的学生覆盖前面的同一学生）
+            extract_path: 解压目标路径，None时在 EXTRACT_ROOT 下创建独立的目录
         """
-        self.zip_path = zip_path
+        self.zip_paths = [zip_path] if isinstance(zip_path, str) else list(zip_path)
+        self.zip_path = self.zip_paths[0]
         self.extract_path = extract_path
+        self._owns_extract_path = extract_path is None
+        self.index: Dict[str, Dict] = {}  # 学生标识 -> {'layer', 'zip_path', 'members', 'signature'}
+        self.skipped: Dict[str, Dict] = {}  # 提交没有变化、没有解压的学生（学生标识 -> index中的条目）
+
+    @staticmethod
+    def _member_student(parts: List[str], base_depth: int, roster=None) -> tuple:
+        """
+        根据ZIP中文件的目录部分确定所属学生
+
+        Args:
+            parts: 文件路径中的目录名称列表
+            base_depth: 没有"学号+姓名"格式时，学生文件夹所在的层级
+            roster: 学生名单（可选）
+
+        Returns:
+            (学生标识, 学生文件夹在parts中的下标, 是否为名单中的学生或"学号+姓名"格式的文件夹)，
+            不属于任何学生时返回 (None, -1, False)
+        """
+        for depth, part in enumerate(parts):
+            listed = roster.match(part) if roster is not None else None
+            if listed is not None:
+                student_id, student_name = listed['student_id'], listed['student_name']
+            elif '+' in part:
+                student_id, student_name = part.split('+')[0].strip(), part.split('+')[-1].strip()
+            else:
+                continue
+            return (f"{student_id}+{student_name}" if student_id else student_name), depth, True
+        if len(parts) > base_depth:
+            return parts[base_depth], base_depth, False
+        return None, -1, False
+
+    def build_index(self, roster=None) -> Dict[str, Dict]:
+        """
+        读取所有ZIP的文件列表（不解压），按学生合并
+
+        ZIP按给定顺序叠加，后面的ZIP中出现的学生整体覆盖前面ZIP中的同一学生（补交的文件替换原来的提交）。
+        每个学生的签名由其代码文件的路径、CRC和大小计算，内容相同的提交签名相同。
 
-    def extract_zip(self) -> str:
+        Args:
+            roster: 学生名单（可选，用于识别不含"+"的学生文件夹）
+
+        Returns:
+            学生标识 -> {'layer': ZIP序号, 'zip_path', 'members': [ZipInfo, ...], 'signature',
+                        'folders': [学生文件夹在ZIP中的路径, ...],
+                        'code': [代码文件的 "相对学生文件夹的路径\0CRC\0大小", ...],
+                        'matched': 是否为名单中的学生或"学号+姓名"格式的文件夹（否则按层级确定）}
+        """
+        index = {}
+        for layer, zip_path in enumerate(self.zip_paths):
+            try:
+                with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+                    infos = [
+                        info for info in zip_ref.infolist()
+                        if not info.is_dir() and not any(
+                            part.startswith('.') or part == '__MACOSX' for part in info.filename.split('/')
+                        )
+                    ]
+            except zipfile.BadZipFile:
+                raise Exception(f"错误: {zip_path} 不是有效的ZIP文件")
+
+            # 所有文件都在同一个顶层文件夹中时，学生文件夹在第二层
+            top_levels = {info.filename.split('/')[0] for info in infos}
+            base_depth = 1 if len(top_levels) == 1 and all('/' in info.filename for info in infos) else 0
+
+            layer_students = {}
+            for info in infos:
+                parts = info.filename.split('/')[:-1]
+                key, depth, matched = self._member_student(parts, base_depth, roster)
+                if key is None:
+                    continue
+                entry = layer_students.setdefault(key, {
+                    'layer': layer, 'zip_path': zip_path, 'members': [], 'code': [], 'folders': [], 'matched': matched
+                })
+                entry['members'].append(info)
+                folder = '/'.join(parts[:depth + 1])
+                if folder not in entry['folders']:
+                    entry['folders'].append(folder)
+                if info.filename.lower().endswith(CPP_EXTENSIONS + ('.cpp.txt',)):
+                    inner_path = '/'.join(info.filename.split('/')[depth + 1:])
+                    entry['code'].append(f"{inner_path}\0{info.CRC:08x}\0{info.file_size}")
+
+            for key, entry in layer_students.items():
+                entry['signature'] = hashlib.sha1('\n'.join(sorted(entry['code'])).encode('utf-8')).hexdigest()
+                index[key] = entry
+
+        self.index = index
+        return index
+
+    def extract_zip(self, roster=None, skip=None) -> str:
         """
         解压ZIP文件，并自动处理.cpp.txt文件
 
+        只有一个ZIP时全部解压；多个ZIP时先合并文件列表，只解压每个学生最终采用的那一份文件。
+        给出skip时，按文件列表签名判断为没有变化的学生不解压（get_all_students 中只保留其标识和签名）。
+
+        Args:
+            roster: 学生名单（可选，用于合并多个ZIP时识别学生文件夹）
+            skip: 可选的判断函数 skip(学生标识, 签名)，返回True的学生不解压
+
         Returns:
             解压后的目录路径
         """
-        print(f"正在解压文件: {self.zip_path}")
+        print(f"正在解压文件: {', '.join(self.zip_paths)}")
 
         # 创建解压目录
+        if self.extract_path is None:
+            os.makedirs(self.EXTRACT_ROOT, exist_ok=True)
+            stem = re.sub(r'[^\w\-]', '_', Path(self.zip_path).stem)
+            self.extract_path = tempfile.mkdtemp(prefix=f"{stem}_", dir=self.EXTRACT_ROOT)
         os.makedirs(self.extract_path, exist_ok=True)
 
         try:
-            with zipfile.ZipFile(self.zip_path, 'r') as zip_ref:
-                # 解压所有文件
-                zip_ref.extractall(self.extract_path)
+            index = self.build_index(roster)
+            self.skipped = {
+                key: entry for key, entry in index.items() if skip is not None and skip(key, entry['signature'])
+            }
+            if self.skipped:
+                print(f"✓ {len(self.skipped)} 个学生的提交与上次相同，不解压")
+
+            if len(self.zip_paths) == 1:
+                with zipfile.ZipFile(self.zip_path, 'r') as zip_ref:
+                    # 解压所有文件（跳过没有变化的学生）
+                    skipped_names = {info.filename for entry in self.skipped.values() for info in entry['members']}
+                    zip_ref.extractall(self.extract_path, members=[
+                        info for info in zip_ref.infolist() if info.filename not in skipped_names
+                    ])
+            else:
+                extracted = 0
+                for layer, zip_path in enumerate(self.zip_paths):
+                    members = [info for key, entry in index.items()
+                               if entry['layer'] == layer and key not in self.skipped for info in entry['members']]
+                    if not members:
+                        continue
+                    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+                        for info in members:
+                            zip_ref.extract(info, self.extract_path)
+                    extracted += len(members)
+
+                print(f"✓ 合并 {len(self.zip_paths)} 个ZIP文件: 共 {len(index)} 个学生，只解压最终采用的 {extracted} 个文件")
+                for layer, zip_path in enumerate(self.zip_paths[1:], 1):
+                    count = sum(1 for entry in index.values() if entry['layer'] == layer)
+                    print(f"  - {os.path.basename(zip_path)}: {count} 个学生采用该文件中的提交")
             print(f"✓ 文件已解压到: {self.extract_path}")
 
             # 自动处理.cpp.txt文件（重命名为.cpp）
@@ -49,6 +207,11 @@ class HomeworkExtractor:
         except Exception as e:
             raise Exception(f"解压失败: {str(e)}")
 
+    def cleanup(self):
+        """删除本次运行自动创建的解压目录（指定了解压路径时保留）"""
+        if self._owns_extract_path and self.extract_path and os.path.isdir(self.extract_path):
+            shutil.rmtree(self.extract_path, ignore_errors=True)
+
     def scan_cpp_files(self, root_folder: str = None) -> List[Dict[str, str]]:
         """
         扫描所有C++文件
@@ -189,6 +352,93 @@ class HomeworkExtractor:
         except Exception as e:
             raise Exception(f"读取文件失败 {file_path}: {str(e)}")
 
+    def _collect_problem_files(self, student_folder: Path, root_path: Path) -> List[Dict[str, any]]:
+        """
+        查找一个学生的所有C++文件，并按题目文件夹分组
+
+        同一题目文件夹中的多个文件（如 main.cpp + util.h + util.cpp）合并为一道题，
+        头文件排在同名的实现文件之前，含main函数的文件排在最后；
+        直接放在学生文件夹中的文件，或同一文件夹中有多个main函数时（多道独立的题目），
+        每个源文件单独作为一道题，头文件附加到同名的源文件上，题目由文件名（'problem_hint'）而不是所在文件夹确定。
+
+        Args:
+            student_folder: 学生文件夹
+            root_path: 根目录路径
+
+        Returns:
+            题目列表
+            [
+                {
+                    'file_path': '/path/to/main.cpp',  # 主文件（含main函数的文件）
+                    'file_name': 'main.cpp + util.h + util.cpp',
+                    'relative_path': '未分班/学号+姓名/代码文件/题目/main.cpp',
+                    'unit_path': '代码文件/题目/main.cpp',  # 主文件相对学生文件夹的路径（在各次导出中保持不变）
+                    'sources': [{'file_path', 'file_name', 'relative_path'}, ...],  # 按合并顺序
+                    'problem_hint': 'a'  # 仅按文件拆分的题目存在：主文件名（不含扩展名）
+                },
+                ...
+            ]
+        """
+        folders: Dict[Path, list] = {}
+        for file_path in sorted(student_folder.rglob('*')):
+            if file_path.is_file() and file_path.suffix.lower() in CPP_EXTENSIONS:
+                folders.setdefault(file_path.parent, []).append(file_path)
+
+        units = []
+        for folder, paths in folders.items():
+            sources = [p for p in paths if p.suffix.lower() not in HEADER_EXTENSIONS]
+            has_main = [p for p in sources if _MAIN_PATTERN.search(self.read_code(str(p)))]
+
+            split = folder == student_folder or len(has_main) > 1
+            if not split:
+                groups = [paths]
+            else:
+                # 每个源文件单独一道题，头文件附加到同名的源文件（没有同名源文件时单独一道题）
+                groups = [[p] for p in sources]
+                for header in (p for p in paths if p.suffix.lower() in HEADER_EXTENSIONS):
+                    group = next((g for g in groups if g[0].stem == header.stem), None)
+                    if group is not None:
+                        group.append(header)
+                    else:
+                        groups.append([header])
+
+            for group in groups:
+                ordered = sorted(group, key=lambda p: (
+                    p in has_main,
+                    p.stem,
+                    p.suffix.lower() not in HEADER_EXTENSIONS
+                ))
+                primary = next((p for p in ordered if p in has_main), ordered[-1])
+                files = [{
+                    'file_path': str(p.absolute()),
+                    'file_name': p.name,
+                    'relative_path': str(p.relative_to(root_path))
+                } for p in ordered]
+                unit = {
+                    'file_path': str(primary.absolute()),
+                    'file_name': ' + '.join(p.name for p in ordered),
+                    'relative_path': str(primary.relative_to(root_path)),
+                    'unit_path': primary.relative_to(student_folder).as_posix(),
+                    'sources': files
+                }
+                if split:
+                    unit['problem_hint'] = primary.stem
+                units.append(unit)
+        return units
+
+    def read_problem_sources(self, file_info: Dict[str, any]) -> List[tuple]:
+        """
+        读取一道题的所有文件
+
+        Args:
+            file_info: _collect_problem_files 返回的一道题
+
+        Returns:
+            [(文件名, 文件内容), ...]，按合并顺序
+        """
+        sources = file_info.get('sources') or [file_info]
+        return [(source['file_name'], self.read_code(source['file_path'])) for source in sources]
+
     def _rename_cpp_txt_files(self, root_folder: str):
         """
         自动将.cpp.txt文件重命名为.cpp
@@ -214,36 +464,19 @@ class HomeworkExtractor:
         if renamed_count > 0:
             print(f"✓ 自动处理了 {renamed_count} 个 .cpp.txt 文件")
 
-    def get_all_students(self, root_folder: str = None) -> List[Dict[str, any]]:
+    def _scan_student_folders(self, root_path: Path, roster=None) -> tuple:
         """
-        获取所有学生名单，包括未提交作业的学生
-        支持多层嵌套结构，如：第02周上机作业/未分班/学号+姓名/代码文件/题目/main.cpp
+        遍历目录树查找学生文件夹（没有ZIP文件列表时使用，如直接扫描已解压的目录）
 
         Args:
-            root_folder: 要扫描的根目录，默认为解压目录
+            root_path: 要扫描的根目录
+            roster: 学生名单（可选）
 
         Returns:
-            学生信息列表
-            [
-                {
-                    'student_name': '泮妍竹',
-                    'student_id': '52********00',  # 如果能提取到学号
-                    'has_submission': True,
-                    'file_count': 2,
-                    'files': [...]  # 如果有提交
-                },
-                ...
-            ]
+            (学生标识 -> 学生信息, 不在名单中的学生文件夹名称列表)
         """
-        if root_folder is None:
-            root_folder = self.extract_path
-
-        root_path = Path(root_folder)
         students = {}
-
-        print(f"\n正在扫描学生名单: {root_folder}")
-
-        cpp_extensions = ['.cpp', '.cc', '.cxx', '.c', '.h', '.hpp']
+        unlisted = []
 
         # 递归查找所有包含"学号+姓名"格式的文件夹
         def find_student_folders(path: Path, depth: int = 0, max_depth: int = 5):
@@ -257,25 +490,27 @@ class HomeworkExtractor:
                     continue
 
                 if item.is_dir():
-                    # 检查是否是学生文件夹（包含+号的格式）
-                    if '+' in item.name:
-                        # 提取学号和姓名
-                        parts = item.name.split('+')
-                        student_id = parts[0].strip() if len(parts) > 0 else ''
-                        student_name = parts[-1].strip() if len(parts) > 1 else item.name
-
-                        # 查找该学生的所有C++文件
-                        cpp_files = []
-                        for file_path in item.rglob('*'):
-                            if file_path.is_file() and file_path.suffix.lower() in cpp_extensions:
-                                cpp_files.append({
-                                    'file_path': str(file_path.absolute()),
-                                    'file_name': file_path.name,
-                                    'relative_path': str(file_path.relative_to(root_path))
-                                })
-
-                        # 使用学号+姓名作为唯一标识
+                    # 检查是否是学生文件夹（名单中的学生，或包含+号的格式）
+                    listed = roster.match(item.name) if roster is not None else None
+                    if listed is not None or '+' in item.name:
+                        if listed is not None:
+                            student_id = listed['student_id']
+                            student_name = listed['student_name']
+                        else:
+                            # 提取学号和姓名
+                            parts = item.name.split('+')
+                            student_id = parts[0].strip() if len(parts) > 0 else ''
+                            student_name = parts[-1].strip() if len(parts) > 1 else item.name
+                            if roster is not None:
+                                unlisted.append(item.name)
+
+                        # 查找该学生的所有C++文件（按题目文件夹分组）
+                        cpp_files = self._collect_problem_files(item, root_path)
+
+                        # 使用学号+姓名作为唯一标识（同一学生有多个文件夹时合并）
                         key = f"{student_id}+{student_name}" if student_id else student_name
+                        if key in students:
+                            cpp_files = students[key]['files'] + cpp_files
 
                         students[key] = {
                             'student_name': student_name,
@@ -291,8 +526,8 @@ class HomeworkExtractor:
         # 开始查找
         find_student_folders(root_path)
 
-        # 如果没找到学号+姓名格式，使用旧的简单扫描方式
-        if not students:
+        # 如果没找到学号+姓名格式，使用旧的简单扫描方式（提供名单时不再扫描）
+        if not students and roster is None:
             print("  未找到标准格式（学号+姓名），使用简单扫描模式...")
             for item in root_path.iterdir():
                 if item.is_dir():
@@ -300,15 +535,7 @@ class HomeworkExtractor:
                         continue
 
                     student_name = item.name
-                    cpp_files = []
-
-                    for file_path in item.rglob('*'):
-                        if file_path.is_file() and file_path.suffix.lower() in cpp_extensions:
-                            cpp_files.append({
-                                'file_path': str(file_path.absolute()),
-                                'file_name': file_path.name,
-                                'relative_path': str(file_path.relative_to(root_path))
-                            })
+                    cpp_files = self._collect_problem_files(item, root_path)
 
                     students[student_name] = {
                         'student_name': student_name,
@@ -318,6 +545,127 @@ class HomeworkExtractor:
                         'files': cpp_files
                     }
 
+        return students, unlisted
+
+    def _students_from_index(self, root_path: Path, roster=None) -> tuple:
+        """
+        按ZIP文件列表（build_index）确定学生，只读取各学生自己的文件夹
+
+        有名单中的学生或"学号+姓名"格式的文件夹时，只取这些学生（忽略按层级确定的其他文件夹）。
+
+        Args:
+            root_path: 解压目录
+            roster: 学生名单（可选）
+
+        Returns:
+            (学生标识 -> 学生信息, 不在名单中的学生标识列表)
+        """
+        entries = {key: entry for key, entry in self.index.items() if entry['matched']}
+        if not entries and roster is None:
+            entries = self.index
+
+        students = {}
+        unlisted = []
+        for key, entry in entries.items():
+            if key in self.skipped:
+                continue
+            student_id = key.split('+')[0] if '+' in key else ''
+            if roster is not None and student_id not in roster.by_id:
+                unlisted.append(key)
+
+            cpp_files = []
+            for folder in entry['folders']:
+                folder_path = root_path / folder
+                if folder_path.is_dir():
+                    cpp_files += self._collect_problem_files(folder_path, root_path)
+            students[key] = {
+                'student_name': key.split('+')[-1] if '+' in key else key,
+                'student_id': student_id,
+                'has_submission': len(cpp_files) > 0,
+                'file_count': len(cpp_files),
+                'files': cpp_files
+            }
+        return students, unlisted
+
+    def get_all_students(self, root_folder: str = None, roster=None) -> List[Dict[str, any]]:
+        """
+        获取所有学生名单，包括未提交作业的学生
+        支持多层嵌套结构，如：第02周上机作业/未分班/学号+姓名/代码文件/题目/main.cpp
+
+        解压过ZIP时直接使用ZIP文件列表中的学生（build_index），不再遍历目录树；否则遍历目录树查找学生文件夹。
+        提供学生名单时，文件夹按学号在名单索引中直接匹配（也支持不含"+"的文件夹名称），
+        名单中有但压缩包中没有文件夹的学生同样列为未提交，并标记 'missing': True。
+
+        Args:
+            root_folder: 要扫描的根目录，默认为解压目录
+            roster: 学生名单（roster.Roster），None表示从文件夹名称推断学生
+
+        Returns:
+            学生信息列表
+            [
+                {
+                    'student_name': '泮妍竹',
+                    'student_id': '52********00',  # 如果能提取到学号
+                    'has_submission': True,
+                    'file_count': 2,  # 题目数（同一题目文件夹中的多个文件算一道题）
+                    'files': [...],  # 如果有提交，每项是一道题，见 _collect_problem_files
+                    'source_zip': '补交.zip',  # 提交来自哪个ZIP（多个ZIP叠加时）
+                    'signature': '...',  # 由ZIP文件列表（路径、CRC、大小）计算的内容签名
+                    'unchanged': True,  # 仅提交没有变化、没有解压时存在（files为空）
+                    'missing': True  # 仅提供名单且压缩包中没有该学生时存在
+                },
+                ...
+            ]
+        """
+        if root_folder is None:
+            root_folder = self.extract_path
+
+        root_path = Path(root_folder)
+
+        print(f"\n正在扫描学生名单: {root_folder}")
+
+        # 解压过ZIP时，学生直接取自ZIP的文件列表，不再遍历目录树查找学生文件夹
+        if self.index and self.extract_path and root_path == Path(self.extract_path):
+            students, unlisted = self._students_from_index(root_path, roster)
+        else:
+            students, unlisted = self._scan_student_folders(root_path, roster)
+
+        # 提交没有变化、没有解压的学生（不读取代码，由调用方沿用上次的结果）
+        for key, entry in self.skipped.items():
+            if key not in students:
+                students[key] = {
+                    'student_name': key.split('+')[-1] if '+' in key else key,
+                    'student_id': key.split('+')[0] if '+' in key else '',
+                    'has_submission': True,
+                    'file_count': 0,
+                    'files': [],
+                    'unchanged': True
+                }
+
+        # 名单中有、压缩包中没有的学生
+        missing_count = 0
+        if roster is not None:
+            for listed in roster.students:
+                student_id, student_name = listed['student_id'], listed['student_name']
+                key = f"{student_id}+{student_name}" if student_id else student_name
+                if key not in students:
+                    students[key] = {
+                        'student_name': student_name,
+                        'student_id': student_id,
+                        'has_submission': False,
+                        'file_count': 0,
+                        'files': [],
+                        'missing': True
+                    }
+                    missing_count += 1
+
+        # 学生提交来自哪个ZIP，以及由文件列表计算的内容签名
+        for key, student in students.items():
+            entry = self.index.get(key)
+            if entry is not None:
+                student['source_zip'] = entry['zip_path']
+                student['signature'] = entry['signature']
+
         # 转换为列表并排序
         student_list = sorted(students.values(), key=lambda x: x['student_name'])
 
@@ -328,6 +676,11 @@ class HomeworkExtractor:
         print(f"✓ 找到 {len(student_list)} 个学生")
         print(f"  - 已提交: {submitted_count} 人")
         print(f"  - 未提交: {not_submitted_count} 人")
+        if roster is not None:
+            print(f"  - 其中压缩包中没有该学生: {missing_count} 人")
+            if unlisted:
+                print(f"⚠ {len(unlisted)} 个学生文件夹不在名单中: {', '.join(unlisted[:10])}"
+                      + (" ……" if len(unlisted) > 10 else ""))
 
         return student_list
 
@@ -0,0 +1,449 @@
+"""
+编译测试模块
+在进程池中用 g++ 编译每份提交，并在隔离环境（独立的网络和进程命名空间、低权限用户、最小环境变量）中
+按CPU时间、内存、进程数和墙钟时间限制运行题目的测试用例，
+结果按代码哈希缓存到输出目录，作为客观的正确性依据提供给模型
+"""
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import signal
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+try:
+    import pwd
+    import resource
+except ImportError:  # Windows 上没有 resource/pwd 模块，只使用墙钟超时
+    pwd = resource = None
+
+
+# 默认测试用例目录：config/testcases/<题目名称>/ 下的 *.in 与同名 *.out
+DEFAULT_TESTCASE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'config', 'testcases'
+)
+
+# 测试结果状态
+STATUS_LABELS = {
+    'AC': '通过',
+    'WA': '答案错误',
+    'TLE': '超时',
+    'RE': '运行错误',
+}
+
+# 超出CPU时间限制时子进程收到的信号
+_TIME_LIMIT_SIGNALS = {getattr(signal, 'SIGXCPU', 24), getattr(signal, 'SIGKILL', 9)}
+
+# 编译错误信息最多保留的字符数
+MAX_COMPILE_ERROR_CHARS = 600
+
+# 学生程序最多可以同时拥有的进程/线程数（限制 fork 炸弹）
+MAX_PROCESSES = 16
+
+# 以root运行时，学生程序切换到的低权限用户
+SANDBOX_USER = 'nobody'
+
+# bwrap 隔离时只读挂载的系统目录（运行编译好的程序所需的动态库），其余文件（包括 .env）不可见
+_BWRAP_SYSTEM_DIRS = ('/usr', '/lib', '/lib64', '/lib32', '/bin')
+
+
+def _normalize_output(text: str) -> List[str]:
+    """比较输出时忽略行尾空白和末尾空行"""
+    lines = [line.rstrip() for line in text.replace('\r\n', '\n').split('\n')]
+    while lines and not lines[-1]:
+        lines.pop()
+    return lines
+
+
+def _sandbox_env() -> Dict[str, str]:
+    """编译和运行时使用的最小环境变量（不继承 API 密钥等评价程序自身的环境变量）"""
+    return {'PATH': os.environ.get('PATH') or os.defpath, 'LANG': 'C.UTF-8', 'LC_ALL': 'C.UTF-8'}
+
+
+def _limit_resources(cpu_seconds: int, memory_mb: int, processes: int = 0):
+    """子进程启动前设置资源限制（CPU时间、地址空间、输出文件大小、进程数）"""
+    def apply():
+        if resource is None:
+            return
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 1))
+        if memory_mb:
+            memory = memory_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+        resource.setrlimit(resource.RLIMIT_FSIZE, (16 * 1024 * 1024, 16 * 1024 * 1024))
+        if processes:
+            resource.setrlimit(resource.RLIMIT_NPROC, (processes, processes))
+    return apply if resource is not None else None
+
+
+def _sandbox_prefix(isolation: str, work_dir: str) -> List[str]:
+    """
+    生成在隔离环境中运行学生程序的命令前缀
+
+    Args:
+        isolation: detect_isolation 的返回值
+        work_dir: 程序所在的工作目录（只读可见）
+
+    Returns:
+        命令前缀，'none' 时为空列表
+    """
+    if isolation == 'bwrap':
+        prefix = ['bwrap', '--unshare-all', '--die-with-parent', '--new-session']
+        for path in _BWRAP_SYSTEM_DIRS:
+            prefix += ['--ro-bind-try', path, path]
+        return prefix + ['--proc', '/proc', '--dev', '/dev', '--tmpfs', '/tmp',
+                         '--ro-bind', work_dir, work_dir, '--chdir', work_dir]
+    if isolation == 'unshare':
+        user = pwd.getpwnam(SANDBOX_USER)
+        return ['unshare', '--net', '--pid', '--ipc', '--uts', '--fork', '--kill-child', '--',
+                'setpriv', f'--reuid={user.pw_uid}', f'--regid={user.pw_gid}', '--clear-groups', '--']
+    return []
+
+
+def _probe(command: List[str]) -> bool:
+    """检查隔离命令能否正常运行"""
+    try:
+        return subprocess.run(command, capture_output=True, timeout=10, env=_sandbox_env()).returncode == 0
+    except (OSError, subprocess.SubprocessError):
+        return False
+
+
+def detect_isolation() -> str:
+    """
+    检测可用的隔离方式
+
+    Returns:
+        'bwrap'：bubblewrap（独立的网络、进程命名空间，只能看到系统目录和程序所在的目录）；
+        'unshare'：以root运行时用 unshare 隔离网络和进程命名空间，并用 setpriv 切换到低权限用户；
+        'none'：只使用最小环境变量和资源限制
+    """
+    true_path = shutil.which('true') or '/bin/true'
+    if shutil.which('bwrap') and _probe(_sandbox_prefix('bwrap', tempfile.gettempdir()) + [true_path]):
+        return 'bwrap'
+    if (pwd is not None and hasattr(os, 'geteuid') and os.geteuid() == 0
+            and shutil.which('unshare') and shutil.which('setpriv')):
+        try:
+            prefix = _sandbox_prefix('unshare', tempfile.gettempdir())
+        except KeyError:  # 没有低权限用户
+            return 'none'
+        if _probe(prefix + [true_path]):
+            return 'unshare'
+    return 'none'
+
+
+def _kill_group(pid: int):
+    """杀死进程组中的所有进程（包括学生程序fork出的子进程）"""
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def _run_in_session(command: List[str], input_text: str, timeout: float, cwd: str, preexec_fn) -> subprocess.CompletedProcess:
+    """
+    在新的会话（进程组）中运行命令，结束或超时后杀死整个进程组
+
+    Raises:
+        subprocess.TimeoutExpired: 超过墙钟时间限制
+    """
+    with subprocess.Popen(
+        command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        text=True, errors='replace', cwd=cwd, env=_sandbox_env(),
+        preexec_fn=preexec_fn, start_new_session=True
+    ) as process:
+        try:
+            stdout, stderr = process.communicate(input_text, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            _kill_group(process.pid)
+            process.kill()
+            process.wait()
+            raise
+        finally:
+            _kill_group(process.pid)
+    return subprocess.CompletedProcess(command, process.returncode, stdout, stderr)
+
+
+def judge_code(task: Dict) -> Dict:
+    """
+    编译并运行一份代码（在进程池的子进程中执行）
+
+    Args:
+        task: {
+            'code': 代码,
+            'sources': [(文件名, 内容), ...]  # 可选，多文件的题目分别写入各个文件，只编译源文件
+            'tests': [(用例名, 输入, 期望输出), ...],
+            'compiler': 编译器, 'flags': 编译参数列表,
+            'time_limit': 每个用例的CPU时间限制（秒）, 'memory_limit': 内存限制（MB）,
+            'isolation': 运行学生程序的隔离方式（detect_isolation 的返回值）
+        }
+
+    Returns:
+        {'compiled', 'compile_error', 'passed', 'total', 'cases': [{'name', 'status'}]}
+    """
+    result = {'compiled': False, 'compile_error': '', 'passed': 0, 'total': len(task['tests']), 'cases': []}
+    work_dir = tempfile.mkdtemp(prefix='judge_')
+    try:
+        binary = os.path.join(work_dir, 'main')
+        sources = []
+        for name, content in task.get('sources') or [('main.cpp', task['code'])]:
+            path = os.path.join(work_dir, os.path.basename(name))
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(content)
+            if not name.lower().endswith(('.h', '.hpp')):
+                sources.append(path)
+
+        try:
+            compiled = _run_in_session(
+                [task['compiler'], *task['flags'], *sources, '-o', binary],
+                '', 60, work_dir, _limit_resources(60, 0)
+            )
+        except subprocess.TimeoutExpired:
+            result['compile_error'] = '编译超时'
+            return result
+        if compiled.returncode != 0:
+            error = compiled.stderr.replace(work_dir + os.sep, '')
+            result['compile_error'] = error[:MAX_COMPILE_ERROR_CHARS]
+            return result
+        result['compiled'] = True
+
+        # 低权限用户需要能进入工作目录并执行程序（但不能写入）
+        os.chmod(work_dir, 0o755)
+        command = _sandbox_prefix(task.get('isolation', 'none'), work_dir) + [binary]
+        time_limit = task['time_limit']
+        cpu_seconds = max(1, int(time_limit + 0.999))
+        for name, test_input, expected in task['tests']:
+            try:
+                run = _run_in_session(
+                    command, test_input, time_limit * 2 + 1, work_dir,
+                    _limit_resources(cpu_seconds, task['memory_limit'], MAX_PROCESSES)
+                )
+            except subprocess.TimeoutExpired:
+                status = 'TLE'
+            else:
+                if run.returncode < 0 and -run.returncode in _TIME_LIMIT_SIGNALS:
+                    status = 'TLE'
+                elif run.returncode != 0:
+                    status = 'RE'
+                elif _normalize_output(run.stdout) == _normalize_output(expected):
+                    status = 'AC'
+                else:
+                    status = 'WA'
+            result['cases'].append({'name': name, 'status': status})
+            if status == 'AC':
+                result['passed'] += 1
+        return result
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def format_judge_summary(result: Dict) -> str:
+    """
+    生成提示词中使用的简短测试结果
+
+    Args:
+        result: judge_code 的返回值
+
+    Returns:
+        如 "编译通过，测试用例通过 3/5（用例2: 答案错误，用例4: 超时），正确性建议约 30/50 分"
+    """
+    if not result['compiled']:
+        error = result['compile_error'].strip()
+        return f"编译失败（正确性最多得少量分数）:\n```\n{error}\n```" if error else "编译失败"
+    if not result['total']:
+        return "编译通过（该题没有测试用例，请阅读代码判断正确性）"
+
+    failed = [f"用例{case['name']}: {STATUS_LABELS[case['status']]}" for case in result['cases'] if case['status'] != 'AC']
+    summary = f"编译通过，测试用例通过 {result['passed']}/{result['total']}"
+    if failed:
+        summary += "（" + "，".join(failed[:5]) + ("，……" if len(failed) > 5 else "") + "）"
+    summary += f"，正确性建议约 {round(50 * result['passed'] / result['total'])}/50 分"
+    return summary
+
+
+def format_judge_label(result: Dict) -> str:
+    """汇总表格中使用的测试结果，如 "3/5" 或 "编译失败" """
+    if not result['compiled']:
+        return '编译失败'
+    if not result['total']:
+        return '编译通过'
+    return f"{result['passed']}/{result['total']}"
+
+
+class CompileJudge:
+    """编译测试器（结果按代码哈希缓存，缓存保存在输出目录，后续运行可继续复用）"""
+
+    CACHE_FILENAME = "judge_cache.json"
+
+    def __init__(
+        self,
+        output_dir: str = "./output",
+        testcase_dir: Optional[str] = None,
+        workers: Optional[int] = None,
+        time_limit: float = 1.0,
+        memory_limit: int = 256,
+        compiler: str = 'g++',
+        flags: Optional[List[str]] = None
+    ):
+        """
+        初始化编译测试器
+
+        Args:
+            output_dir: 输出目录（保存缓存）
+            testcase_dir: 测试用例目录，None时使用 config/testcases
+            workers: 进程池大小，None时使用CPU核数
+            time_limit: 每个测试用例的CPU时间限制（秒）
+            memory_limit: 内存限制（MB），0表示不限制
+            compiler: 编译器
+            flags: 编译参数
+        """
+        self.testcase_dir = testcase_dir or DEFAULT_TESTCASE_DIR
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.time_limit = time_limit
+        self.memory_limit = memory_limit
+        self.compiler = compiler
+        self.flags = flags if flags is not None else ['-std=c++17', '-O2', '-w']
+        self.cache_path = os.path.join(output_dir, self.CACHE_FILENAME)
+        self.cache: Dict[str, Dict] = {}
+        self._tests: Dict[str, list] = {}
+        self.cached_hits = 0
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+        if shutil.which(compiler) is None:
+            raise RuntimeError(f"未找到编译器: {compiler}")
+
+        self.isolation = detect_isolation()
+        if self.isolation == 'none':
+            print("⚠ 未找到可用的隔离方式（bwrap，或以root运行时的 unshare + setpriv），"
+                  "学生程序只在最小环境变量和资源限制下运行，请勿在保存密钥文件的账户下使用 --judge")
+
+        if os.path.exists(self.cache_path):
+            try:
+                with open(self.cache_path, 'r', encoding='utf-8') as f:
+                    self.cache = json.load(f)
+            except (OSError, ValueError):
+                self.cache = {}
+
+    def load_tests(self, problem_name: str) -> list:
+        """
+        加载一道题的测试用例
+
+        优先使用与题目名称同名的目录，否则使用"第N关"序号相同的目录。
+
+        Args:
+            problem_name: 题目名称
+
+        Returns:
+            [(用例名, 输入, 期望输出), ...]
+        """
+        if problem_name in self._tests:
+            return self._tests[problem_name]
+
+        case_dir = os.path.join(self.testcase_dir, problem_name)
+        if not os.path.isdir(case_dir):
+            case_dir = None
+            match = re.search(r'第(\d+)关', problem_name)
+            if match and os.path.isdir(self.testcase_dir):
+                for name in sorted(os.listdir(self.testcase_dir)):
+                    other = re.search(r'第(\d+)关', name)
+                    if other and other.group(1) == match.group(1):
+                        case_dir = os.path.join(self.testcase_dir, name)
+                        break
+
+        tests = []
+        if case_dir:
+            for file_name in sorted(os.listdir(case_dir)):
+                stem, ext = os.path.splitext(file_name)
+                expected_path = os.path.join(case_dir, stem + '.out')
+                if ext != '.in' or not os.path.exists(expected_path):
+                    continue
+                with open(os.path.join(case_dir, file_name), 'r', encoding='utf-8', errors='replace') as f:
+                    test_input = f.read()
+                with open(expected_path, 'r', encoding='utf-8', errors='replace') as f:
+                    expected = f.read()
+                tests.append((stem, test_input, expected))
+
+        self._tests[problem_name] = tests
+        return tests
+
+    def _cache_key(self, code: str, tests: list) -> str:
+        """代码、测试用例和编译参数共同决定测试结果"""
+        digest = hashlib.sha1()
+        for part in [code, self.compiler, *self.flags, str(self.time_limit), str(self.memory_limit)]:
+            digest.update(part.encode('utf-8', errors='replace') + b'\0')
+        for name, test_input, expected in tests:
+            digest.update(f"{name}\0{test_input}\0{expected}\0".encode('utf-8', errors='replace'))
+        return digest.hexdigest()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """
+        获取进程池（第一次使用时创建，多次调用共用）
+
+        进程由 forkserver 创建，在评价流水线的多个线程中调用时也不会从多线程进程中直接fork。
+        """
+        with self._lock:
+            if self._executor is None:
+                methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else None)
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+            return self._executor
+
+    def close(self):
+        """关闭进程池"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
+
+    def judge_all(self, submissions: List[Dict]) -> List[Dict]:
+        """
+        并行编译测试多份提交（相同代码只测试一次，已缓存的直接返回）
+
+        可以在多个线程中同时调用（如流水线读取阶段逐个学生调用），共用同一个进程池。
+
+        Args:
+            submissions: [{'problem_name', 'code', 'sources'（可选）}, ...]
+
+        Returns:
+            与submissions一一对应的测试结果
+        """
+        keys = []
+        pending = {}
+        for submission in submissions:
+            tests = self.load_tests(submission['problem_name'])
+            key = self._cache_key(submission['code'], tests)
+            keys.append(key)
+            with self._lock:
+                cached = key in self.cache
+            if not cached and key not in pending:
+                pending[key] = {
+                    'code': submission['code'],
+                    'sources': submission.get('sources'),
+                    'tests': tests,
+                    'compiler': self.compiler,
+                    'flags': self.flags,
+                    'time_limit': self.time_limit,
+                    'memory_limit': self.memory_limit,
+                    'isolation': self.isolation
+                }
+
+        if pending:
+            results = list(self._get_executor().map(judge_code, pending.values()))
+
+        with self._lock:
+            if pending:
+                self.cache.update(zip(pending.keys(), results))
+            self.cached_hits += len(submissions) - len(pending)
+            return [self.cache[key] for key in keys]
+
+    def save(self):
+        """保存缓存到输出目录"""
+        with self._lock:
+            os.makedirs(os.path.dirname(self.cache_path) or '.', exist_ok=True)
+            with open(self.cache_path, 'w', encoding='utf-8') as f:
+                json.dump(self.cache, f, ensure_ascii=False)
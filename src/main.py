@@ -2,8 +2,12 @@
 主程序 - C++作业自动评价系统
 整合所有模块，提供完整的评价流程
 """
+import difflib
+import json
 import os
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 import time
@@ -14,42 +18,243 @@ project_root = os.path.dirname(current_dir)
 sys.path.insert(0, current_dir)
 sys.path.insert(0, project_root)
 
-from extractor import HomeworkExtractor
-from llm_evaluator import get_evaluator
+from extractor import HomeworkExtractor, combine_sources
 from result_saver import ResultSaver
+from code_compactor import CodeCompactor
+from dedup import DedupIndex, code_hash, evaluation_fingerprint
+from triage import SubmissionTriage, TRIAGE_RULES
+from judge import CompileJudge, format_judge_summary, format_judge_label
+from code_metrics import compute_all as compute_code_metrics, format_metrics_summary
+from reference import ReferenceSolutions
+from problem_catalog import ProblemCatalog
+from roster import Roster
+from manifest import EvaluationManifest
+from similarity import cluster_near_duplicates
+from similarity_index import SimilarityIndex
+from pipeline import Pipeline, Stage
+from scheduler import LatencyModel, plan_schedule
+from planner import estimate_costs, simulate_wall_time, format_duration
+from evaluation_parser import (
+    parse_batch_evaluation, extract_score, is_complete_evaluation, CONFIDENCE_LABELED
+)
+from token_estimator import (
+    estimate_tokens, estimate_output_tokens, split_into_shards, pack_into_bins, OUTPUT_TOKENS_PER_PROBLEM,
+    CHARS_PER_TOKEN
+)
 
 # 导入prompts模块
-from config.prompts import get_batch_prompt
+from config.prompts import (
+    get_batch_prompt, get_single_prompt, get_problem_major_prompt, get_packed_prompt,
+    get_adaptive_verbosity_note,
+    get_delta_prompt,
+    BATCH_EVALUATION_PROMPT, SINGLE_EVALUATION_PROMPT, PROBLEM_MAJOR_EVALUATION_PROMPT,
+    PACKED_EVALUATION_PROMPT, DELTA_EVALUATION_PROMPT, ADAPTIVE_VERBOSITY_NOTE, SCORING_RUBRIC
+)
 import re
 
 
 class HomeworkEvaluationSystem:
     """作业评价系统"""
 
+    # 单题评价内容少于该长度时视为解析失败，需要补充评价
+    FOLLOWUP_MIN_LENGTH = 50
+
+    # 支持的评价粒度
+    GRANULARITIES = ('student', 'problem', 'problem-major')
+
+    # 合并评价时每个请求最多包含的学生数
+    MAX_STUDENTS_PER_PACK = 8
+
+    # 流水线阶段及默认工作线程数（llm阶段默认与并发请求数相同）
+    PIPELINE_STAGES = ('read', 'prompt', 'llm', 'parse', 'render', 'persist')
+    DEFAULT_STAGE_WORKERS = {'read': 2, 'prompt': 1, 'parse': 1, 'render': 1, 'persist': 1}
+
     def __init__(
         self,
-        zip_path: str,
+        zip_path,
         week: str = "02",
         api_provider: str = None,
-        output_dir: str = "./output"
+        output_dir: str = "./output",
+        followup: bool = True,
+        granularity: str = "student",
+        max_workers: int = 4,
+        compactor: CodeCompactor = None,
+        max_prompt_tokens: int = 24000,
+        max_output_tokens: int = 0,
+        pack_students: bool = False,
+        pack_threshold: int = 1500,
+        dedup: bool = True,
+        near_dup: bool = False,
+        near_dup_threshold: float = 0.85,
+        similarity_index: str = None,
+        similarity_threshold: float = 0.8,
+        stage_workers: dict = None,
+        queue_size: int = 4,
+        queue_monitor: float = 0,
+        schedule: bool = True,
+        fast_lane_ratio: float = 0.25,
+        dry_run: bool = False,
+        rate_limit: float = 0,
+        triage: bool = True,
+        template_dir: str = None,
+        judge: bool = False,
+        testcase_dir: str = None,
+        judge_workers: int = None,
+        time_limit: float = 1.0,
+        memory_limit: int = 256,
+        metrics: bool = False,
+        metrics_workers: int = None,
+        reference_dir: str = None,
+        reference_max_ratio: float = 0.5,
+        detail_threshold: int = None,
+        roster: str = None,
+        incremental: bool = False,
+        only_students: list = None,
+        only_problems: list = None,
+        only_status: str = None
     ):
         """
         初始化评价系统
 
         Args:
-            zip_path: ZIP文件路径
+            zip_path: ZIP文件路径，或按顺序叠加的多个ZIP文件路径（主导出 + 补交导出，后面的覆盖前面的同一学生）
             week: 周次
             api_provider: API提供商
             output_dir: 输出目录
+            followup: 是否对解析失败的题目单独发起补充评价
+            granularity: 评价粒度
+                - student: 每个学生的所有题目合并为一次请求
+                - problem: 每道题单独请求，并发执行
+                - problem-major: 按题目分组，将多名学生的同一道题打包为一次请求
+            max_workers: 并发请求数
+            compactor: 代码压缩器（仅压缩提示词中的代码），为None时原样发送代码
+            max_prompt_tokens: 单个请求的提示词token预算，超出时将学生的题目拆分为多个分片，0表示不限制
+            max_output_tokens: 单个请求的预估输出token预算，超出时同样拆分，0表示不限制（默认，按模型实际的输出上限设置）
+            pack_students: 是否将代码量较小的学生合并为一次请求（仅student粒度）
+            pack_threshold: 代码token数不超过该值的学生视为小学生，参与合并
+            dedup: 是否对相同代码去重（每份不同的代码只评价一次，索引按周次保存在输出目录中，更换模型或修改提示词后不复用）
+            near_dup: 是否对近似重复的代码聚类（每簇只完整评价代表代码，其余只发送差异）
+            near_dup_threshold: 近似重复的相似度阈值（0-1）
+            similarity_index: 持久化相似度索引（SQLite）路径，每次运行增量加入本周提交并生成相似度报告，None表示不启用
+            similarity_threshold: 相似度报告中列出的最低相似度（0-1）
+            stage_workers: 流水线各阶段的工作线程数，如 {'read': 2, 'llm': 8, 'render': 2}，未指定的阶段使用默认值
+            queue_size: 流水线阶段之间的队列容量（队列满时上游等待）
+            queue_monitor: 定期打印各阶段队列深度的间隔（秒），0表示不打印
+            schedule: 是否按预估耗时调度评价顺序（最长任务优先，小任务走快速通道），否则按学生名单顺序
+            fast_lane_ratio: 预估耗时不超过最大任务该比例的学生视为小任务
+            dry_run: 只生成评价计划（token、费用和耗时估算），不调用模型，也不加载任何模型SDK
+            rate_limit: 每分钟最多发起的请求数（用于评价计划的耗时估算），0表示不限制
+            triage: 是否在调用模型前快速判定空文件、未修改的模板和非代码内容（直接给出规则评价，不调用API）
+            template_dir: 起始模板目录（文件名为题目名称），与模板相同的提交判定为未修改的模板
+            judge: 是否在评价前用 g++ 编译并运行测试用例，将结果作为客观信息提供给模型
+            testcase_dir: 测试用例目录（<题目名称>/*.in 与同名 *.out），None时使用 config/testcases
+            judge_workers: 编译测试的进程数，None时使用CPU核数
+            time_limit: 每个测试用例的CPU时间限制（秒）
+            memory_limit: 测试程序的内存限制（MB）
+            metrics: 是否统计代码静态指标（行数、嵌套深度、圈复杂度、命名、魔法数字等），写入提示词和汇总表格
+            metrics_workers: 统计代码指标的进程数，None时使用CPU核数
+            reference_dir: 参考答案目录（每道题一个同名文件或目录），与参考答案高度相似的代码在提示词中只发送差异
+            reference_max_ratio: 差异的token数不超过完整代码的该比例时才只发送差异
+            detail_threshold: 自适应详略：模型先给出分数和一句话总评，只有低于该分数的题目才输出改进示范代码，None表示不启用
+            roster: 学生名单CSV（学号、姓名），按学号匹配学生文件夹并找出压缩包中缺少的学生，None表示从文件夹名称推断
+            incremental: 增量评价：与本周上次运行的评价清单比较，只重新评价新增或修改了代码的学生，其余学生沿用上次的结果
+            only_students: 选择性重新评价：只评价这些学生（学号或姓名），其余结果沿用本周上次的JSON
+            only_problems: 选择性重新评价：只评价这些题目（题目名称、题目编号或"第N关"）
+            only_status: 选择性重新评价：只评价上次为该状态的题目（'failed'：评价失败或没有分数）
         """
-        self.zip_path = zip_path
+        if granularity not in self.GRANULARITIES:
+            raise ValueError(f"不支持的评价粒度: {granularity}. 支持: {list(self.GRANULARITIES)}")
+
+        self.zip_paths = [zip_path] if isinstance(zip_path, str) else list(zip_path)
+        self.zip_path = self.zip_paths[0]
         self.week = week
         self.output_dir = output_dir
+        self.followup = followup
+        self.granularity = granularity
+        self.max_workers = max(1, max_workers)
+        self.compactor = compactor
+        self.max_prompt_tokens = max_prompt_tokens
+        self.max_output_tokens = max_output_tokens
+        self.pack_students = pack_students
+        self.pack_threshold = pack_threshold
 
         # 初始化各模块
-        self.extractor = HomeworkExtractor(zip_path)
-        self.evaluator = get_evaluator(provider=api_provider)
+        self.extractor = HomeworkExtractor(self.zip_paths)
+        self.dry_run = dry_run
+        self.rate_limit = rate_limit
+        if dry_run:
+            self.evaluator = None
+        else:
+            # 延迟导入，--dry-run 时不加载任何模型SDK
+            from llm_evaluator import get_evaluator
+            self.evaluator = get_evaluator(provider=api_provider)
         self.saver = ResultSaver(output_dir=output_dir)
+        self.catalog = ProblemCatalog(output_dir, week)
+        self.manifest = EvaluationManifest(output_dir, week)
+        # 叠加多个ZIP时只处理受补交影响的学生（其余学生沿用本周上次的结果）
+        self.incremental = incremental or len(self.zip_paths) > 1
+
+        # 选择性重新评价的筛选条件；未选中的题目沿用上次的评价（学生标识 -> 题目名称 -> 结果行）
+        self.rerun_filters = {
+            'students': set(only_students or []),
+            'problems': list(only_problems or []),
+            'status': only_status
+        }
+        self.rerun = any(self.rerun_filters.values())
+        self._previous_rows = {}
+        self._rerun_selection = {}
+        self.roster = None
+        if roster:
+            if os.path.exists(roster):
+                self.roster = Roster(roster)
+            else:
+                print(f"⚠ 学生名单不存在: {roster}")
+        self.dedup_index = None
+        if dedup:
+            # 模型和提示词模板决定评价内容，任一变化时不复用旧的评价
+            model = getattr(self.evaluator, 'model', None) or (api_provider or os.getenv('API_PROVIDER', 'openai'))
+            fingerprint = evaluation_fingerprint(
+                model, detail_threshold, SCORING_RUBRIC, BATCH_EVALUATION_PROMPT, SINGLE_EVALUATION_PROMPT,
+                PROBLEM_MAJOR_EVALUATION_PROMPT, PACKED_EVALUATION_PROMPT, DELTA_EVALUATION_PROMPT,
+                ADAPTIVE_VERBOSITY_NOTE
+            )
+            self.dedup_index = DedupIndex(output_dir, week, fingerprint)
+        self.triage = SubmissionTriage(template_dir) if triage else None
+        self.metrics = metrics
+        self.metrics_workers = metrics_workers
+        self.detail_threshold = detail_threshold
+        self.references = None
+        if reference_dir:
+            if os.path.isdir(reference_dir):
+                self.references = ReferenceSolutions(reference_dir, max_ratio=reference_max_ratio)
+                print(f"✓ 已加载参考答案目录: {reference_dir} ({len(self.references.entries)} 道题)")
+            else:
+                print(f"⚠ 参考答案目录不存在: {reference_dir}")
+        self.judge = None
+        if judge and not dry_run:
+            try:
+                self.judge = CompileJudge(
+                    output_dir, testcase_dir=testcase_dir, workers=judge_workers,
+                    time_limit=time_limit, memory_limit=memory_limit
+                )
+            except RuntimeError as e:
+                print(f"⚠ {str(e)}，已禁用编译测试")
+        self.near_dup = near_dup
+        self.near_dup_threshold = near_dup_threshold
+        self.similarity_index_path = similarity_index
+        self.similarity_threshold = similarity_threshold
+
+        # 逐题并发模式下每个学生内部已经并发请求，llm阶段默认逐个学生处理
+        self.stage_workers = dict(self.DEFAULT_STAGE_WORKERS)
+        self.stage_workers['llm'] = self.max_workers if granularity != 'problem' else 1
+        for name, workers in (stage_workers or {}).items():
+            if name not in self.PIPELINE_STAGES:
+                raise ValueError(f"未知的流水线阶段: {name}. 支持: {list(self.PIPELINE_STAGES)}")
+            self.stage_workers[name] = max(1, workers)
+        self.queue_size = max(1, queue_size)
+        self.queue_monitor = queue_monitor
+        self.schedule = schedule
+        self.fast_lane_ratio = fast_lane_ratio
 
         # 评价结果列表
         self.results = []
@@ -57,6 +262,71 @@ class HomeworkEvaluationSystem:
         # 时间记录
         self.time_records = []
 
+        # 补充评价统计
+        self.followup_stats = {'requests': 0, 'recovered': 0}
+
+        # 代码压缩统计（估算的token数）
+        self.compaction_stats = {'files': 0, 'original_tokens': 0, 'compacted_tokens': 0}
+
+        # 分片统计
+        self.shard_stats = {'students': 0, 'shards': 0}
+
+        # 按题目跨学生批量评价统计
+        self.problem_major_stats = {'problems': 0, 'submissions': 0, 'requests': 0}
+
+        # 多学生合并评价统计
+        self.pack_stats = {'students': 0, 'requests': 0, 'fallback': 0}
+
+        # 去重统计
+        self.dedup_stats = {'duplicates': 0, 'saved_calls': 0}
+
+        # 快速判定统计（判定类别 -> 题目数；无需调用API的学生数和节省的请求数）
+        self.triage_stats = {'categories': {}, 'students': 0, 'saved_calls': 0}
+
+        # 模型输出统计（估算的token数）
+        self.output_stats = {'requests': 0, 'problems': 0, 'output_tokens': 0,
+                             'brief': 0, 'brief_tokens': 0, 'detailed': 0, 'detailed_tokens': 0}
+
+        # 增量评价统计（沿用上次结果的学生数；重新评价的学生中新增和修改的题目数）
+        self.incremental_stats = {'carried': 0, 'added': 0, 'changed': 0}
+
+        # 参考答案差异统计（发送差异的题目数，完整代码与差异的token数）
+        self.reference_stats = {'problems': 0, 'original_tokens': 0, 'diff_tokens': 0}
+
+        # 编译测试统计
+        self.judge_stats = {'submissions': 0, 'cached': 0, 'compile_failed': 0, 'passed': 0, 'total': 0}
+
+        # 近似重复聚类：(学生标识, 题目名称) -> 代表提交；代表提交 -> 代码和评价
+        self.near_dup_members = {}
+        self.near_dup_reps = {}
+        self.near_dup_stats = {'clusters': 0, 'members': 0, 'delta_evaluated': 0}
+
+        # 跨周次相似度索引统计
+        self.similarity_stats = {'indexed': 0, 'total': 0, 'matches': 0}
+
+        # 流水线各阶段统计
+        self.pipeline_stats = []
+
+        # 调度统计（预计与实际的评价阶段完成时间）
+        self.schedule_stats = {}
+
+        # 已读取的学生代码（学生标识 -> 题目列表），避免预处理阶段重复读取
+        self._problem_cache = {}
+
+        # 统计数据在流水线的多个线程中累加
+        self._stats_lock = threading.Lock()
+
+        # 同时进行的模型请求数上限（流水线的llm阶段与学生内部的并发请求共用），
+        # 避免嵌套的线程池同时发出 max_workers² 个请求
+        self._request_slots = threading.BoundedSemaphore(self.max_workers)
+
+        # 正在完整评价的内容（代码哈希或近似重复簇 -> 评价记录完成时触发的事件）
+        self._inflight = {}
+
+        # 已在llm阶段登记内容（或已失败）的任务序号，无需调用模型的学生等前面的学生都登记后再送入流水线
+        self._claimed_jobs = set()
+        self._claim_condition = threading.Condition()
+
     def run(self, save_pdf: bool = True, save_excel: bool = False, save_json: bool = True):
         """
         运行完整的评价流程
@@ -76,7 +346,7 @@ class HomeworkEvaluationSystem:
         print("=" * 60)
         print("C++作业自动评价系统")
         print("=" * 60)
-        print(f"ZIP文件: {self.zip_path}")
+        print(f"ZIP文件: {', '.join(self.zip_paths)}")
         print(f"作业周次: 第{self.week}周")
         print(f"输出目录: {self.output_dir}")
         print(f"开始时间: {start_datetime.strftime('%Y-%m-%d %H:%M:%S')}")
@@ -84,8 +354,12 @@ class HomeworkEvaluationSystem:
 
         # 1. 解压ZIP文件
         print("\n[步骤 1/4] 解压ZIP文件...")
+        # 增量评价时，ZIP文件列表签名与上次相同的学生沿用上次的结果，不解压也不读取代码
+        skip = None
+        if self.incremental and not self.rerun:
+            skip = lambda key, signature: self.manifest.lookup_signature(key, signature) is not None
         try:
-            extract_path = self.extractor.extract_zip()
+            extract_path = self.extractor.extract_zip(roster=self.roster, skip=skip)
         except Exception as e:
             print(f"✗ 解压失败: {str(e)}")
             return []
@@ -94,12 +368,15 @@ class HomeworkEvaluationSystem:
         print("\n[步骤 2/4] 扫描学生和作业文件...")
         try:
             # 获取所有学生（包括未提交的）
-            all_students = self.extractor.get_all_students()
+            all_students = self.extractor.get_all_students(roster=self.roster)
 
             if not all_students:
                 print("✗ 未找到学生文件夹")
                 return []
 
+            # 题目目录：原始文件夹名称 -> 稳定的题目编号、关卡序号和显示名称
+            self.catalog.build(all_students)
+
             # 统计未提交作业的学生
             not_submitted_students = [s for s in all_students if not s['has_submission']]
             submitted_students = [s for s in all_students if s['has_submission']]
@@ -109,14 +386,15 @@ class HomeworkEvaluationSystem:
                 for student in not_submitted_students:
                     student_name = student['student_name']
                     student_id = student.get('student_id', '')
-                    print(f"   - {student_id} {student_name}" if student_id else f"   - {student_name}")
+                    note = "（压缩包中没有该学生）" if student.get('missing') else ""
+                    print(f"   - {student_id} {student_name}{note}" if student_id else f"   - {student_name}{note}")
                     # 记录未提交的学生
                     self.results.append({
                         'student_name': student_name,
                         'student_id': student_id,
                         'file_name': '未提交',
                         'file_path': '',
-                        'evaluation': '该学生未提交作业',
+                        'evaluation': '该学生未提交作业' + note,
                         'score': 0,
                         'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
                         'status': 'not_submitted'
@@ -126,161 +404,109 @@ class HomeworkEvaluationSystem:
             print(f"✗ 扫描失败: {str(e)}")
             return []
 
+        # 选择性重新评价：只评价选中的学生和题目，其余沿用上次的JSON；
+        # 增量评价：提交没有变化的学生沿用上次的结果，只评价新增或修改了代码的学生
+        scanned_students = submitted_students
+        carried_rows = {}
+        previous_results = None
+        if self.rerun:
+            previous_results = self._select_rerun(submitted_students)
+            if previous_results is None:
+                return []
+            submitted_students = [s for s in submitted_students if self._student_key(s) in self._rerun_selection]
+        elif self.incremental:
+            submitted_students, carried_rows = self._split_unchanged_students(submitted_students)
+
+        if self.dry_run:
+            self._plan_dry_run(submitted_students)
+            self.extractor.cleanup()
+            return []
+
         # 3. 批量评价已提交的作业（优化：一个学生的所有题目一次性评价）
         print(f"\n[步骤 3/4] 开始批量评价 (共{len(submitted_students)}个学生)...")
-        print("💡 提示：现在使用批量评价模式，每个学生的所有题目一次性评价，速度更快！")
+        if self.granularity == 'problem':
+            print(f"💡 提示：现在使用逐题并发评价模式，每道题单独请求（并发数: {self.max_workers}）")
+        elif self.granularity == 'problem-major':
+            print(f"💡 提示：现在使用按题目跨学生批量模式，同一道题的多名学生打包评价（并发数: {self.max_workers}）")
+        else:
+            print("💡 提示：现在使用批量评价模式，每个学生的所有题目一次性评价，速度更快！")
         print("💡 评价完一个学生立即生成PDF，无需等待所有人评价完成")
+        print("💡 流水线线程数: " + "，".join(f"{name} {self.stage_workers[name]}" for name in self.PIPELINE_STAGES))
         print("-" * 60)
 
-        pdf_count = 0
-        for idx, student in enumerate(submitted_students, 1):
-            student_name = student['student_name']
-            student_id = student.get('student_id', '')
-            num_problems = student['file_count']
-
-            # 记录学生评价开始时间
-            student_start_time = time.time()
-
-            print(f"\n[{idx}/{len(submitted_students)}] 评价学生: {student_id} {student_name} ({num_problems}道题)")
+        # 近似重复聚类和相似度索引需要先读取所有学生的代码；其余情况下代码在流水线的读取阶段逐个学生读取
+        if self.near_dup:
+            self._build_near_dup_clusters(submitted_students)
 
+        # 更新持久化相似度索引，并生成本次的相似度报告
+        if self.similarity_index_path:
             try:
-                # 收集该学生的所有题目代码
-                all_problems = []
-                for file_info in student['files']:
-                    file_path = file_info['file_path']
-                    file_name = file_info['file_name']
-
-                    # 从路径中提取题目名称
-                    problem_name = self._extract_problem_name(file_info['relative_path'])
-
-                    # 读取代码
-                    code = self.extractor.read_code(file_path)
-
-                    all_problems.append({
-                        'problem_name': problem_name,
-                        'file_name': file_name,
-                        'file_path': file_path,
-                        'code': code
-                    })
-
-                # 【修复】按题目名称排序，确保"第1关"、"第2关"...的顺序正确
-                def extract_problem_number(problem_name):
-                    """从题目名称中提取数字用于排序"""
-                    import re
-                    match = re.search(r'第(\d+)关', problem_name)
-                    if match:
-                        return int(match.group(1))
-                    return 999  # 没有匹配的放到最后
-
-                all_problems.sort(key=lambda p: extract_problem_number(p['problem_name']))
-
-                # 生成批量评价提示词
-                batch_prompt = get_batch_prompt(
-                    student_name=student_name,
-                    student_id=student_id,
-                    all_problems=all_problems,
-                    week=self.week
-                )
-
-                # 一次性调用API评价所有题目
-                print(f"   正在评价 {num_problems} 道题...")
-                batch_evaluation = self.evaluator.evaluate(batch_prompt)
-
-                # 解析批量评价结果
-                problem_evaluations = self._parse_batch_evaluation(batch_evaluation, all_problems)
-
-                # 准备该学生的所有评价数据
-                student_evaluations = []
-
-                # 记录每道题的评价结果
-                for problem, evaluation_data in zip(all_problems, problem_evaluations):
-                    result = {
-                        'student_name': student_name,
-                        'student_id': student_id,
-                        'file_name': problem['file_name'],
-                        'file_path': problem['file_path'],
-                        'problem_name': problem['problem_name'],
-                        'evaluation': evaluation_data['evaluation'],
-                        'score': evaluation_data['score'],
-                        'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                        'status': 'evaluated'
-                    }
-                    self.results.append(result)
-
-                    # 【修复】添加到学生评价列表（用于生成PDF），包含代码和problem_name
-                    student_evaluations.append({
-                        'file_name': problem['file_name'],
-                        'problem_name': problem['problem_name'],
-                        'code': problem['code'],  # 添加学生代码
-                        'evaluation': evaluation_data['evaluation'],
-                        'score': evaluation_data['score'],
-                        'timestamp': result['timestamp']
-                    })
-
-                # 计算平均分
-                scores = [e['score'] for e in problem_evaluations if e['score'] is not None]
-                avg_score = sum(scores) / len(scores) if scores else 0
-
-                # 计算该学生的评价时间
-                student_elapsed_time = time.time() - student_start_time
-
-                print(f"✓ 评价完成 (平均分: {avg_score:.1f}/100，{len(scores)}/{num_problems}题，耗时: {student_elapsed_time:.1f}秒)")
-
-                # 记录时间
-                self.time_records.append({
-                    'student_name': student_name,
-                    'student_id': student_id,
-                    'num_problems': num_problems,
-                    'time_seconds': student_elapsed_time,
-                    'time_formatted': f"{int(student_elapsed_time // 60)}分{int(student_elapsed_time % 60)}秒",
-                    'status': 'success'
-                })
-
-                # 【关键修改】评价完立即生成PDF
-                if save_pdf and student_evaluations:
-                    try:
-                        print(f"   正在生成PDF报告...")
-                        self.saver.save_student_pdf(
-                            student_name=student_name,
-                            student_id=student_id,
-                            evaluations=student_evaluations,
-                            week=self.week
-                        )
-                        pdf_count += 1
-                        print(f"✓ PDF报告已生成")
-                    except Exception as e:
-                        print(f"⚠ PDF生成失败: {str(e)}")
-
+                self._update_similarity_index(submitted_students)
             except Exception as e:
-                # 计算失败时的时间
-                student_elapsed_time = time.time() - student_start_time
-
-                print(f"✗ 评价失败: {str(e)} (耗时: {student_elapsed_time:.1f}秒)")
-
-                # 记录失败的时间
-                self.time_records.append({
-                    'student_name': student_name,
-                    'student_id': student_id,
-                    'num_problems': num_problems,
-                    'time_seconds': student_elapsed_time,
-                    'time_formatted': f"{int(student_elapsed_time // 60)}分{int(student_elapsed_time % 60)}秒",
-                    'status': 'failed',
-                    'error': str(e)
-                })
-
-                # 记录失败信息（为该学生的每个文件都记录失败）
-                for problem in all_problems if 'all_problems' in locals() else student['files']:
-                    self.results.append({
-                        'student_name': student_name,
-                        'student_id': student_id,
-                        'file_name': problem.get('file_name', ''),
-                        'file_path': problem.get('file_path', ''),
-                        'problem_name': problem.get('problem_name', ''),
-                        'evaluation': f"评价失败: {str(e)}",
-                        'score': None,
-                        'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                        'status': 'failed'
-                    })
+                print(f"✗ 相似度索引更新失败: {str(e)}")
+
+        # 预先完成评价的学生（学生标识 -> (题目列表, 评价列表)）
+        precomputed = {}
+        if self.granularity == 'problem-major':
+            precomputed = self._evaluate_problem_major(submitted_students)
+        elif self.granularity == 'student' and self.pack_students and not self.rerun:
+            # 选择性重新评价的学生需要沿用未选中题目的评价，不参与合并评价
+            precomputed = self._evaluate_packed_students(submitted_students)
+
+        # 流水线：读取 → 提示词 → 调用模型 → 整理结果 → 生成PDF → 保存
+        # 后续学生的读取和提示词生成与正在进行的API调用、PDF渲染同时进行
+        # 预先完成的评价立即记录到去重索引，流水线中相同代码的学生可以直接复用
+        for student in submitted_students:
+            entry = precomputed.get(self._student_key(student))
+            if entry:
+                self._record_evaluations(student, *entry)
+
+        # 按预估耗时调度评价顺序（最长任务优先 + 小任务快速通道），结果仍按学生名单顺序保存
+        projected = {}
+        ordered = list(range(len(submitted_students)))
+        deferred = 0
+        if self.schedule and len(submitted_students) > 1:
+            ordered, projected = self._schedule_students(submitted_students, precomputed)
+            deferred = self.schedule_stats['deferred']
+
+        self._claimed_jobs = set()
+        jobs = self._pipeline_jobs(submitted_students, ordered, precomputed, projected, save_pdf, deferred)
+        pipeline = Pipeline([
+            Stage('read', self._stage_read, self.stage_workers['read']),
+            Stage('prompt', self._stage_prompt, self.stage_workers['prompt']),
+            Stage('llm', self._stage_llm, self.stage_workers['llm']),
+            Stage('parse', self._stage_parse, self.stage_workers['parse']),
+            Stage('render', self._stage_render, self.stage_workers['render']),
+            Stage('persist', self._stage_persist, self.stage_workers['persist'], handle_errors=True),
+        ], queue_size=self.queue_size, monitor_interval=self.queue_monitor)
+
+        self._persisted = {}
+        pipeline_start_time = time.time()
+        try:
+            pipeline.run(jobs)
+        finally:
+            if self.judge is not None:
+                self.judge.close()
+        self.pipeline_stats = pipeline.summary()
+        if self.schedule_stats:
+            self.schedule_stats['actual_makespan'] = time.time() - pipeline_start_time
+
+        # 按学生顺序汇总结果（流水线中各学生完成的先后顺序不固定）
+        pdf_count = 0
+        evaluated_rows = {}
+        for order in sorted(self._persisted):
+            rows, time_record, pdf_saved = self._persisted[order]
+            key = self._student_key(submitted_students[order])
+            evaluated_rows[key] = rows
+            self.time_records.append(time_record)
+            pdf_count += pdf_saved
+        # 沿用上次结果的学生按名单顺序放回
+        if previous_results is not None:
+            self.results = self._merge_rerun_rows(previous_results[1], evaluated_rows)
+        else:
+            for student in scanned_students:
+                key = self._student_key(student)
+                self.results.extend(evaluated_rows.get(key) or carried_rows.get(key) or [])
 
         # 4. 保存结果
         print(f"\n[步骤 4/4] 保存评价结果...")
@@ -299,10 +525,40 @@ class HomeworkEvaluationSystem:
 
         if save_json and self.results:
             try:
-                self.saver.save_json(self.results, week=self.week)
+                # 选择性重新评价时在上次的JSON中原地替换
+                self.saver.save_json(
+                    self.results, week=self.week,
+                    filename=os.path.basename(previous_results[0]) if previous_results and previous_results[0] else None
+                )
             except Exception as e:
                 print(f"✗ JSON保存失败: {str(e)}")
 
+        if self.dedup_index is not None:
+            try:
+                self.dedup_index.save()
+            except Exception as e:
+                print(f"✗ 去重索引保存失败: {str(e)}")
+
+        if self.judge is not None:
+            self.judge_stats['cached'] = self.judge.cached_hits
+            try:
+                self.judge.save()
+            except Exception as e:
+                print(f"✗ 编译测试缓存保存失败: {str(e)}")
+
+        try:
+            self.catalog.save()
+        except Exception as e:
+            print(f"✗ 题目目录保存失败: {str(e)}")
+
+        try:
+            self.manifest.save()
+        except Exception as e:
+            print(f"✗ 评价清单保存失败: {str(e)}")
+
+        # 代码已读入内存，删除本次运行的解压目录
+        self.extractor.cleanup()
+
         # 【新增】保存时间统计
         if self.time_records:
             try:
@@ -356,324 +612,2203 @@ class HomeworkEvaluationSystem:
             print(f"  - 最快: {fastest['student_name']} ({fastest['time_formatted']})")
             print(f"  - 最慢: {slowest['student_name']} ({slowest['time_formatted']})")
 
+        if self.compaction_stats['files']:
+            original = self.compaction_stats['original_tokens']
+            compacted = self.compaction_stats['compacted_tokens']
+            saved = original - compacted
+            ratio = saved / original * 100 if original else 0
+            print(f"\n代码压缩 (第{self.week}周): {self.compaction_stats['files']} 个文件，"
+                  f"约 {original} → {compacted} tokens，节省约 {saved} tokens ({ratio:.1f}%)")
+
+        if self.shard_stats['students']:
+            print(f"\n分片评价: {self.shard_stats['students']} 个学生超出token预算，"
+                  f"拆分为 {self.shard_stats['shards']} 个请求")
+
+        if self.problem_major_stats['requests']:
+            print(f"\n按题目批量评价: {self.problem_major_stats['problems']} 道题，"
+                  f"{self.problem_major_stats['submissions']} 份提交，"
+                  f"共 {self.problem_major_stats['requests']} 次请求")
+
+        if self.pack_stats['requests']:
+            print(f"\n合并评价: {self.pack_stats['students']} 个小学生合并为 {self.pack_stats['requests']} 次请求"
+                  + (f"，{self.pack_stats['fallback']} 人解析失败已单独重新评价" if self.pack_stats['fallback'] else ""))
+
+        if self.dedup_stats['duplicates']:
+            print(f"\n去重: 发现 {self.dedup_stats['duplicates']} 份重复提交，"
+                  f"节省 {self.dedup_stats['saved_calls']} 次API调用")
+
+        if self.triage_stats['categories']:
+            categories = self.triage_stats['categories']
+            print(f"\n快速判定: {sum(categories.values())} 道题直接给出规则评价（"
+                  + "，".join(f"{TRIAGE_RULES[c][0]} {n}" for c, n in categories.items()) + "），"
+                  f"{self.triage_stats['students']} 名学生无需调用API"
+                  + (f"，节省 {self.triage_stats['saved_calls']} 次API调用" if self.triage_stats['saved_calls'] else ""))
+
+        if self.reference_stats['problems']:
+            original = self.reference_stats['original_tokens']
+            diff = self.reference_stats['diff_tokens']
+            print(f"\n参考答案差异: {self.reference_stats['problems']} 道题只发送差异，"
+                  f"代码部分约 {original} → {diff} tokens"
+                  + (f"（约为原来的 {diff / original * 100:.0f}%）" if original else ""))
+
+        if self.judge_stats['submissions']:
+            print(f"\n编译测试: {self.judge_stats['submissions']} 份提交，"
+                  f"编译失败 {self.judge_stats['compile_failed']} 份，"
+                  f"测试用例通过 {self.judge_stats['passed']}/{self.judge_stats['total']}"
+                  + (f"，{self.judge_stats['cached']} 份复用已有结果" if self.judge_stats['cached'] else ""))
+
+        if self.near_dup_stats['clusters']:
+            print(f"\n近似重复: {self.near_dup_stats['clusters']} 个簇，{self.near_dup_stats['members']} 份相似提交，"
+                  f"其中 {self.near_dup_stats['delta_evaluated']} 份使用差异评价")
+
+        if self.similarity_stats['total']:
+            print(f"\n相似度索引: 新增 {self.similarity_stats['indexed']} 份提交（共 {self.similarity_stats['total']} 份），"
+                  f"发现 {self.similarity_stats['matches']} 条相似度不低于 {self.similarity_threshold:.2f} 的相似记录")
+
+        if self.schedule_stats.get('actual_makespan') is not None:
+            print(f"\n调度: 最长任务优先，{self.schedule_stats['fast_lane']} 个小任务走快速通道，"
+                  f"预计评价阶段耗时 {self.schedule_stats['projected_makespan']:.1f}秒，"
+                  f"实际 {self.schedule_stats['actual_makespan']:.1f}秒"
+                  f"（参考 {self.schedule_stats['history']} 条历史记录）")
+
+        if self.pipeline_stats:
+            print(f"\n流水线（队列容量 {self.queue_size}）:")
+            for stage in self.pipeline_stats:
+                print(f"  - {stage['name']}: {stage['workers']} 个线程，处理 {stage['processed']} 个学生，"
+                      f"累计耗时 {stage['busy_seconds']:.1f}秒，最大队列深度 {stage['max_depth']}"
+                      + (f"，失败 {stage['errors']} 个" if stage['errors'] else ""))
+
+        if self.detail_threshold is not None and self.output_stats['requests']:
+            self._print_adaptive_detail_summary()
+
+        if self.incremental:
+            print(f"\n增量评价: 沿用上次结果 {self.incremental_stats['carried']} 人，"
+                  f"重新评价 {len(scanned_students) - self.incremental_stats['carried']} 人"
+                  f"（新增 {self.incremental_stats['added']} 道题，修改 {self.incremental_stats['changed']} 道题）")
+
+        if self.followup_stats['requests']:
+            print(f"\n补充评价: 发起 {self.followup_stats['requests']} 次单题请求，"
+                  f"成功补全 {self.followup_stats['recovered']} 道题")
+
         print("=" * 60)
 
         return self.results
 
-    def _save_time_report(self):
-        """
-        保存时间统计报告
+    def _pipeline_jobs(
+        self,
+        students: list,
+        ordered: list,
+        precomputed: dict,
+        projected: dict,
+        save_pdf: bool,
+        deferred: int = 0
+    ):
         """
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        report_path = os.path.join(self.output_dir, f"第{self.week}周_时间统计_{timestamp}.txt")
-
-        with open(report_path, 'w', encoding='utf-8') as f:
-            f.write("=" * 60 + "\n")
-            f.write("C++作业评价系统 - 时间统计报告\n")
-            f.write("=" * 60 + "\n\n")
-
-            f.write(f"作业周次: 第{self.week}周\n")
-            f.write(f"报告生成时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
-
-            f.write("-" * 60 + "\n")
-            f.write("详细时间记录（每个学生）\n")
-            f.write("-" * 60 + "\n\n")
+        按调度顺序生成流水线任务
 
-            # 按时间排序
-            sorted_records = sorted(self.time_records, key=lambda x: x['time_seconds'], reverse=True)
+        排在最后的 deferred 个学生（调度时判断为无需调用模型）复用前面学生的评价：等前面的学生都在llm阶段
+        登记了要评价的内容（或已失败）再送入流水线，避免它们因读取较快而先登记、反而由前面的学生等待复用。
+        只阻塞送入任务的主线程，不占用流水线的工作线程。
 
-            f.write(f"{'序号':<6} {'学号':<15} {'姓名':<12} {'题目数':<8} {'耗时':<15} {'状态':<8}\n")
-            f.write("-" * 80 + "\n")
+        Args:
+            students: 已提交作业的学生列表
+            ordered: 评价顺序（students的下标列表）
+            precomputed: 已预先完成评价的学生
+            projected: 下标 -> 预估耗时
+            save_pdf: 是否生成PDF
+            deferred: 排在最后、无需调用模型的学生数
+        """
+        first_deferred = len(ordered) - deferred + 1
+        for idx, order in enumerate(ordered, 1):
+            if idx == first_deferred and idx > 1:
+                with self._claim_condition:
+                    self._claim_condition.wait_for(lambda: len(self._claimed_jobs) >= idx - 1)
+            yield {
+                'idx': idx,
+                'order': order,
+                'total': len(students),
+                'student': students[order],
+                'precomputed': precomputed.get(self._student_key(students[order])),
+                'projected_seconds': projected.get(order),
+                'save_pdf': save_pdf
+            }
+
+    def _mark_claimed(self, job: dict):
+        """记录一个学生已登记要评价的内容（或已失败），见 _pipeline_jobs"""
+        with self._claim_condition:
+            self._claimed_jobs.add(job.get('idx'))
+            self._claim_condition.notify_all()
+
+    def _stage_read(self, job: dict) -> dict:
+        """
+        流水线阶段：读取学生代码（已预先完成评价的学生直接使用已读取的题目）
 
-            for idx, record in enumerate(sorted_records, 1):
-                status_display = '成功' if record['status'] == 'success' else '失败'
-                f.write(
-                    f"{idx:<6} "
-                    f"{record['student_id']:<15} "
-                    f"{record['student_name']:<12} "
-                    f"{record['num_problems']:<8} "
-                    f"{record['time_formatted']:<15} "
-                    f"{status_display:<8}\n"
+        读取的题目不保留在缓存中，流水线中只有有界队列里的学生占用内存。
+        """
+        job['start_time'] = time.time()
+        if job['precomputed']:
+            job['all_problems'] = job['precomputed'][0]
+        else:
+            job['all_problems'] = self._read_student_problems(job['student'], cache=False)
+        return job
+
+    def _stage_prompt(self, job: dict) -> dict:
+        """流水线阶段：预先生成批量评价提示词（仅student粒度）"""
+        if not job['precomputed'] and self.granularity == 'student':
+            student = job['student']
+            job['batch_prompt'] = get_batch_prompt(
+                student_name=student['student_name'],
+                student_id=student.get('student_id', ''),
+                all_problems=job['all_problems'],
+                week=self.week
+            )
+        return job
+
+    def _stage_llm(self, job: dict) -> dict:
+        """流水线阶段：调用模型评价（包括解析回复和补充评价，补充评价需要根据解析结果决定）"""
+        student = job['student']
+        student_name = student['student_name']
+        student_id = student.get('student_id', '')
+        print(f"\n[{job['idx']}/{job['total']}] 评价学生: {student_id} {student_name} ({student['file_count']}道题)")
+
+        start_time = time.time()
+        if job['precomputed']:
+            # 已在按题目分组阶段完成评价
+            self._mark_claimed(job)
+            job['problem_evaluations'] = job['precomputed'][1]
+        else:
+            # 相同代码或同一近似重复簇正由其他学生评价时，先评价其余题目，再等待其记录后复用或发送差异评价
+            all_problems = job['all_problems']
+            try:
+                claimed, waiting = self._claim_content(student, all_problems)
+            finally:
+                self._mark_claimed(job)
+            ready = [idx for idx in range(len(all_problems)) if idx not in waiting]
+            try:
+                print(f"   正在评价 {student['file_count']} 道题...")
+                if waiting:
+                    print(f"   ⏳ {len(waiting)} 道题与其他学生正在评价的代码相同或近似，稍后复用其评价")
+                evaluations = self._evaluate_and_record(
+                    student, all_problems, ready,
+                    batch_prompt=None if waiting else job.get('batch_prompt'), partial=bool(waiting)
                 )
+            finally:
+                self._release_content(claimed, ready)
 
-                # 如果有错误信息，也记录
-                if 'error' in record:
-                    f.write(f"       错误: {record['error']}\n")
-
-            # 统计信息
-            f.write("\n" + "=" * 60 + "\n")
-            f.write("统计摘要\n")
-            f.write("=" * 60 + "\n\n")
+            if waiting:
+                try:
+                    for events in waiting.values():
+                        for event in events:
+                            event.wait()
+                    evaluations.update(self._evaluate_and_record(student, all_problems, sorted(waiting), partial=True))
+                finally:
+                    self._release_content(claimed, waiting)
+            job['problem_evaluations'] = [evaluations[idx] for idx in range(len(all_problems))]
+        job['llm_seconds'] = time.time() - start_time
+        return job
+
+    def _evaluate_and_record(
+        self,
+        student: dict,
+        all_problems: list,
+        indices: list,
+        batch_prompt: str = None,
+        partial: bool = False
+    ) -> dict:
+        """
+        评价一个学生的部分题目，并将评价记录到去重索引和近似重复簇
 
-            success_records = [r for r in self.time_records if r['status'] == 'success']
-            total_time = sum(r['time_seconds'] for r in self.time_records)
+        Args:
+            student: 学生信息
+            all_problems: 题目列表
+            indices: 要评价的题目下标
+            batch_prompt: 预先生成的批量评价提示词（仅在评价全部题目时可用）
+            partial: 是否只是该学生的一部分题目（见 _evaluate_student_problems）
 
-            f.write(f"总学生数: {len(self.time_records)}\n")
-            f.write(f"成功评价: {len(success_records)}\n")
-            f.write(f"评价失败: {len(self.time_records) - len(success_records)}\n\n")
+        Returns:
+            题目下标 -> 评价数据
+        """
+        if not indices:
+            return {}
+        problems = [all_problems[idx] for idx in indices]
+        problem_evaluations = self._evaluate_student_problems(
+            student['student_name'], student.get('student_id', ''), problems,
+            batch_prompt=batch_prompt, partial=partial
+        )
+        self._record_evaluations(student, problems, problem_evaluations)
+        return dict(zip(indices, problem_evaluations))
 
-            f.write(f"总耗时: {int(total_time // 60)}分{int(total_time % 60)}秒\n")
+    def _claim_content(self, student: dict, all_problems: list) -> tuple:
+        """
+        登记该学生即将完整评价的内容（代码哈希、还没有参照评价的近似重复簇）
 
-            if success_records:
-                avg_time = sum(r['time_seconds'] for r in success_records) / len(success_records)
-                f.write(f"平均每人耗时: {int(avg_time // 60)}分{int(avg_time % 60)}秒\n\n")
+        流水线的llm阶段有多个线程时，内容已由其他学生登记的题目不重复评价，而是等待对方记录完评价后
+        复用或发送差异评价，保持与逐个评价时相同的去重效果。锁只保护登记本身，不跨越API调用；
+        学生只等待比自己先登记的学生，不会死锁。
 
-                fastest = min(success_records, key=lambda x: x['time_seconds'])
-                slowest = max(success_records, key=lambda x: x['time_seconds'])
+        Args:
+            student: 学生信息
+            all_problems: 题目列表
 
-                f.write(f"最快: {fastest['student_name']} ({fastest['time_formatted']})\n")
-                f.write(f"最慢: {slowest['student_name']} ({slowest['time_formatted']})\n")
+        Returns:
+            (题目下标 -> 本学生登记的键列表, 题目下标 -> 需要等待的事件列表)
+        """
+        student_key = self._student_key(student)
+        claimed = {}
+        waiting = {}
+        with self._stats_lock:
+            for idx, problem in enumerate(all_problems):
+                if problem.get('triage'):
+                    continue
+                keys = []
+                # 选择性重新评价时不复用索引中的评价，无需等待相同代码
+                if self.dedup_index is not None and not self.rerun:
+                    keys.append(('dedup', code_hash(problem['problem_name'], problem['code'])))
+                member_key = (student_key, problem['problem_id'])
+                rep_key = self.near_dup_members.get(member_key, member_key)
+                rep = self.near_dup_reps.get(rep_key)
+                if rep is not None and rep.get('evaluation') is None:
+                    keys.append(('near_dup', rep_key))
+
+                events = [self._inflight[key] for key in keys if key in self._inflight]
+                if events:
+                    waiting[idx] = events
+                # 等待中的题目同样登记其余的键，与它相同的代码随后等待它的评价
+                for key in keys:
+                    if key not in self._inflight:
+                        self._inflight[key] = threading.Event()
+                        claimed.setdefault(idx, []).append(key)
+        return claimed, waiting
+
+    def _release_content(self, claimed: dict, indices):
+        """
+        释放部分题目登记的内容，唤醒等待这些内容的学生
 
-            f.write("\n" + "=" * 60 + "\n")
+        Args:
+            claimed: _claim_content 返回的登记
+            indices: 要释放的题目下标
+        """
+        with self._stats_lock:
+            events = [self._inflight.pop(key) for idx in indices for key in claimed.get(idx, [])]
+        for event in events:
+            event.set()
+
+    def _stage_parse(self, job: dict) -> dict:
+        """流水线阶段：整理每道题的结果行和PDF所需的评价数据"""
+        student = job['student']
+        student_name = student['student_name']
+        student_id = student.get('student_id', '')
+        all_problems = job['all_problems']
+        problem_evaluations = job['problem_evaluations']
+
+        rows = []
+        student_evaluations = []
+        for problem, evaluation_data in zip(all_problems, problem_evaluations):
+            result = {
+                'student_name': student_name,
+                'student_id': student_id,
+                'file_name': problem['file_name'],
+                'file_path': problem['file_path'],
+                'unit_path': problem['unit_path'],
+                'problem_id': problem['problem_id'],
+                'problem_name': problem['problem_name'],
+                'evaluation': evaluation_data['evaluation'],
+                'score': evaluation_data['score'],
+                'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                'status': 'failed' if evaluation_data.get('error') else 'evaluated'
+            }
+            if evaluation_data.get('duplicate_of'):
+                result['duplicate_of'] = evaluation_data['duplicate_of']
+            if evaluation_data.get('near_duplicate_of'):
+                result['near_duplicate_of'] = evaluation_data['near_duplicate_of']
+            if evaluation_data.get('triage'):
+                result['triage'] = evaluation_data['triage']
+            if problem.get('judge'):
+                result['judge'] = format_judge_label(problem['judge'])
+            if problem.get('metrics'):
+                result.update(problem['metrics'])
+                result['using_namespace_std'] = '是' if problem['metrics']['using_namespace_std'] else '否'
+            if 'score_confidence' in evaluation_data:
+                result['score_confidence'] = evaluation_data['score_confidence']
+            rows.append(result)
+            if self.detail_threshold is not None:
+                self._count_output_detail(evaluation_data)
+
+            # 【修复】添加到学生评价列表（用于生成PDF），包含代码和problem_name
+            student_evaluations.append({
+                'file_name': problem['file_name'],
+                'problem_name': problem['problem_name'],
+                'code': problem['code'],  # 添加学生代码
+                'evaluation': evaluation_data['evaluation'],
+                'score': evaluation_data['score'],
+                'timestamp': result['timestamp']
+            })
+
+        job['result_rows'] = rows
+        job['student_evaluations'] = student_evaluations
+        return job
+
+    def _stage_render(self, job: dict) -> dict:
+        """流水线阶段：评价完立即生成PDF"""
+        job['pdf_saved'] = False
+        if job['save_pdf'] and job['student_evaluations']:
+            student = job['student']
+            try:
+                self.saver.save_student_pdf(
+                    student_name=student['student_name'],
+                    student_id=student.get('student_id', ''),
+                    evaluations=job['student_evaluations'],
+                    week=self.week
+                )
+                job['pdf_saved'] = True
+                print(f"✓ PDF报告已生成: {student['student_name']}")
+            except Exception as e:
+                print(f"⚠ PDF生成失败 ({student['student_name']}): {str(e)}")
+        return job
+
+    def _stage_persist(self, job: dict) -> dict:
+        """流水线阶段：记录时间和结果（出错的学生记录为失败）"""
+        student = job['student']
+        student_name = student['student_name']
+        student_id = student.get('student_id', '')
+        num_problems = student['file_count']
+        student_elapsed_time = time.time() - job.get('start_time', time.time())
+
+        time_record = {
+            'student_name': student_name,
+            'student_id': student_id,
+            'num_problems': num_problems,
+            'time_seconds': student_elapsed_time,
+            'time_formatted': f"{int(student_elapsed_time // 60)}分{int(student_elapsed_time % 60)}秒",
+            'status': 'success'
+        }
+        # 供后续运行估算耗时使用
+        if job.get('all_problems') and not job['precomputed']:
+            time_record['prompt_tokens'] = self._estimate_prompt_tokens(job['all_problems'])
+        if 'llm_seconds' in job:
+            time_record['llm_seconds'] = job['llm_seconds']
+        if job.get('projected_seconds') is not None:
+            time_record['projected_seconds'] = job['projected_seconds']
+
+        error = job.get('error')
+        if error is None:
+            # 计算平均分
+            scores = [e['score'] for e in job['problem_evaluations'] if e['score'] is not None]
+            avg_score = sum(scores) / len(scores) if scores else 0
+            print(f"✓ 评价完成: {student_id} {student_name} (平均分: {avg_score:.1f}/100，"
+                  f"{len(scores)}/{num_problems}题，耗时: {student_elapsed_time:.1f}秒)")
+            rows = job['result_rows']
+            self.manifest.record(
+                self._student_key(student), EvaluationManifest.problem_hashes(job['all_problems']), rows,
+                signature=student.get('signature')
+            )
+        else:
+            print(f"✗ 评价失败: {student_id} {student_name} - {str(error)} (耗时: {student_elapsed_time:.1f}秒)")
+            self._mark_claimed(job)
+            time_record['status'] = 'failed'
+            time_record['error'] = str(error)
+
+            # 记录失败信息（为该学生的每个文件都记录失败；读取失败时题目信息从题目目录中取得）
+            problems = job.get('all_problems') or [
+                dict(unit, file_path=file_info['file_path'])
+                for unit, file_info in zip(self._problem_units(student), student['files'])
+            ]
+            rows = []
+            for problem in problems:
+                rows.append({
+                    'student_name': student_name,
+                    'student_id': student_id,
+                    'file_name': problem.get('file_name', ''),
+                    'file_path': problem.get('file_path', ''),
+                    'unit_path': problem.get('unit_path', problem.get('file_name', '')),
+                    'problem_id': problem.get('problem_id'),
+                    'problem_name': problem.get('problem_name', ''),
+                    'evaluation': f"评价失败: {str(error)}",
+                    'score': None,
+                    'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                    'status': 'failed'
+                })
 
-        print(f"✓ 已保存时间统计报告: {report_path}")
+        self._persisted[job['order']] = (rows, time_record, job.get('pdf_saved', False))
+        return job
+
+    def _estimate_prompt_tokens(self, all_problems: list) -> int:
+        """估算一个学生批量评价提示词的token数（题目代码 + 固定模板开销）"""
+        if not hasattr(self, '_prompt_overhead_tokens'):
+            self._prompt_overhead_tokens = estimate_tokens(get_batch_prompt(
+                student_name='', student_id='', all_problems=[], week=self.week
+            ))
+        return self._prompt_overhead_tokens + sum(
+            estimate_tokens(self._prompt_code(p)) + estimate_tokens(p['problem_name']) + 20
+            for p in all_problems
+        )
 
-    def _extract_problem_name(self, relative_path: str) -> str:
+    def _estimate_student_tokens(self, student: dict) -> int:
         """
-        从相对路径中提取题目名称
+        不读取代码，按源文件大小粗略估算一个学生批量评价提示词的token数（供调度使用）
 
         Args:
-            relative_path: 相对路径，如"未分班/学号+姓名/代码文件/第1关-求三位数-186949483/main.cpp"
+            student: get_all_students 返回的学生信息
 
         Returns:
-            题目名称，如"第1关-求三位数"
+            估算的提示词token数
         """
-        # 分割路径
-        parts = relative_path.split('/')
+        self._estimate_prompt_tokens([])
+        tokens = self._prompt_overhead_tokens
+        for unit, file_info in zip(self._problem_units(student), student['files']):
+            size = 0
+            for source in file_info.get('sources') or [file_info]:
+                try:
+                    size += os.path.getsize(source['file_path'])
+                except OSError:
+                    pass
+            tokens += int(size / CHARS_PER_TOKEN) + estimate_tokens(unit['problem_name']) + 20
+        return tokens
 
-        # 倒数第二个通常是题目文件夹
-        if len(parts) >= 2:
-            problem_folder = parts[-2]
-            # 移除最后的数字ID (如-186949483)
-            problem_name = re.sub(r'-\d+$', '', problem_folder)
-            return problem_name
+    def _schedule_students(self, students: list, precomputed: dict) -> tuple:
+        """
+        估算每个学生的评价耗时，按最长任务优先排列评价顺序，小任务走快速通道
 
-        return "未知题目"
+        耗时模型使用提示词token数、题目数，以及输出目录中以往运行的时间统计。
+        代码尚未读取的学生按源文件大小估算，不为调度预先读取整个班级的代码（由流水线的读取阶段读取）。
+        所有题目都与之前的学生（或去重索引）完全相同、或都是空文件和模板的学生无需调用模型，放到最后，
+        保证被复用的代码先完成评价；代码尚未读取时按ZIP文件列表中的CRC和大小判断完全相同的文件。
 
-    def _parse_batch_evaluation(self, batch_evaluation: str, all_problems: list) -> list:
+        Args:
+            students: 已提交作业的学生列表
+            precomputed: 已预先完成评价的学生（不再调用模型，耗时视为0）
+
+        Returns:
+            (评价顺序（students的下标列表）, {下标: 预估耗时})
+        """
+        model = LatencyModel.from_time_reports(self.output_dir)
+
+        planned = []    # 参与调度的学生下标
+        deferred = []   # 无需调用模型的学生下标
+        costs = {}
+        seen_hashes = set()
+        for idx, student in enumerate(students):
+            key = self._student_key(student)
+            if key in precomputed:
+                deferred.append(idx)
+                continue
+            if key not in self._problem_cache:
+                fingerprints = (self.extractor.index.get(key) or {}).get('code')
+                if self.dedup_index is not None and fingerprints:
+                    if all(fingerprint in seen_hashes for fingerprint in fingerprints):
+                        deferred.append(idx)
+                        costs[idx] = 0.0
+                        continue
+                    seen_hashes.update(fingerprints)
+                try:
+                    tokens = self._estimate_student_tokens(student)
+                except Exception:
+                    deferred.append(idx)
+                    continue
+                planned.append(idx)
+                costs[idx] = model.predict(student, tokens, len(student['files']))
+                continue
+            all_problems = self._problem_cache[key]
+
+            # 快速判定的题目使用规则评价，不计入耗时
+            pending = [p for p in all_problems if not p.get('triage')]
+            if all_problems and not pending:
+                deferred.append(idx)
+                costs[idx] = 0.0
+                continue
+
+            if self.dedup_index is not None and pending:
+                hashes = [code_hash(p['problem_name'], p['code']) for p in pending]
+                if all(h in seen_hashes or self.dedup_index.lookup(p['problem_name'], p['code'])
+                       for h, p in zip(hashes, pending)):
+                    deferred.append(idx)
+                    costs[idx] = 0.0
+                    continue
+                seen_hashes.update(hashes)
+
+            planned.append(idx)
+            costs[idx] = model.predict(student, self._estimate_prompt_tokens(pending), len(pending))
+
+        workers = self.stage_workers['llm']
+        plan = plan_schedule([costs[idx] for idx in planned], workers, fast_lane_ratio=self.fast_lane_ratio)
+        order = [planned[i] for i in plan['order']] + deferred
+        self.schedule_stats = {
+            'projected_makespan': plan['projected_makespan'],
+            'fast_lane': plan['fast_lane'],
+            'deferred': len(deferred),
+            'history': model.history_size
+        }
+
+        print(f"✓ 已按预估耗时调度评价顺序（最长任务优先，{plan['fast_lane']} 个小任务走快速通道，"
+              f"{len(deferred)} 个学生无需调用模型放到最后，参考 {model.history_size} 条历史记录，"
+              f"预计 {plan['projected_makespan']:.0f}秒）")
+        return order, costs
+
+    def _is_over_budget(self, prompt_tokens: int, output_tokens: int) -> bool:
+        """提示词或预估输出是否超出单个请求的token预算"""
+        return bool(
+            (self.max_prompt_tokens and prompt_tokens > self.max_prompt_tokens) or
+            (self.max_output_tokens and output_tokens > self.max_output_tokens)
+        )
+
+    def _plan_requests(self, student: dict, pending: list) -> list:
         """
-        解析批量评价结果，提取每道题的评价和分数
+        估算一个学生需要发起的请求（与实际评价时的拆分方式一致）
 
         Args:
-            batch_evaluation: 批量评价的完整文本
-            all_problems: 题目列表
+            student: 学生信息
+            pending: 需要调用模型评价的题目列表
 
         Returns:
-            每道题的评价数据列表
-            [
-                {'evaluation': '评价内容...', 'score': 85},
-                ...
-            ]
+            [(提示词token数, 预估输出token数, 题目数), ...]
         """
-        evaluations = []
-        
-        print(f"   正在解析 {len(all_problems)} 道题的评价结果...")
-        print(f"   评价内容长度: {len(batch_evaluation)} 字符")
-        
-        # 【调试】检查评价内容是否为空或过短
-        if not batch_evaluation or len(batch_evaluation.strip()) < 10:
-            print(f"   ⚠ 警告：AI返回的评价内容为空或过短！")
-            print(f"   原始内容: '{batch_evaluation}'")
-            # 为每道题提供默认评价
-            for idx, problem in enumerate(all_problems):
-                problem_name = problem.get('problem_name', f'题目{idx+1}')
-                evaluations.append({
-                    'evaluation': f"【题目{idx+1}: {problem_name}】\n\nAI评价失败，未能获取到评价内容。请检查API配置或网络连接。",
-                    'score': 70  # 默认分数
-                })
-            return evaluations
-
-        # 【修复】改进分割逻辑，支持多种分隔符格式
-        sections = []
-        
-        # 方法1：尝试按 === 分隔
-        temp_sections = re.split(r'={3,}', batch_evaluation)
-        temp_sections = [s.strip() for s in temp_sections if s.strip()]
-        
-        if len(temp_sections) >= len(all_problems):
-            sections = temp_sections
-            print(f"   使用 === 分隔符成功分割为 {len(sections)} 个部分")
-        else:
-            # 方法2：尝试按 ### 题目N: 分隔
-            temp_sections = re.split(r'###\s*题目\s*\d+\s*[:：]', batch_evaluation)
-            temp_sections = [s.strip() for s in temp_sections if s.strip()]
-            
-            if len(temp_sections) >= len(all_problems):
-                sections = temp_sections
-                print(f"   使用 ### 题目N: 分隔符成功分割为 {len(sections)} 个部分")
+        if not pending:
+            return []
+
+        student_name = student['student_name']
+        student_id = student.get('student_id', '')
+
+        if self.granularity == 'problem':
+            return [(
+                estimate_tokens(get_single_prompt(
+                    student_name=student_name, student_id=student_id, problem=problem, week=self.week
+                )),
+                estimate_output_tokens(1),
+                1
+            ) for problem in pending]
+
+        prompt_tokens = estimate_tokens(get_batch_prompt(
+            student_name=student_name, student_id=student_id, all_problems=pending, week=self.week
+        ))
+        output_tokens = estimate_output_tokens(len(pending))
+        if not self._is_over_budget(prompt_tokens, output_tokens) or len(pending) == 1:
+            return [(prompt_tokens, output_tokens, len(pending))]
+
+        return [(
+            estimate_tokens(get_batch_prompt(
+                student_name=student_name, student_id=student_id, all_problems=shard, week=self.week
+            )),
+            estimate_output_tokens(len(shard)),
+            len(shard)
+        ) for shard in self._split_shards(student_name, student_id, pending)]
+
+    def _plan_dry_run(self, students: list):
+        """
+        生成评价计划（不调用模型）：每个学生的提示词和输出token、各提供商费用估算、
+        按当前并发数和速率限制的总耗时估算，以及超出token预算的学生
+
+        Args:
+            students: 已提交作业的学生列表
+        """
+        print(f"\n[步骤 3/4] 生成评价计划（--dry-run，不调用模型）...")
+        if self.granularity == 'problem-major' or self.pack_students:
+            print("💡 按题目批量/合并评价模式按逐个学生评价估算，实际请求数会更少")
+
+        model = LatencyModel.from_time_reports(self.output_dir)
+        seen_hashes = set()
+        rows = []
+        latencies = []
+        over_budget = []
+        duplicates = 0
+        triaged = 0
+
+        for student in students:
+            try:
+                all_problems = self._read_student_problems(student)
+            except Exception as e:
+                print(f"⚠ 读取失败: {student['student_name']} - {str(e)}")
+                continue
+
+            # 快速判定的题目，以及与之前的学生或去重索引中完全相同的代码不会调用模型
+            pending = []
+            for problem in all_problems:
+                if problem.get('triage'):
+                    triaged += 1
+                    continue
+                key = code_hash(problem['problem_name'], problem['code'])
+                if self.dedup_index is not None and (
+                        key in seen_hashes or self.dedup_index.lookup(problem['problem_name'], problem['code'])):
+                    duplicates += 1
+                    continue
+                seen_hashes.add(key)
+                pending.append(problem)
+
+            requests = self._plan_requests(student, pending)
+            prompt_tokens = sum(r[0] for r in requests)
+            output_tokens = sum(r[1] for r in requests)
+            seconds = 0.0
+            for request_prompt, _, request_problems in requests:
+                latency = model.predict(student, request_prompt, request_problems)
+                latencies.append(latency)
+                seconds += latency
+
+            # 逐题评价时看单个请求，批量评价时看整个学生的提示词（超出时会拆分为多个请求）
+            if self.granularity == 'problem':
+                full_prompt = max((r[0] for r in requests), default=0)
+                over = any(self._is_over_budget(r[0], r[1]) for r in requests)
             else:
-                # 方法3：尝试按题目标题模式分隔
-                # 匹配类似 "题目1:", "第1关", "第1题" 等模式
-                pattern = r'(?:题目|第\d+关|第\d+题).*?[:：]'
-                temp_sections = re.split(pattern, batch_evaluation)
-                temp_sections = [s.strip() for s in temp_sections if s.strip()]
-                
-                if len(temp_sections) >= len(all_problems):
-                    sections = temp_sections
-                    print(f"   使用题目标题模式成功分割为 {len(sections)} 个部分")
+                full_prompt = self._estimate_prompt_tokens(pending)
+                over = bool(pending) and self._is_over_budget(full_prompt, estimate_output_tokens(len(pending)))
+            if over:
+                over_budget.append((student, full_prompt, len(requests)))
+
+            rows.append((student, len(all_problems), len(requests), prompt_tokens, output_tokens, seconds))
+
+        total_prompt = sum(r[3] for r in rows)
+        total_output = sum(r[4] for r in rows)
+        total_requests = sum(r[2] for r in rows)
+        workers = self.max_workers
+        wall_time = simulate_wall_time(latencies, workers, self.rate_limit)
+
+        lines = []
+        lines.append("=" * 60)
+        lines.append(f"C++作业评价系统 - 评价计划（第{self.week}周）")
+        lines.append("=" * 60)
+        lines.append("")
+        lines.append(f"{'学号':<15} {'姓名':<10} {'题目数':>6} {'请求数':>6} {'提示词tokens':>12} {'输出tokens':>10} {'预估耗时':>10}")
+        lines.append("-" * 80)
+        for student, num_problems, num_requests, prompt_tokens, output_tokens, seconds in rows:
+            lines.append(
+                f"{student.get('student_id', ''):<15} {student['student_name']:<10} {num_problems:>6} "
+                f"{num_requests:>6} {prompt_tokens:>12} {output_tokens:>10} {format_duration(seconds):>10}"
+            )
+        lines.append("-" * 80)
+        lines.append(f"学生数: {len(rows)}，请求数: {total_requests}"
+                     + (f"（{duplicates} 道题与已有代码相同，直接复用）" if duplicates else ""))
+        if triaged:
+            lines.append(f"快速判定: {triaged} 道题为空文件、模板或非代码内容，直接给出规则评价")
+        lines.append(f"提示词: 约 {total_prompt} tokens，输出: 约 {total_output} tokens")
+
+        lines.append("")
+        lines.append("费用估算（参考价格，以提供商官网为准）:")
+        for cost in estimate_costs(total_prompt, total_output):
+            lines.append(f"  - {cost['provider']:<10} {cost['model']:<20} 约 {cost['currency']}{cost['cost']:.2f}")
+
+        lines.append("")
+        rate = f"每分钟最多 {self.rate_limit:g} 个请求" if self.rate_limit else "不限制请求速率"
+        lines.append(f"耗时估算（并发 {workers}，{rate}，参考 {model.history_size} 条历史记录）: "
+                     f"约 {format_duration(wall_time)}")
+
+        lines.append("")
+        if over_budget:
+            lines.append(f"超出token预算的学生（提示词 {self.max_prompt_tokens} / 输出 {self.max_output_tokens}）:")
+            for student, prompt_tokens, num_requests in over_budget:
+                if self.granularity != 'problem' and num_requests > 1:
+                    detail = f"将拆分为 {num_requests} 个请求"
                 else:
-                    # 方法4：按段落分割（最后的备选方案）
-                    paragraphs = batch_evaluation.split('\n\n')
-                    paragraphs = [p.strip() for p in paragraphs if p.strip()]
-                    
-                    # 尝试将段落重新组合成题目评价
-                    if len(paragraphs) > len(all_problems):
-                        # 将段落按题目数量平均分配
-                        paras_per_problem = len(paragraphs) // len(all_problems)
-                        sections = []
-                        for i in range(len(all_problems)):
-                            start_idx = i * paras_per_problem
-                            end_idx = start_idx + paras_per_problem if i < len(all_problems) - 1 else len(paragraphs)
-                            combined_section = '\n\n'.join(paragraphs[start_idx:end_idx])
-                            sections.append(combined_section)
-                        print(f"   使用段落重组方式分割为 {len(sections)} 个部分")
-                    else:
-                        sections = paragraphs
-                        print(f"   使用段落分割为 {len(sections)} 个部分")
-
-        # 【修复】如果仍然分割失败，使用整体评价作为每道题的评价
-        if len(sections) < len(all_problems):
-            print(f"   ⚠ 分割结果不足，将使用完整评价内容")
-            # 为每道题使用完整的评价内容，并添加题目标识
-            for idx, problem in enumerate(all_problems):
-                problem_name = problem.get('problem_name', f'题目{idx+1}')
-                
-                # 尝试从完整评价中提取该题目的相关内容
-                problem_evaluation = self._extract_problem_evaluation(batch_evaluation, problem_name, idx + 1)
-                
-                if not problem_evaluation:
-                    problem_evaluation = f"【题目{idx+1}: {problem_name}】\n\n{batch_evaluation}"
-                
-                score = self._extract_score(problem_evaluation)
-                
-                evaluations.append({
-                    'evaluation': problem_evaluation,
-                    'score': score if score is not None else 75  # 默认分数
-                })
+                    detail = "单个请求仍超出预算，可能被截断"
+                lines.append(f"  - {student.get('student_id', '')} {student['student_name']}: "
+                             f"提示词约 {prompt_tokens} tokens，{detail}")
         else:
-            # 正常处理分割后的sections
-            for idx, problem in enumerate(all_problems):
-                if idx < len(sections):
-                    section = sections[idx]
-                    
-                    # 【修复】确保评价内容完整
-                    if len(section) < 50:  # 如果内容太短，可能是分割错误
-                        print(f"   ⚠ 题目{idx+1}的评价内容较短，尝试补充...")
-                        # 尝试合并相邻的section
-                        if idx + 1 < len(sections):
-                            section = section + "\n\n" + sections[idx + 1]
-                    
-                    # 添加题目标识（如果没有的话）
-                    problem_name = problem.get('problem_name', f'题目{idx+1}')
-                    if not re.search(r'题目\d+|第\d+关', section):
-                        section = f"【题目{idx+1}: {problem_name}】\n\n{section}"
-                    
-                    # 提取分数
-                    score = self._extract_score(section)
-                    
-                    evaluations.append({
-                        'evaluation': section,
-                        'score': score if score is not None else 75  # 默认分数
-                    })
-                else:
-                    # 如果没有对应的section，使用默认评价
-                    problem_name = problem.get('problem_name', f'题目{idx+1}')
-                    evaluations.append({
-                        'evaluation': f"【题目{idx+1}: {problem_name}】\n\n该题目的评价内容未能正确解析，请检查代码实现。",
-                        'score': 60  # 默认分数
-                    })
+            lines.append("没有超出token预算的学生")
+        lines.append("=" * 60)
 
-        print(f"   ✓ 成功解析 {len(evaluations)} 道题的评价")
-        return evaluations
+        print("\n" + "\n".join(lines))
+
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        report_path = os.path.join(self.output_dir, f"第{self.week}周_评价计划_{timestamp}.txt")
+        with open(report_path, 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+        print(f"✓ 已保存评价计划: {report_path}")
+
+    @staticmethod
+    def _prompt_code(problem: dict) -> str:
+        """提示词中实际发送的代码（与参考答案的差异、压缩后的代码或原始代码）"""
+        return problem.get('prompt_diff') or problem.get('prompt_code', problem.get('code', ''))
 
-    def _extract_problem_evaluation(self, full_evaluation: str, problem_name: str, problem_index: int) -> str:
+    def _split_unchanged_students(self, students: list) -> tuple:
         """
-        从完整评价中提取特定题目的评价内容
-        
+        与本周上次的评价清单比较，分出提交没有变化的学生
+
         Args:
-            full_evaluation: 完整的评价文本
-            problem_name: 题目名称
-            problem_index: 题目序号
-            
+            students: 已提交作业的学生列表
+
         Returns:
-            该题目的评价内容
+            (需要评价的学生列表, 学生标识 -> 沿用的结果行)
         """
-        # 尝试多种模式匹配该题目的评价
-        patterns = [
-            rf'###\s*题目{problem_index}\s*[:：].*?(?=###\s*题目\d+|$)',
-            rf'题目{problem_index}.*?(?=题目\d+|$)',
-            rf'{re.escape(problem_name)}.*?(?=第\d+关|题目\d+|$)',
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, full_evaluation, re.DOTALL | re.IGNORECASE)
-            if match:
-                content = match.group(0).strip()
-                if len(content) > 50:  # 确保内容足够长
-                    return content
-        
-        return ""
-
-    def _extract_score(self, evaluation: str) -> int:
+        pending = []
+        carried = {}
+        for student in students:
+            key = self._student_key(student)
+            # ZIP文件列表中的签名没有变化时，无需读取代码
+            rows = self.manifest.lookup_signature(key, student.get('signature'))
+            if rows is not None:
+                carried[key] = rows
+                if student.get('unchanged'):
+                    student['file_count'] = len(rows)
+                continue
+            try:
+                hashes = self._student_hashes(student)
+            except Exception:
+                pending.append(student)
+                continue
+            rows = self.manifest.lookup(key, hashes)
+            if rows is not None:
+                carried[key] = rows
+                if student.get('signature'):
+                    self.manifest.record(key, hashes, rows, signature=student['signature'])
+                continue
+            changes = self.manifest.changes(key, hashes)
+            self.incremental_stats['added'] += changes['added']
+            self.incremental_stats['changed'] += changes['changed']
+            pending.append(student)
+
+        self.incremental_stats['carried'] = len(carried)
+        print(f"\n♻ 增量评价: {len(carried)} 个学生的提交没有变化，沿用上次的结果（PDF不重新生成）；"
+              f"{len(pending)} 个学生需要评价（新增 {self.incremental_stats['added']} 道题，"
+              f"修改 {self.incremental_stats['changed']} 道题）")
+        return pending, carried
+
+    def _problem_units(self, student: dict) -> list:
         """
-        从评价文本中提取分数
+        不读取代码，列出一个学生的各道题（题目编号、名称和文件路径）
 
         Args:
-            evaluation: 评价文本
+            student: get_all_students 返回的学生信息
 
         Returns:
-            分数（0-100），如果未找到则返回None
-        """
-        # 【修复】改进分数提取逻辑，支持更多格式
-        patterns = [
-            r'\*\*分数\*\*\s*[:：]\s*(\d+)\s*/?\\s*100',  # **分数**: 85/100
-            r'\*\*分数\*\*\s*[:：]\s*(\d+)',              # **分数**: 85
-            r'分数\s*[:：]\s*(\d+)\s*/\s*100',            # 分数: 85/100
-            r'分数\s*[:：]\s*(\d+)',                      # 分数: 85
-            r'得分\s*[:：]\s*(\d+)',                      # 得分: 85
-            r'评分\s*[:：]\s*(\d+)',                      # 评分: 85
-            r'(\d+)\s*/\s*100',                          # 85/100
-            r'(\d+)\s*分',                               # 85分
-            r'score\s*[:：]\s*(\d+)',                    # score: 85
-            r'总分\s*[:：]\s*(\d+)',                     # 总分: 85
-        ]
+            [{'problem_id', 'problem_name', 'file_name', 'unit_path'}, ...]
+        """
+        units = []
+        for file_info in student['files']:
+            catalog_entry = self.catalog.resolve(file_info)
+            units.append({
+                'problem_id': catalog_entry['id'],
+                'problem_name': catalog_entry['name'],
+                'file_name': file_info['file_name'],
+                'unit_path': file_info.get('unit_path', file_info['file_name'])
+            })
+        return units
+
+    def _student_hashes(self, student: dict) -> dict:
+        """
+        计算一个学生各题代码的内容哈希（只读取代码，不压缩、不判定，也不缓存）
 
-        for pattern in patterns:
-            matches = re.findall(pattern, evaluation, re.IGNORECASE)
-            if matches:
-                try:
-                    # 取第一个匹配的分数
-                    score = int(matches[0])
-                    if 0 <= score <= 100:
-                        return score
-                except (ValueError, IndexError):
-                    continue
+        Args:
+            student: get_all_students 返回的学生信息
 
-        # 【新增】如果没有找到明确的分数，尝试从评价内容推断
-        evaluation_lower = evaluation.lower()
-        
-        # 根据评价关键词推断分数
-        if any(word in evaluation_lower for word in ['优秀', '很好', '完美', 'excellent', 'perfect']):
-            return 90
-        elif any(word in evaluation_lower for word in ['良好', '不错', 'good', 'well']):
-            return 80
-        elif any(word in evaluation_lower for word in ['一般', '还可以', 'average', 'ok']):
-            return 70
-        elif any(word in evaluation_lower for word in ['需要改进', '有问题', 'poor', 'bad']):
-            return 60
-        elif any(word in evaluation_lower for word in ['很差', '错误很多', 'terrible', 'fail']):
-            return 40
-        
-        # 如果都没有匹配，返回None（调用方会使用默认分数）
-        return None
+        Returns:
+            题目文件路径 -> 内容哈希（EvaluationManifest.problem_hashes 的格式）
+        """
+        problems = []
+        for unit, file_info in zip(self._problem_units(student), student['files']):
+            unit['code'] = combine_sources(self.extractor.read_problem_sources(file_info))
+            problems.append(unit)
+        return EvaluationManifest.problem_hashes(problems)
+
+    @staticmethod
+    def _student_key(student: dict) -> str:
+        """学生唯一标识（学号+姓名）"""
+        student_id = student.get('student_id', '')
+        return f"{student_id}+{student['student_name']}" if student_id else student['student_name']
+
+    def _read_student_problems(self, student: dict, cache: bool = True) -> list:
+        """
+        读取一个学生的所有题目代码，并按题号排序
 
+        读取时同时完成快速判定，以及（启用时）参考答案差异、代码指标和编译测试。
 
-def main():
+        Args:
+            student: get_all_students 返回的学生信息
+            cache: 是否保留在缓存中供之后的步骤使用；流水线的读取阶段取出缓存后即释放，不在内存中保留整个班级的代码
+
+        Returns:
+            题目列表
+            [
+                {
+                    'problem_id': 1,  # 题目目录中的编号
+                    'problem_name': '第1关-求三位数',
+                    'file_name': 'main.cpp',
+                    'file_path': '/path/to/main.cpp',
+                    'unit_path': '代码文件/第1关-求三位数-186949483/main.cpp',
+                    'code': '原始代码...',
+                    'prompt_code': '压缩后的代码...',
+                    'sources': [('util.h', '...'), ...],  # 仅多个文件时存在
+                    'triage': 'empty'  # 仅快速判定无需调用模型时存在
+                },
+                ...
+            ]
+        """
+        student_key = self._student_key(student)
+        if student_key in self._problem_cache:
+            return self._problem_cache[student_key] if cache else self._problem_cache.pop(student_key)
+
+        all_problems = []
+        for file_info in student['files']:
+            file_path = file_info['file_path']
+            file_name = file_info['file_name']
+
+            # 从题目目录中查找题目（编号和显示名称）
+            catalog_entry = self.catalog.resolve(file_info)
+            problem_name = catalog_entry['name']
+
+            # 读取代码（同一题目文件夹中的多个文件合并为一份）
+            sources = self.extractor.read_problem_sources(file_info)
+            code = combine_sources(sources)
+
+            problem = {
+                'problem_id': catalog_entry['id'],
+                'problem_name': problem_name,
+                'file_name': file_name,
+                'file_path': file_path,
+                'unit_path': file_info.get('unit_path', file_name),  # 相对学生文件夹的路径（增量运行时的题目标识）
+                'code': code,  # 原始代码（用于PDF）
+                'prompt_code': self._compact_code(code)  # 提示词中使用的代码
+            }
+            if len(sources) > 1:
+                problem['sources'] = sources  # 编译测试时分别写入各个文件
+            # 空文件、未修改的模板等无需调用模型的提交
+            if self.triage is not None:
+                category = self.triage.classify(problem_name, code)
+                if category:
+                    problem['triage'] = category
+            all_problems.append(problem)
+
+        # 【修复】按题目目录中的关卡序号排序，确保"第1关"、"第2关"...的顺序正确
+        all_problems.sort(key=lambda p: self.catalog.sort_key(p['problem_id']))
+        self._prepare_problems(all_problems)
+        if cache:
+            self._problem_cache[student_key] = all_problems
+        return all_problems
+
+    def _prepare_problems(self, all_problems: list):
+        """
+        为一个学生的题目补充参考答案差异、代码静态指标和编译测试结果（均为启用时），
+        后两者作为客观信息加入提示词；预览评价计划时只计算参考答案差异
+
+        Args:
+            all_problems: 题目列表（快速判定过的题目跳过）
+        """
+        problems = [p for p in all_problems if not p.get('triage')]
+        if not problems:
+            return
+
+        # 与参考答案高度相似的代码只发送差异
+        if self.references is not None:
+            for problem in problems:
+                try:
+                    result = self.references.diff(problem['problem_name'], problem['code'])
+                except Exception as e:
+                    print(f"   ⚠ 参考答案差异计算失败 ({problem['problem_name']}): {str(e)}")
+                    continue
+                original_tokens = estimate_tokens(problem.get('prompt_code', problem['code']))
+                # 压缩后的代码已经比差异更短时仍发送代码
+                if result is None or estimate_tokens(result['diff']) >= original_tokens:
+                    continue
+                problem['prompt_diff'] = result['diff']
+                problem['reference'] = result['reference']
+                with self._stats_lock:
+                    self.reference_stats['problems'] += 1
+                    self.reference_stats['original_tokens'] += original_tokens
+                    self.reference_stats['diff_tokens'] += estimate_tokens(result['diff'])
+
+        if self.dry_run:
+            return
+
+        # 编译并运行测试用例
+        if self.judge is not None:
+            try:
+                results = self.judge.judge_all(problems)
+            except Exception as e:
+                print(f"   ⚠ 编译测试失败: {str(e)}")
+                results = []
+            for problem, result in zip(problems, results):
+                problem['judge'] = result
+                problem.setdefault('facts', []).append(format_judge_summary(result))
+                with self._stats_lock:
+                    self.judge_stats['submissions'] += 1
+                    if not result['compiled']:
+                        self.judge_stats['compile_failed'] += 1
+                    self.judge_stats['passed'] += result['passed']
+                    self.judge_stats['total'] += result['total']
+
+        # 统计代码静态指标
+        if self.metrics:
+            try:
+                results = compute_code_metrics([p['code'] for p in problems], workers=self.metrics_workers)
+            except Exception as e:
+                print(f"   ⚠ 代码指标统计失败: {str(e)}")
+                results = []
+            for problem, metrics in zip(problems, results):
+                problem['metrics'] = metrics
+                problem.setdefault('facts', []).append(format_metrics_summary(metrics))
+
+    def _compact_code(self, code: str) -> str:
+        """
+        压缩提示词中使用的代码，并累计token节省统计
+
+        Args:
+            code: 原始代码
+
+        Returns:
+            压缩后的代码（未启用压缩时原样返回）
+        """
+        if self.compactor is None:
+            return code
+
+        compacted = self.compactor.compact(code)
+        with self._stats_lock:
+            self.compaction_stats['files'] += 1
+            self.compaction_stats['original_tokens'] += estimate_tokens(code)
+            self.compaction_stats['compacted_tokens'] += estimate_tokens(compacted)
+        return compacted
+
+    def _evaluate_student_problems(
+        self,
+        student_name: str,
+        student_id: str,
+        all_problems: list,
+        batch_prompt: str = None,
+        partial: bool = False
+    ) -> list:
+        """
+        按当前评价粒度评价一个学生的所有题目
+
+        Args:
+            student_name: 学生姓名
+            student_id: 学号
+            all_problems: 题目列表（已按题号排序）
+            batch_prompt: 预先生成的批量评价提示词（与all_problems对应），为None时在此生成
+            partial: all_problems 是否只是该学生的一部分题目（其余题目另行评价），此时不按学生统计节省的调用
+
+        Returns:
+            每道题的评价数据列表，与all_problems一一对应
+        """
+        # 选择性重新评价时未选中的题目沿用上次的评价；空文件、未修改的模板直接使用规则评价；
+        # 复用相同代码的已有评价；近似重复的代码只发送差异；只完整评价剩余的题目
+        previous = self._lookup_previous(student_name, student_id, all_problems)
+        triaged = self._lookup_triaged(all_problems)
+        for idx in previous:
+            triaged.pop(idx, None)
+        if triaged:
+            print(f"   ⚡ {len(triaged)} 道题为空文件、模板或非代码内容，直接给出规则评价")
+        reused = self._lookup_duplicates(all_problems, exclude={**previous, **triaged})
+        if reused:
+            print(f"   ♻ {len(reused)} 道题与已评价的代码相同，直接复用评价结果")
+        resolved = dict(previous)
+        resolved.update(triaged)
+        resolved.update(reused)
+        delta = self._evaluate_near_duplicates(student_name, student_id, all_problems, exclude=resolved)
+
+        resolved.update(delta)
+        if resolved:
+            pending = [idx for idx in range(len(all_problems)) if idx not in resolved]
+            with self._stats_lock:
+                if len(triaged) == len(all_problems) and not partial:
+                    self.triage_stats['students'] += 1
+                if self.granularity == 'problem':
+                    self.dedup_stats['saved_calls'] += len(reused)
+                    self.triage_stats['saved_calls'] += len(triaged)
+                elif not pending and not delta and (reused or triaged) and not partial:
+                    if reused:
+                        self.dedup_stats['saved_calls'] += 1
+                    else:
+                        self.triage_stats['saved_calls'] += 1
+            if not pending:
+                return [resolved[idx] for idx in range(len(all_problems))]
+
+            pending_evaluations = self._evaluate_student_problems(
+                student_name, student_id, [all_problems[idx] for idx in pending]
+            )
+            resolved.update(zip(pending, pending_evaluations))
+            return [resolved[idx] for idx in range(len(all_problems))]
+
+        if self.granularity == 'problem':
+            problem_evaluations = self._evaluate_problems_concurrently(
+                student_name, student_id, all_problems
+            )
+        else:
+            # 生成批量评价提示词，调用前先估算token，超出预算时拆分为多个分片
+            if batch_prompt is None:
+                batch_prompt = get_batch_prompt(
+                    student_name=student_name,
+                    student_id=student_id,
+                    all_problems=all_problems,
+                    week=self.week
+                )
+            prompt_tokens = estimate_tokens(batch_prompt)
+            output_tokens = estimate_output_tokens(len(all_problems))
+            print(f"   预估token: 提示词约 {prompt_tokens}，输出约 {output_tokens}")
+
+            if self._is_over_budget(prompt_tokens, output_tokens) and len(all_problems) > 1:
+                problem_evaluations = self._evaluate_in_shards(
+                    student_name, student_id, all_problems
+                )
+            else:
+                batch_evaluation = self._call_model(batch_prompt, len(all_problems))
+
+                # 解析批量评价结果
+                problem_evaluations = self._parse_batch_evaluation(batch_evaluation, all_problems)
+
+        # 对解析失败的题目单独补充评价，避免整个学生重新评价
+        if self.followup:
+            problem_evaluations = self._followup_unparsed_problems(
+                student_name, student_id, all_problems, problem_evaluations
+            )
+
+        return problem_evaluations
+
+    def _call_model(self, prompt: str, num_problems: int) -> str:
+        """
+        调用模型（自适应详略模式下在提示词末尾附加输出详略要求），并累计输出token统计
+
+        所有请求共用 max_workers 个并发名额，只在请求期间占用，外层线程等待内层线程时不占用名额。
+
+        Args:
+            prompt: 提示词
+            num_problems: 该请求评价的题目数
+
+        Returns:
+            模型回复
+        """
+        if self.detail_threshold is not None:
+            prompt += get_adaptive_verbosity_note(self.detail_threshold)
+        with self._request_slots:
+            reply = self.evaluator.evaluate(prompt)
+        with self._stats_lock:
+            self.output_stats['requests'] += 1
+            self.output_stats['problems'] += num_problems
+            self.output_stats['output_tokens'] += estimate_tokens(reply or '')
+        return reply
+
+    def _load_previous_results(self) -> tuple:
+        """
+        加载本周上次运行的结果（最新的JSON结果文件，没有时使用评价清单）
+
+        Returns:
+            (JSON文件路径, 结果行列表)；使用评价清单时路径为None；都没有时返回 (None, None)
+        """
+        prefix = f"第{self.week}周_评价结果_"
+        candidates = sorted(
+            name for name in (os.listdir(self.output_dir) if os.path.isdir(self.output_dir) else [])
+            if name.startswith(prefix) and name.endswith('.json')
+        )
+        if candidates:
+            path = os.path.join(self.output_dir, candidates[-1])
+            with open(path, 'r', encoding='utf-8') as f:
+                return path, json.load(f)
+        if self.manifest.entries:
+            return None, [row for entry in self.manifest.entries.values() for row in entry['rows']]
+        return None, None
+
+    def _match_problem(self, problem: dict) -> bool:
+        """题目是否匹配 --only-problems（题目名称、原始文件夹名称、题目编号或"第N关"）"""
+        entry = self.catalog.get(problem['problem_id']) or {}
+        for token in self.rerun_filters['problems']:
+            if token.isdigit() and int(token) == entry.get('id'):
+                return True
+            if token == problem['problem_name'] or token in entry.get('raw_names', []):
+                return True
+            match = re.fullmatch(r'第(\d+)关', token)
+            if match and entry.get('ordinal') == int(match.group(1)):
+                return True
+        return False
+
+    def _select_rerun(self, students: list):
+        """
+        按 --only-students / --only-problems / --only-status 选出需要重新评价的学生和题目
+
+        未选中的题目在评价时直接沿用上次的评价（PDF中仍展示完整的题目），未选中的学生不读取代码、不调用模型、不重新生成PDF。
+
+        Args:
+            students: 已提交作业的学生列表
+
+        Returns:
+            (上次的JSON文件路径, 上次的结果行列表)，没有上次的结果时返回None
+        """
+        path, rows = self._load_previous_results()
+        if rows is None:
+            print(f"✗ 输出目录中没有第{self.week}周上次运行的结果，无法选择性重新评价")
+            return None
+
+        # 按题目文件路径对应（多道题可能对应同一个题目名称）；较早的结果没有路径时按题目名称对应
+        for row in rows:
+            if row.get('status') == 'not_submitted' or not row.get('problem_name'):
+                continue
+            self._previous_rows.setdefault(self._student_key(row), {})[row.get('unit_path') or row['problem_name']] = row
+
+        wanted_students = self.rerun_filters['students']
+        for student in students:
+            key = self._student_key(student)
+            if wanted_students and not wanted_students & {student.get('student_id', ''), student['student_name'], key}:
+                continue
+            # 只需要题目名称和编号，不读取代码
+            try:
+                units = self._problem_units(student)
+            except Exception:
+                continue
+            previous = self._previous_rows.get(key, {})
+            selected = set()
+            for problem in units:
+                if self.rerun_filters['problems'] and not self._match_problem(problem):
+                    continue
+                if self.rerun_filters['status'] == 'failed':
+                    row = self._previous_row(previous, problem)
+                    if row is not None and row.get('status') == 'evaluated' and row.get('score') is not None:
+                        continue
+                selected.add(problem['unit_path'])
+            if selected:
+                self._rerun_selection[key] = selected
+
+        problems = sum(len(selected) for selected in self._rerun_selection.values())
+        print(f"\n🎯 选择性重新评价: {len(self._rerun_selection)} 个学生，{problems} 道题"
+              f"（上次的结果: {os.path.basename(path) if path else '评价清单'}）")
+        return path, rows
+
+    @staticmethod
+    def _previous_row(previous_rows: dict, problem: dict):
+        """按题目文件路径（较早的结果按题目名称）查找一道题上次的结果行，没有时返回None"""
+        row = previous_rows.get(problem['unit_path'])
+        return row if row is not None else previous_rows.get(problem['problem_name'])
+
+    def _lookup_previous(self, student_name: str, student_id: str, all_problems: list) -> dict:
+        """
+        选择性重新评价时，未选中的题目沿用上次的评价
+
+        Args:
+            student_name: 学生姓名
+            student_id: 学号
+            all_problems: 题目列表
+
+        Returns:
+            题目下标 -> 上次的评价数据
+        """
+        if not self.rerun:
+            return {}
+        key = self._student_key({'student_name': student_name, 'student_id': student_id})
+        selected = self._rerun_selection.get(key, set())
+        previous_rows = self._previous_rows.get(key, {})
+
+        previous = {}
+        for idx, problem in enumerate(all_problems):
+            row = self._previous_row(previous_rows, problem)
+            if problem['unit_path'] in selected or row is None or row.get('status') != 'evaluated':
+                continue
+            previous[idx] = {
+                'evaluation': row['evaluation'],
+                'score': row['score'],
+                'parsed': True,
+                'previous': True
+            }
+            for field in ('triage', 'duplicate_of', 'near_duplicate_of', 'score_confidence'):
+                if field in row:
+                    previous[idx][field] = row[field]
+        return previous
+
+    @staticmethod
+    def _merge_rerun_rows(previous_rows: list, evaluated_rows: dict) -> list:
+        """
+        在上次的结果行中原地替换重新评价的学生（保持原有顺序，新出现的学生追加在末尾）
+
+        Args:
+            previous_rows: 上次的结果行
+            evaluated_rows: 学生标识 -> 本次的结果行
+
+        Returns:
+            合并后的结果行
+        """
+        merged = []
+        replaced = set()
+        for row in previous_rows:
+            key = HomeworkEvaluationSystem._student_key(row)
+            if key not in evaluated_rows:
+                merged.append(row)
+            elif key not in replaced:
+                merged.extend(evaluated_rows[key])
+                replaced.add(key)
+        for key, rows in evaluated_rows.items():
+            if key not in replaced:
+                merged.extend(rows)
+        return merged
+
+    def _lookup_triaged(self, all_problems: list) -> dict:
+        """
+        快速判定为空文件、未修改的模板或非代码内容的题目，生成规则评价
+
+        Args:
+            all_problems: 题目列表
+
+        Returns:
+            题目下标 -> 规则评价数据
+        """
+        triaged = {}
+        for idx, problem in enumerate(all_problems):
+            if problem.get('triage'):
+                triaged[idx] = SubmissionTriage.evaluation(problem['problem_name'], problem['triage'])
+        if triaged:
+            with self._stats_lock:
+                for evaluation_data in triaged.values():
+                    categories = self.triage_stats['categories']
+                    categories[evaluation_data['triage']] = categories.get(evaluation_data['triage'], 0) + 1
+        return triaged
+
+    def _lookup_duplicates(self, all_problems: list, exclude: dict = None) -> dict:
+        """
+        在去重索引中查找与已评价代码相同的题目
+
+        Args:
+            all_problems: 题目列表
+            exclude: 已经解决、无需查找的题目下标
+
+        Returns:
+            题目下标 -> 复用的评价数据
+        """
+        # 选择性重新评价是为了得到新的评价，不复用索引中的已有评价
+        if self.dedup_index is None or self.rerun:
+            return {}
+
+        reused = {}
+        for idx, problem in enumerate(all_problems):
+            if exclude and idx in exclude:
+                continue
+            entry = self.dedup_index.lookup(problem['problem_name'], problem['code'])
+            if entry:
+                reused[idx] = {
+                    'evaluation': entry['evaluation'],
+                    'score': entry['score'],
+                    'parsed': True,
+                    'duplicate_of': entry.get('source', '')
+                }
+        with self._stats_lock:
+            self.dedup_stats['duplicates'] += len(reused)
+        return reused
+
+    def _record_evaluations(self, student: dict, all_problems: list, problem_evaluations: list):
+        """
+        将成功解析的评价记录到去重索引和近似重复簇的代表评价
+
+        Args:
+            student: 学生信息
+            all_problems: 题目列表
+            problem_evaluations: 与all_problems一一对应的评价列表
+        """
+        student_key = self._student_key(student)
+        source = f"{student.get('student_id', '')} {student['student_name']}".strip()
+        for problem, evaluation_data in zip(all_problems, problem_evaluations):
+            if (evaluation_data.get('error') or evaluation_data.get('triage') or evaluation_data.get('previous')
+                    or self._needs_followup(evaluation_data)):
+                continue
+
+            # 近似重复簇中第一份完整评价完成后，簇内其他成员即可使用差异评价
+            # （并发评价时可能是其他成员先于代表完成，此时由它代替代表作为参照）
+            member_key = (student_key, problem['problem_id'])
+            rep = self.near_dup_reps.get(self.near_dup_members.get(member_key, member_key))
+            if rep is not None and not evaluation_data.get('near_duplicate_of'):
+                with self._stats_lock:
+                    if rep.get('evaluation') is None:
+                        rep['prompt_code'] = problem.get('prompt_code', problem['code'])
+                        rep['source'] = source
+                        rep['student_key'] = student_key
+                        rep['evaluation'] = evaluation_data['evaluation']
+
+            if self.dedup_index is None or evaluation_data.get('duplicate_of'):
+                continue
+            self.dedup_index.record(
+                problem['problem_name'], problem['code'], evaluation_data, source, replace=self.rerun
+            )
+
+    def _build_near_dup_clusters(self, students: list):
+        """
+        读取所有学生的代码，按题目进行 MinHash/LSH 近似重复聚类
+
+        每个簇中最先处理的学生作为代表，获得完整评价；其余成员在代表评价完成后只发送差异。
+
+        Args:
+            students: 已提交作业的学生列表（按处理顺序）
+        """
+        print("\n正在进行近似重复聚类...")
+        start_time = time.time()
+
+        by_problem = {}  # 题目编号 -> {学生标识: 代码}
+        rep_codes = {}
+        for student in students:
+            try:
+                all_problems = self._read_student_problems(student)
+            except Exception:
+                continue
+            key = self._student_key(student)
+            for problem in all_problems:
+                if problem.get('triage'):
+                    continue
+                by_problem.setdefault(problem['problem_id'], {}).setdefault(key, problem['code'])
+                rep_codes[(key, problem['problem_id'])] = (student, problem)
+
+        for problem_id, codes in by_problem.items():
+            for members in cluster_near_duplicates(codes, threshold=self.near_dup_threshold):
+                rep_key = (members[0], problem_id)
+                rep_student, rep_problem = rep_codes[rep_key]
+                self.near_dup_reps[rep_key] = {
+                    'prompt_code': rep_problem.get('prompt_code', rep_problem['code']),
+                    'source': f"{rep_student.get('student_id', '')} {rep_student['student_name']}".strip(),
+                    'student_key': members[0],
+                    'evaluation': None
+                }
+                for member in members[1:]:
+                    self.near_dup_members[(member, problem_id)] = rep_key
+                self.near_dup_stats['clusters'] += 1
+                self.near_dup_stats['members'] += len(members) - 1
+
+        print(f"✓ {len(by_problem)} 道题，发现 {self.near_dup_stats['clusters']} 个近似重复簇"
+              f"（{self.near_dup_stats['members']} 份相似提交，耗时 {time.time() - start_time:.1f}秒）")
+
+    def _update_similarity_index(self, students: list, top_k: int = 3):
+        """
+        将本次所有提交加入持久化相似度索引，并查询每份提交最相似的其他提交（包括往周、往学期和本周同学），
+        结果写入相似度报告
+
+        Args:
+            students: 已提交作业的学生列表
+            top_k: 每份提交最多列出的相似提交数
+        """
+        print("\n正在更新相似度索引...")
+        start_time = time.time()
+
+        index = SimilarityIndex(self.similarity_index_path)
+        try:
+            before = index.count()
+            submissions = []
+            for student in students:
+                try:
+                    all_problems = self._read_student_problems(student)
+                except Exception:
+                    continue
+                student_id = student.get('student_id', '')
+                for problem in all_problems:
+                    index.add(problem['problem_name'], self.week, student_id, student['student_name'], problem['code'])
+                    submissions.append((student, problem))
+
+            # 全部加入后再查询，使本周同学之间的相似也能被发现
+            matches = []
+            for student, problem in submissions:
+                similar = index.query(
+                    problem['problem_name'], problem['code'], top_k=top_k,
+                    min_similarity=self.similarity_threshold,
+                    exclude_student=(student.get('student_id', ''), student['student_name'])
+                )
+                if similar:
+                    matches.append((student, problem['problem_name'], similar))
+
+            self.similarity_stats['total'] = index.count()
+            self.similarity_stats['indexed'] = self.similarity_stats['total'] - before
+            self.similarity_stats['matches'] = sum(len(similar) for _, _, similar in matches)
+        finally:
+            index.close()
+
+        print(f"✓ 新增 {self.similarity_stats['indexed']} 份提交（索引共 {self.similarity_stats['total']} 份），"
+              f"{len(matches)} 份提交存在相似提交（耗时 {time.time() - start_time:.1f}秒）")
+
+        self._save_similarity_report(matches)
+
+    def _save_similarity_report(self, matches: list):
+        """
+        保存相似度报告
+
+        Args:
+            matches: [(学生信息, 题目名称, 相似提交列表), ...]
+        """
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        report_path = os.path.join(self.output_dir, f"第{self.week}周_相似度报告_{timestamp}.txt")
+
+        with open(report_path, 'w', encoding='utf-8') as f:
+            f.write("=" * 60 + "\n")
+            f.write("C++作业评价系统 - 代码相似度报告\n")
+            f.write("=" * 60 + "\n\n")
+
+            f.write(f"作业周次: 第{self.week}周\n")
+            f.write(f"相似度索引: {self.similarity_index_path}（共 {self.similarity_stats['total']} 份提交）\n")
+            f.write(f"相似度阈值: {self.similarity_threshold:.2f}\n")
+            f.write(f"报告生成时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
+
+            f.write("-" * 60 + "\n")
+
+            if not matches:
+                f.write("未发现相似提交\n")
+
+            for student, problem_name, similar in matches:
+                f.write(f"{student.get('student_id', '')} {student['student_name']} - {problem_name}\n")
+                for match in similar:
+                    f.write(
+                        f"    {match['similarity'] * 100:5.1f}%  第{match['week']}周  "
+                        f"{match['student_id']} {match['student_name']}\n"
+                    )
+                f.write("\n")
+
+            f.write("=" * 60 + "\n")
+
+        print(f"✓ 已保存相似度报告: {report_path}")
+
+    def _evaluate_near_duplicates(
+        self,
+        student_name: str,
+        student_id: str,
+        all_problems: list,
+        exclude: dict = None
+    ) -> dict:
+        """
+        对代表代码已完成评价的近似重复题目发送差异提示词（只包含与代表代码的差异）
+
+        差异过大或请求失败的题目不返回，由调用方按正常流程完整评价。
+
+        Args:
+            student_name: 学生姓名
+            student_id: 学号
+            all_problems: 题目列表
+            exclude: 已经解决、无需处理的题目下标
+
+        Returns:
+            题目下标 -> 评价数据
+        """
+        if not self.near_dup_members:
+            return {}
+
+        student_key = self._student_key({'student_name': student_name, 'student_id': student_id})
+        tasks = []
+        for idx, problem in enumerate(all_problems):
+            if exclude and idx in exclude:
+                continue
+            member_key = (student_key, problem['problem_id'])
+            rep = self.near_dup_reps.get(self.near_dup_members.get(member_key, member_key))
+            if rep is None or rep.get('evaluation') is None or rep.get('student_key') == student_key:
+                continue
+
+            prompt_code = problem.get('prompt_code', problem['code'])
+            diff_lines = difflib.unified_diff(
+                rep['prompt_code'].splitlines(), prompt_code.splitlines(), lineterm='', n=2
+            )
+            diff = '\n'.join(line for line in diff_lines if not line.startswith(('---', '+++')))
+            # 差异接近整份代码时，差异评价没有意义
+            if estimate_tokens(diff) > estimate_tokens(prompt_code) * 0.6:
+                continue
+            tasks.append((idx, problem, rep, diff))
+
+        if not tasks:
+            return {}
+
+        print(f"   ≈ {len(tasks)} 道题与已评价的代码近似，发送差异评价...")
+
+        def evaluate_delta(task):
+            idx, problem, rep, diff = task
+            prompt = get_delta_prompt(
+                student_name=student_name,
+                student_id=student_id,
+                problem=problem,
+                reference_evaluation=rep['evaluation'],
+                diff=diff,
+                week=self.week
+            )
+            try:
+                evaluation = self._call_model(prompt, 1)
+            except Exception as e:
+                print(f"   ⚠ 题目{idx+1}差异评价失败，将完整评价: {str(e)}")
+                return idx, None
+            evaluation_data = self._parse_single_evaluation(evaluation, problem, idx + 1)
+            if self._needs_followup(evaluation_data):
+                return idx, None
+            evaluation_data['near_duplicate_of'] = rep['source']
+            return idx, evaluation_data
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(tasks))) as executor:
+            results = list(executor.map(evaluate_delta, tasks))
+
+        delta = {idx: data for idx, data in results if data is not None}
+        with self._stats_lock:
+            self.near_dup_stats['delta_evaluated'] += len(delta)
+        return delta
+
+    def _split_shards(self, student_name: str, student_id: str, all_problems: list) -> list:
+        """
+        按token预算将一个学生的题目拆分为多个分片
+
+        Args:
+            student_name: 学生姓名
+            student_id: 学号
+            all_problems: 题目列表（已按题号排序）
+
+        Returns:
+            分片列表（每个分片为题目列表）
+        """
+        overhead_tokens = estimate_tokens(get_batch_prompt(
+            student_name=student_name,
+            student_id=student_id,
+            all_problems=[],
+            week=self.week
+        ))
+        problem_tokens = [
+            estimate_tokens(self._prompt_code(p)) + estimate_tokens(p.get('problem_name', '')) + 20
+            for p in all_problems
+        ]
+        return split_into_shards(
+            all_problems, problem_tokens, overhead_tokens,
+            self.max_prompt_tokens, self.max_output_tokens
+        )
+
+    def _evaluate_in_shards(self, student_name: str, student_id: str, all_problems: list) -> list:
+        """
+        将超出token预算的学生拆分为多个分片请求并发评价，再按题目顺序拼接结果
+
+        Args:
+            student_name: 学生姓名
+            student_id: 学号
+            all_problems: 题目列表（已按题号排序）
+
+        Returns:
+            每道题的评价数据列表，与all_problems一一对应
+        """
+        shards = self._split_shards(student_name, student_id, all_problems)
+
+        print(f"   ⚠ 超出token预算，拆分为 {len(shards)} 个分片并发评价 "
+              f"({' + '.join(str(len(shard)) for shard in shards)} 道题)")
+        with self._stats_lock:
+            self.shard_stats['students'] += 1
+            self.shard_stats['shards'] += len(shards)
+
+        def evaluate_shard(shard):
+            prompt = get_batch_prompt(
+                student_name=student_name,
+                student_id=student_id,
+                all_problems=shard,
+                week=self.week
+            )
+            try:
+                evaluation = self._call_model(prompt, len(shard))
+            except Exception as e:
+                # 分片失败时标记为未解析，交给补充评价逐题重试
+                print(f"   ⚠ 分片评价失败: {str(e)}")
+                return [{
+                    'evaluation': f"评价失败: {str(e)}",
+                    'score': None,
+                    'parsed': False,
+                    'error': str(e)
+                } for _ in shard]
+            return self._parse_batch_evaluation(evaluation, shard)
+
+        workers = min(self.max_workers, len(shards))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            shard_results = list(executor.map(evaluate_shard, shards))
+
+        problem_evaluations = [data for shard_result in shard_results for data in shard_result]
+        if all(e.get('error') for e in problem_evaluations):
+            raise Exception(problem_evaluations[0]['error'])
+
+        return problem_evaluations
+
+    def _evaluate_problem_major(self, students: list) -> dict:
+        """
+        按题目跨学生批量评价：将所有学生按题目分组，同一道题的多名学生在token预算内
+        打包为一次请求，解析出每名学生的评价后再按学生重新组合
+
+        Args:
+            students: 已提交作业的学生列表
+
+        Returns:
+            学生标识 -> (题目列表, 评价列表)，读取失败的学生不包含在内（会在主循环中重新处理）
+        """
+        print("\n正在读取所有学生的代码并按题目分组...")
+
+        student_problems = {}
+        groups = {}  # 题目编号 -> [(学生标识, 题目下标), ...]
+        for student in students:
+            key = self._student_key(student)
+            try:
+                all_problems = self._read_student_problems(student)
+            except Exception as e:
+                print(f"   ⚠ 读取失败 {student['student_name']}: {str(e)}")
+                continue
+            student_problems[key] = (student, all_problems, [None] * len(all_problems))
+            for problem_idx, problem in enumerate(all_problems):
+                groups.setdefault(problem['problem_id'], []).append((key, problem_idx))
+
+        # 去重：索引中已有的直接复用，同一道题的相同代码只保留第一份参与评价
+        duplicates = {}  # (学生标识, 题目下标) -> 代表提交 (学生标识, 题目下标)
+        for problem_id in groups:
+            first_by_hash = {}
+            unique_members = []
+            for key, problem_idx in groups[problem_id]:
+                student, all_problems, evaluations = student_problems[key]
+                problem = all_problems[problem_idx]
+                previous = self._lookup_previous(student['student_name'], student.get('student_id', ''), [problem])
+                if previous:
+                    evaluations[problem_idx] = previous[0]
+                    continue
+                triaged = self._lookup_triaged([problem])
+                if triaged:
+                    evaluations[problem_idx] = triaged[0]
+                    continue
+                reused = self._lookup_duplicates([problem])
+                if reused:
+                    evaluations[problem_idx] = reused[0]
+                    continue
+                if self.dedup_index is not None:
+                    digest = code_hash(problem['problem_name'], problem['code'])
+                    if digest in first_by_hash:
+                        duplicates[(key, problem_idx)] = first_by_hash[digest]
+                        with self._stats_lock:
+                            self.dedup_stats['duplicates'] += 1
+                        continue
+                    first_by_hash[digest] = (key, problem_idx)
+                unique_members.append((key, problem_idx))
+            groups[problem_id] = unique_members
+        # 全部为重复提交的题目不再需要请求
+        with self._stats_lock:
+            self.dedup_stats['saved_calls'] += sum(1 for members in groups.values() if not members)
+        groups = {problem_id: members for problem_id, members in groups.items() if members}
+
+        # 每道题按token预算打包
+        requests = []
+        for problem_id in sorted(groups, key=self.catalog.sort_key):
+            members = groups[problem_id]
+            problem_name = self.catalog.get(problem_id)['name']
+            submissions = []
+            for key, problem_idx in members:
+                student, all_problems, _ = student_problems[key]
+                submissions.append(dict(
+                    all_problems[problem_idx],
+                    student_name=student['student_name'],
+                    student_id=student.get('student_id', '')
+                ))
+
+            overhead_tokens = estimate_tokens(get_problem_major_prompt(problem_name, [], week=self.week))
+            submission_tokens = [
+                estimate_tokens(self._prompt_code(sub)) + 30
+                for sub in submissions
+            ]
+            packs = split_into_shards(
+                list(zip(members, submissions)), submission_tokens, overhead_tokens,
+                self.max_prompt_tokens, self.max_output_tokens
+            )
+            for pack in packs:
+                requests.append((problem_name, pack))
+
+            self.problem_major_stats['problems'] += 1
+            self.problem_major_stats['submissions'] += len(members)
+
+        self.problem_major_stats['requests'] += len(requests)
+        print(f"✓ {len(groups)} 道题，{sum(len(m) for m in groups.values())} 份提交，"
+              f"打包为 {len(requests)} 次请求")
+
+        def evaluate_pack(request):
+            problem_name, pack = request
+            submissions = [sub for _, sub in pack]
+            prompt = get_problem_major_prompt(problem_name, submissions, week=self.week)
+            print(f"   正在评价 {problem_name} ({len(submissions)}名学生)...")
+            try:
+                evaluation = self._call_model(prompt, len(submissions))
+            except Exception as e:
+                print(f"   ⚠ {problem_name} 批量评价失败: {str(e)}")
+                return [{
+                    'evaluation': f"评价失败: {str(e)}",
+                    'score': None,
+                    'parsed': False,
+                    'error': str(e)
+                } for _ in pack]
+            return self._parse_grouped_evaluation(evaluation, submissions, label='学生')
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pack_results = list(executor.map(evaluate_pack, requests))
+
+        # 按学生重新组合评价结果
+        for (problem_name, pack), evaluations in zip(requests, pack_results):
+            for ((key, problem_idx), _), evaluation_data in zip(pack, evaluations):
+                student_problems[key][2][problem_idx] = evaluation_data
+
+        for (key, problem_idx), (source_key, source_idx) in duplicates.items():
+            evaluation_data = student_problems[source_key][2][source_idx]
+            source_student = student_problems[source_key][0]
+            student_problems[key][2][problem_idx] = dict(
+                evaluation_data,
+                duplicate_of=f"{source_student.get('student_id', '')} {source_student['student_name']}".strip()
+            )
+
+        precomputed = {}
+        for key, (student, all_problems, problem_evaluations) in student_problems.items():
+            if self.followup:
+                problem_evaluations = self._followup_unparsed_problems(
+                    student['student_name'], student.get('student_id', ''),
+                    all_problems, problem_evaluations
+                )
+            if all(e.get('error') for e in problem_evaluations):
+                # 全部失败的学生交给主循环按学生单独处理
+                continue
+            if all(e.get('triage') for e in problem_evaluations):
+                with self._stats_lock:
+                    self.triage_stats['students'] += 1
+            precomputed[key] = (all_problems, problem_evaluations)
+
+        return precomputed
+
+    @staticmethod
+    def _split_labeled_sections(text: str, label: str, count: int) -> list:
+        """
+        按 "#.. {label}N:" 标题行切分文本，返回第1..count段的内容（不含标题行，缺失的为空字符串）
+
+        Args:
+            text: 完整的评价文本
+            label: 标题中的标签，如"学生"
+            count: 期望的段落数
+
+        Returns:
+            段落内容列表
+        """
+        header_pattern = re.compile(rf'^\s*#{{1,4}}\s*{label}\s*(\d+)\s*[:：].*$', re.MULTILINE)
+        headers = list(header_pattern.finditer(text or ''))
+
+        sections = {}
+        for pos, match in enumerate(headers):
+            end = headers[pos + 1].start() if pos + 1 < len(headers) else len(text)
+            section = text[match.end():end].strip()
+            # 去掉段落末尾的 === 分隔符
+            section = re.sub(r'\n?\s*={3,}\s*$', '', section).strip()
+            sections.setdefault(int(match.group(1)), section)
+
+        return [sections.get(idx, '') for idx in range(1, count + 1)]
+
+    def _evaluate_packed_students(self, students: list) -> dict:
+        """
+        将代码量较小的学生按token预算装箱，每箱合并为一次请求评价
+
+        合并评价是无损的：某个学生的段落解析失败时，不返回该学生的结果，
+        主循环会自动对其单独重新评价。
+
+        Args:
+            students: 已提交作业的学生列表
+
+        Returns:
+            学生标识 -> (题目列表, 评价列表)，只包含合并评价成功的学生
+        """
+        # 先按文件大小粗筛，避免读取大作业学生的代码两次
+        candidates = []
+        for student in students:
+            try:
+                size = sum(
+                    os.path.getsize(source['file_path'])
+                    for f in student['files'] for source in f.get('sources') or [f]
+                )
+            except OSError:
+                continue
+            if size <= self.pack_threshold * 4:
+                candidates.append(student)
+
+        small_students = []
+        student_tokens = []
+        for student in candidates:
+            try:
+                all_problems = self._read_student_problems(student)
+            except Exception:
+                continue
+            tokens = sum(
+                estimate_tokens(self._prompt_code(p)) + estimate_tokens(p['problem_name']) + 20
+                for p in all_problems
+            )
+            if any(p.get('triage') for p in all_problems):
+                # 包含空文件或模板的学生在主循环中直接使用规则评价
+                continue
+            if self.dedup_index is not None and all(
+                    self.dedup_index.lookup(p['problem_name'], p['code']) for p in all_problems):
+                # 全部为重复提交，主循环中直接复用，无需请求
+                continue
+            if tokens <= self.pack_threshold:
+                small_students.append(dict(student, all_problems=all_problems))
+                student_tokens.append(tokens)
+
+        overhead_tokens = estimate_tokens(get_packed_prompt([], week=self.week))
+        packs = pack_into_bins(
+            small_students, student_tokens,
+            [len(s['all_problems']) for s in small_students],
+            overhead_tokens, self.max_prompt_tokens, self.max_output_tokens,
+            max_items_per_bin=self.MAX_STUDENTS_PER_PACK
+        )
+        packs = [pack for pack in packs if len(pack) > 1]
+        if not packs:
+            return {}
+
+        packed_count = sum(len(pack) for pack in packs)
+        print(f"\n正在合并评价 {packed_count} 个小学生（共 {len(packs)} 次请求）...")
+        self.pack_stats['students'] += packed_count
+        self.pack_stats['requests'] += len(packs)
+
+        def evaluate_pack(pack):
+            prompt = get_packed_prompt(pack, week=self.week)
+            try:
+                evaluation = self._call_model(prompt, sum(len(s['all_problems']) for s in pack))
+            except Exception as e:
+                print(f"   ⚠ 合并评价失败，{len(pack)} 名学生将单独评价: {str(e)}")
+                return {}
+
+            results = {}
+            sections = self._split_labeled_sections(evaluation, '学生', len(pack))
+            for student, section in zip(pack, sections):
+                if not section:
+                    continue
+                problem_evaluations = self._parse_batch_evaluation(section, student['all_problems'])
+                if any(self._needs_followup(e) for e in problem_evaluations):
+                    continue
+                results[self._student_key(student)] = (student['all_problems'], problem_evaluations)
+            return results
+
+        precomputed = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for results in executor.map(evaluate_pack, packs):
+                precomputed.update(results)
+
+        fallback = packed_count - len(precomputed)
+        with self._stats_lock:
+            self.pack_stats['fallback'] += fallback
+        if fallback:
+            print(f"   ⚠ {fallback} 名学生的合并评价未能正确解析，将单独重新评价")
+        print(f"✓ 合并评价完成 {len(precomputed)} 名学生")
+
+        return precomputed
+
+    def _parse_grouped_evaluation(self, grouped_evaluation: str, entries: list, label: str) -> list:
+        """
+        解析以 "### {label}N:" 标题分隔的评价结果（如按题目批量评价中的每名学生）
+
+        Args:
+            grouped_evaluation: 完整的评价文本
+            entries: 与评价段落一一对应的条目列表（只用于确定数量和序号）
+            label: 段落标题中的标签，如"学生"
+
+        Returns:
+            每个条目的评价数据列表，未找到对应段落的条目 parsed 为 False
+        """
+        sections = self._split_labeled_sections(grouped_evaluation, label, len(entries))
+
+        evaluations = []
+        for idx, section in enumerate(sections, 1):
+            if not is_complete_evaluation(section, self.FOLLOWUP_MIN_LENGTH):
+                evaluations.append({
+                    'evaluation': f"【{label}{idx}】\n\n该评价内容未能正确解析。",
+                    'score': 60,  # 默认分数
+                    'parsed': False
+                })
+                continue
+
+            score, confidence = extract_score(section)
+            evaluations.append({
+                'evaluation': section,
+                'score': score if score is not None else 75,  # 默认分数
+                'score_confidence': confidence,
+                'parsed': True
+            })
+
+        parsed_count = sum(1 for e in evaluations if e['parsed'])
+        print(f"   ✓ 成功解析 {parsed_count}/{len(entries)} 个{label}的评价")
+        return evaluations
+
+    def _evaluate_problems_concurrently(self, student_name: str, student_id: str, all_problems: list) -> list:
+        """
+        逐题并发评价：每道题单独发起请求，无需分割批量回复
+
+        单题请求失败不会影响其他题目，失败的题目会带上error字段。
+
+        Args:
+            student_name: 学生姓名
+            student_id: 学号
+            all_problems: 题目列表
+
+        Returns:
+            每道题的评价数据列表，与all_problems一一对应
+        """
+        def evaluate_one(idx_problem):
+            idx, problem = idx_problem
+            prompt = get_single_prompt(
+                student_name=student_name,
+                student_id=student_id,
+                problem=problem,
+                week=self.week
+            )
+            try:
+                evaluation = self._call_model(prompt, 1)
+            except Exception as e:
+                print(f"   ⚠ 题目{idx}评价失败: {str(e)}")
+                return {
+                    'evaluation': f"评价失败: {str(e)}",
+                    'score': None,
+                    'parsed': False,
+                    'error': str(e)
+                }
+            return self._parse_single_evaluation(evaluation, problem, idx)
+
+        workers = min(self.max_workers, len(all_problems)) or 1
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            problem_evaluations = list(executor.map(evaluate_one, enumerate(all_problems, 1)))
+
+        if all(e.get('error') for e in problem_evaluations):
+            raise Exception(problem_evaluations[0]['error'])
+
+        print(f"   ✓ 逐题评价完成 {len(problem_evaluations)} 道题")
+        return problem_evaluations
+
+    def _count_output_detail(self, evaluation_data: dict):
+        """
+        自适应详略模式下，按分数是否低于阈值统计本次由模型完整评价的题目（省略改进示范的题目数和输出长度）
+
+        沿用上次的评价、复用的评价、近似重复的差异评价、规则评价和失败的题目不计入。
+
+        Args:
+            evaluation_data: 单道题的评价数据
+        """
+        if evaluation_data.get('error') or evaluation_data.get('score') is None or not evaluation_data.get('parsed', True):
+            return
+        if any(evaluation_data.get(field) for field in ('previous', 'triage', 'duplicate_of', 'near_duplicate_of')):
+            return
+        kind = 'brief' if evaluation_data['score'] >= self.detail_threshold else 'detailed'
+        with self._stats_lock:
+            self.output_stats[kind] += 1
+            self.output_stats[f'{kind}_tokens'] += estimate_tokens(evaluation_data.get('evaluation', ''))
+
+    def _print_adaptive_detail_summary(self):
+        """
+        输出自适应详略的统计：本次由模型评价的题目中省略改进示范的题目数，以及估算节省的输出token
+
+        节省量按本次完整评价（低于阈值）的平均长度估算，没有完整评价时按默认的每题输出token数估算，只是估算值。
+        """
+        stats = self.output_stats
+        brief, detailed = stats['brief'], stats['detailed']
+        full_tokens = stats['detailed_tokens'] / detailed if detailed else OUTPUT_TOKENS_PER_PROBLEM
+        saved = max(0, int(brief * full_tokens - stats['brief_tokens']))
+        print(f"\n自适应详略: 阈值 {self.detail_threshold} 分，本次模型评价的 {brief}/{brief + detailed} 道题省略改进示范，"
+              f"模型输出约 {stats['output_tokens']} tokens；"
+              f"按完整评价约 {full_tokens:.0f} tokens/题估算，节省约 {saved} tokens（估算值）")
+
+    def _save_time_report(self):
+        """
+        保存时间统计报告
+        """
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        report_path = os.path.join(self.output_dir, f"第{self.week}周_时间统计_{timestamp}.txt")
+
+        with open(report_path, 'w', encoding='utf-8') as f:
+            f.write("=" * 60 + "\n")
+            f.write("C++作业评价系统 - 时间统计报告\n")
+            f.write("=" * 60 + "\n\n")
+
+            f.write(f"作业周次: 第{self.week}周\n")
+            f.write(f"报告生成时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
+
+            f.write("-" * 60 + "\n")
+            f.write("详细时间记录（每个学生）\n")
+            f.write("-" * 60 + "\n\n")
+
+            # 按时间排序
+            sorted_records = sorted(self.time_records, key=lambda x: x['time_seconds'], reverse=True)
+
+            f.write(f"{'序号':<6} {'学号':<15} {'姓名':<12} {'题目数':<8} {'耗时':<15} {'状态':<8}\n")
+            f.write("-" * 80 + "\n")
+
+            for idx, record in enumerate(sorted_records, 1):
+                status_display = '成功' if record['status'] == 'success' else '失败'
+                f.write(
+                    f"{idx:<6} "
+                    f"{record['student_id']:<15} "
+                    f"{record['student_name']:<12} "
+                    f"{record['num_problems']:<8} "
+                    f"{record['time_formatted']:<15} "
+                    f"{status_display:<8}\n"
+                )
+
+                # 如果有错误信息，也记录
+                if 'error' in record:
+                    f.write(f"       错误: {record['error']}\n")
+
+            # 统计信息
+            f.write("\n" + "=" * 60 + "\n")
+            f.write("统计摘要\n")
+            f.write("=" * 60 + "\n\n")
+
+            success_records = [r for r in self.time_records if r['status'] == 'success']
+            total_time = sum(r['time_seconds'] for r in self.time_records)
+
+            f.write(f"总学生数: {len(self.time_records)}\n")
+            f.write(f"成功评价: {len(success_records)}\n")
+            f.write(f"评价失败: {len(self.time_records) - len(success_records)}\n\n")
+
+            f.write(f"总耗时: {int(total_time // 60)}分{int(total_time % 60)}秒\n")
+
+            if success_records:
+                avg_time = sum(r['time_seconds'] for r in success_records) / len(success_records)
+                f.write(f"平均每人耗时: {int(avg_time // 60)}分{int(avg_time % 60)}秒\n\n")
+
+                fastest = min(success_records, key=lambda x: x['time_seconds'])
+                slowest = max(success_records, key=lambda x: x['time_seconds'])
+
+                f.write(f"最快: {fastest['student_name']} ({fastest['time_formatted']})\n")
+                f.write(f"最慢: {slowest['student_name']} ({slowest['time_formatted']})\n")
+
+            if self.schedule_stats.get('actual_makespan') is not None:
+                f.write(f"\n调度: 最长任务优先，{self.schedule_stats['fast_lane']} 个小任务走快速通道\n")
+                f.write(f"预计评价阶段耗时: {self.schedule_stats['projected_makespan']:.1f}秒\n")
+                f.write(f"实际评价阶段耗时: {self.schedule_stats['actual_makespan']:.1f}秒\n")
+
+            f.write("\n" + "=" * 60 + "\n")
+
+        # 同时保存JSON格式，供后续运行估算每个学生的评价耗时
+        json_path = os.path.splitext(report_path)[0] + '.json'
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'week': self.week,
+                'generated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'schedule': self.schedule_stats,
+                'records': self.time_records
+            }, f, ensure_ascii=False, indent=2)
+
+        print(f"✓ 已保存时间统计报告: {report_path}")
+
+    def _parse_batch_evaluation(self, batch_evaluation: str, all_problems: list) -> list:
+        """
+        解析批量评价结果，提取每道题的评价和分数（单次线性扫描，见 evaluation_parser）
+
+        Args:
+            batch_evaluation: 批量评价的完整文本
+            all_problems: 题目列表
+
+        Returns:
+            每道题的评价数据列表
+            [
+                {'evaluation': '评价内容...', 'score': 85, 'score_confidence': 1.0, 'parsed': True},
+                ...
+            ]
+        """
+        print(f"   正在解析 {len(all_problems)} 道题的评价结果...")
+        print(f"   评价内容长度: {len(batch_evaluation or '')} 字符")
+
+        parsed = parse_batch_evaluation(
+            batch_evaluation, all_problems, min_section_length=self.FOLLOWUP_MIN_LENGTH
+        )
+
+        method = parsed['method']
+        if method == 'empty':
+            print(f"   ⚠ 警告：AI返回的评价内容为空或过短！")
+            print(f"   原始内容: '{batch_evaluation}'")
+        elif method == 'fallback':
+            print(f"   ⚠ 分割结果不足（{parsed['sections']} 个部分），将按题目标题查找或使用完整评价内容")
+        else:
+            method_names = {
+                'separator': '=== 分隔符',
+                'numbered_header': '### 题目N: 标题（按序号对应）',
+                'header': '题目标题模式',
+                'paragraph': '段落重组方式'
+            }
+            print(f"   使用{method_names[method]}分割为 {parsed['sections']} 个部分")
+
+        evaluations = parsed['evaluations']
+        low_confidence = sum(1 for e in evaluations if e['score_confidence'] < CONFIDENCE_LABELED)
+        if low_confidence and method != 'empty':
+            print(f"   ⚠ {low_confidence} 道题未找到明确的分数行，分数为推断或默认值")
+
+        print(f"   ✓ 成功解析 {len(evaluations)} 道题的评价")
+        return evaluations
+
+    def _needs_followup(self, evaluation_data: dict) -> bool:
+        """
+        判断某道题的评价是否需要补充评价（未解析出对应段落，或内容过短且没有明确标注的分数）
+
+        Args:
+            evaluation_data: 单道题的评价数据
+
+        Returns:
+            是否需要补充评价
+        """
+        if not evaluation_data.get('parsed', True):
+            return True
+        return not is_complete_evaluation(evaluation_data.get('evaluation', ''), self.FOLLOWUP_MIN_LENGTH)
+
+    def _followup_unparsed_problems(
+        self,
+        student_name: str,
+        student_id: str,
+        all_problems: list,
+        problem_evaluations: list
+    ) -> list:
+        """
+        对解析失败的题目逐题并发发起补充评价请求，并将结果合并回评价列表
+
+        每个补充请求只包含该题的代码和评分标准，比重新评价整个学生节省大量token和时间。
+
+        Args:
+            student_name: 学生姓名
+            student_id: 学号
+            all_problems: 题目列表
+            problem_evaluations: 批量解析得到的评价列表（与all_problems一一对应）
+
+        Returns:
+            合并补充评价后的评价列表
+        """
+        pending = [idx for idx, data in enumerate(problem_evaluations) if self._needs_followup(data)]
+        if not pending:
+            return problem_evaluations
+
+        print(f"   ⚠ {len(pending)} 道题的评价未能正确解析，正在单独补充评价...")
+
+        def followup_one(idx):
+            problem = all_problems[idx]
+            prompt = get_single_prompt(
+                student_name=student_name,
+                student_id=student_id,
+                problem=problem,
+                week=self.week
+            )
+
+            with self._stats_lock:
+                self.followup_stats['requests'] += 1
+            try:
+                evaluation = self._call_model(prompt, 1)
+            except Exception as e:
+                print(f"   ⚠ 题目{idx+1}补充评价失败: {str(e)}")
+                return
+
+            evaluation_data = self._parse_single_evaluation(evaluation, problem, idx + 1)
+            if self._needs_followup(evaluation_data):
+                print(f"   ⚠ 题目{idx+1}补充评价仍未能解析，保留原评价")
+                return
+
+            problem_evaluations[idx] = evaluation_data
+            with self._stats_lock:
+                self.followup_stats['recovered'] += 1
+            print(f"   ✓ 题目{idx+1}补充评价完成 (分数: {evaluation_data['score']})")
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(pending))) as executor:
+            list(executor.map(followup_one, pending))
+
+        return problem_evaluations
+
+    def _parse_single_evaluation(self, evaluation: str, problem: dict, problem_index: int) -> dict:
+        """
+        解析单题评价结果（不需要分割，整段回复即为该题评价）
+
+        Args:
+            evaluation: 单题评价的完整文本
+            problem: 题目信息
+            problem_index: 题目序号
+
+        Returns:
+            评价数据 {'evaluation': '评价内容...', 'score': 85, 'parsed': True}
+        """
+        section = (evaluation or '').strip()
+        if not is_complete_evaluation(section, self.FOLLOWUP_MIN_LENGTH):
+            return {'evaluation': section, 'score': 75, 'parsed': False}
+
+        problem_name = problem.get('problem_name', f'题目{problem_index}')
+        if not re.search(r'题目\d+|第\d+关', section):
+            section = f"【题目{problem_index}: {problem_name}】\n\n{section}"
+
+        score, confidence = extract_score(section)
+        return {
+            'evaluation': section,
+            'score': score if score is not None else 75,  # 默认分数
+            'score_confidence': confidence,
+            'parsed': True
+        }
+
+
+def main():
     """主函数"""
     import argparse
 
     parser = argparse.ArgumentParser(description='C++作业自动评价系统')
-    parser.add_argument('zip_path', help='作业ZIP文件路径')
+    parser.add_argument('zip_paths', nargs='+', metavar='zip_path',
+                        help='作业ZIP文件路径；可以给出多个（如主导出和补交导出），按顺序叠加，后面的覆盖前面的同一学生，'
+                             '只评价受影响的学生')
     parser.add_argument('--week', default='02', help='作业周次 (默认: 02)')
     parser.add_argument('--provider', choices=['openai', 'claude', 'qwen', 'deepseek'],
                         help='API提供商 (默认: 从.env读取)')
@@ -681,20 +2816,151 @@ def main():
     parser.add_argument('--no-pdf', action='store_true', help='不生成PDF报告')
     parser.add_argument('--excel', action='store_true', help='同时生成Excel汇总')
     parser.add_argument('--no-json', action='store_true', help='不保存JSON结果')
+    parser.add_argument('--no-followup', action='store_true',
+                        help='不对解析失败的题目单独发起补充评价')
+    parser.add_argument('--granularity', choices=list(HomeworkEvaluationSystem.GRANULARITIES),
+                        default='student',
+                        help='评价粒度: student=每个学生一次请求, problem=每道题单独并发请求, '
+                             'problem-major=按题目将多名学生打包为一次请求 (默认: student)')
+    parser.add_argument('--workers', type=int, default=4, help='并发请求数 (默认: 4)')
+    parser.add_argument('--no-compact', action='store_true',
+                        help='不压缩提示词中的代码（默认会删除被注释掉的代码、合并空行）')
+    parser.add_argument('--max-code-lines', type=int, default=0,
+                        help='压缩时每个文件最多保留的行数，超出部分截断，0表示不限制 (默认: 0)')
+    parser.add_argument('--max-code-chars', type=int, default=0,
+                        help='压缩时每个文件最多保留的字符数，超出部分截断，0表示不限制 (默认: 0)')
+    parser.add_argument('--max-prompt-tokens', type=int, default=24000,
+                        help='单个请求的提示词token预算，超出时拆分学生的题目，0表示不限制 (默认: 24000)')
+    parser.add_argument('--max-output-tokens', type=int, default=0,
+                        help='单个请求的预估输出token预算，应设为模型实际的输出上限，超出时拆分学生的题目，0表示不限制 (默认: 0)')
+    parser.add_argument('--pack-students', action='store_true',
+                        help='将代码量较小的学生合并为一次请求评价（仅student粒度）')
+    parser.add_argument('--pack-threshold', type=int, default=1500,
+                        help='代码token数不超过该值的学生参与合并 (默认: 1500)')
+    parser.add_argument('--no-dedup', action='store_true',
+                        help='不对相同代码去重（默认相同代码只评价一次，索引保存在输出目录中）')
+    parser.add_argument('--near-dup', action='store_true',
+                        help='对近似重复的代码聚类，每簇只完整评价一份，其余只发送差异')
+    parser.add_argument('--near-dup-threshold', type=float, default=0.85,
+                        help='近似重复的相似度阈值 (默认: 0.85)')
+    parser.add_argument('--similarity-index', nargs='?', const='', default=None, metavar='PATH',
+                        help='启用跨周次持久化相似度索引并生成相似度报告 (默认路径: 输出目录/similarity_index.sqlite3)')
+    parser.add_argument('--similarity-threshold', type=float, default=0.8,
+                        help='相似度报告中列出的最低相似度 (默认: 0.8)')
+    parser.add_argument('--stage-workers', default='',
+                        help='流水线各阶段线程数，如 read=2,llm=8,render=2 '
+                             '(阶段: read, prompt, llm, parse, render, persist；llm默认与--workers相同)')
+    parser.add_argument('--queue-size', type=int, default=4,
+                        help='流水线阶段之间的队列容量 (默认: 4)')
+    parser.add_argument('--queue-monitor', type=float, default=0,
+                        help='每隔指定秒数打印各阶段队列深度 (默认: 0，不打印)')
+    parser.add_argument('--no-schedule', action='store_true',
+                        help='按学生名单顺序评价（默认按预估耗时调度：最长任务优先，小任务走快速通道）')
+    parser.add_argument('--no-triage', action='store_true',
+                        help='禁用快速判定（空文件、未修改的模板和非代码内容也调用模型评价）')
+    parser.add_argument('--template-dir', default=None,
+                        help='起始模板目录（文件名为题目名称，如 第1关-求三位数.cpp），与模板相同的提交直接判定为未完成')
+    parser.add_argument('--judge', action='store_true',
+                        help='评价前用 g++ 编译并运行测试用例，结果作为客观的正确性依据提供给模型')
+    parser.add_argument('--testcase-dir', default=None,
+                        help='测试用例目录，每道题一个子目录，包含 *.in 和同名 *.out (默认: config/testcases)')
+    parser.add_argument('--judge-workers', type=int, default=None,
+                        help='编译测试的进程数 (默认: CPU核数)')
+    parser.add_argument('--time-limit', type=float, default=1.0,
+                        help='每个测试用例的CPU时间限制（秒） (默认: 1)')
+    parser.add_argument('--memory-limit', type=int, default=256,
+                        help='测试程序的内存限制（MB） (默认: 256)')
+    parser.add_argument('--metrics', action='store_true',
+                        help='统计代码静态指标（行数、嵌套深度、圈复杂度、命名、魔法数字等），写入提示词和汇总表格')
+    parser.add_argument('--metrics-workers', type=int, default=None,
+                        help='统计代码指标的进程数 (默认: CPU核数)')
+    parser.add_argument('--reference-dir', default=None,
+                        help='参考答案目录（每道题一个同名文件或目录），与参考答案高度相似的代码在提示词中只发送差异')
+    parser.add_argument('--reference-max-ratio', type=float, default=0.5,
+                        help='差异不超过完整代码该比例时才只发送差异 (默认: 0.5)')
+    parser.add_argument('--detail-threshold', type=int, default=None,
+                        help='自适应详略：模型先给出分数和一句话总评，只有低于该分数的题目才输出改进示范代码 (默认: 不启用)')
+    parser.add_argument('--roster', default=None,
+                        help='学生名单CSV（学号、姓名），按学号匹配学生文件夹，并列出压缩包中缺少的学生')
+    parser.add_argument('--incremental', action='store_true',
+                        help='增量评价：只重新评价与本周上次运行相比新增或修改了代码的学生，其余学生的结果直接沿用')
+    parser.add_argument('--only-students', default='',
+                        help='选择性重新评价：只评价这些学生（学号或姓名，逗号分隔），其余结果沿用本周上次的JSON并原地替换')
+    parser.add_argument('--only-problems', default='',
+                        help='选择性重新评价：只评价这些题目（题目名称、题目编号或"第N关"，逗号分隔）')
+    parser.add_argument('--only-status', choices=['failed'], default=None,
+                        help='选择性重新评价：只评价上次评价失败或没有分数的题目')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='只生成评价计划：每个学生的token、各提供商费用和总耗时估算，不调用模型')
+    parser.add_argument('--rate-limit', type=float, default=0,
+                        help='每分钟最多发起的请求数，用于评价计划的耗时估算 (默认: 0，不限制)')
+    parser.add_argument('--fast-lane-ratio', type=float, default=0.25,
+                        help='预估耗时不超过最大任务该比例的学生走快速通道 (默认: 0.25)')
 
     args = parser.parse_args()
 
+    # 解析流水线阶段线程数
+    stage_workers = {}
+    for item in filter(None, (part.strip() for part in args.stage_workers.split(','))):
+        name, _, value = item.partition('=')
+        try:
+            stage_workers[name.strip()] = int(value)
+        except ValueError:
+            print(f"错误: 无效的阶段线程数: {item} (格式: 阶段=线程数)")
+            sys.exit(1)
+
     # 检查ZIP文件是否存在
-    if not os.path.exists(args.zip_path):
-        print(f"错误: ZIP文件不存在: {args.zip_path}")
-        sys.exit(1)
+    for zip_path in args.zip_paths:
+        if not os.path.exists(zip_path):
+            print(f"错误: ZIP文件不存在: {zip_path}")
+            sys.exit(1)
 
     # 创建评价系统
     system = HomeworkEvaluationSystem(
-        zip_path=args.zip_path,
+        zip_path=args.zip_paths,
         week=args.week,
         api_provider=args.provider,
-        output_dir=args.output
+        output_dir=args.output,
+        followup=not args.no_followup,
+        granularity=args.granularity,
+        max_workers=args.workers,
+        compactor=None if args.no_compact else CodeCompactor(
+            max_lines=args.max_code_lines, max_chars=args.max_code_chars
+        ),
+        max_prompt_tokens=args.max_prompt_tokens,
+        max_output_tokens=args.max_output_tokens,
+        pack_students=args.pack_students,
+        pack_threshold=args.pack_threshold,
+        dedup=not args.no_dedup,
+        near_dup=args.near_dup,
+        near_dup_threshold=args.near_dup_threshold,
+        similarity_index=(args.similarity_index or os.path.join(args.output, SimilarityIndex.DB_FILENAME))
+        if args.similarity_index is not None else None,
+        similarity_threshold=args.similarity_threshold,
+        stage_workers=stage_workers,
+        queue_size=args.queue_size,
+        queue_monitor=args.queue_monitor,
+        schedule=not args.no_schedule,
+        fast_lane_ratio=args.fast_lane_ratio,
+        dry_run=args.dry_run,
+        rate_limit=args.rate_limit,
+        triage=not args.no_triage,
+        template_dir=args.template_dir,
+        judge=args.judge,
+        testcase_dir=args.testcase_dir,
+        judge_workers=args.judge_workers,
+        time_limit=args.time_limit,
+        memory_limit=args.memory_limit,
+        metrics=args.metrics,
+        metrics_workers=args.metrics_workers,
+        reference_dir=args.reference_dir,
+        reference_max_ratio=args.reference_max_ratio,
+        detail_threshold=args.detail_threshold,
+        roster=args.roster,
+        incremental=args.incremental,
+        only_students=[item.strip() for item in args.only_students.split(',') if item.strip()],
+        only_problems=[item.strip() for item in args.only_problems.split(',') if item.strip()],
+        only_status=args.only_status
     )
 
     # 运行评价
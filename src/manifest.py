@@ -0,0 +1,139 @@
+"""
+评价清单模块
+记录每个学生每道题代码的内容哈希和评价结果（按周次保存到输出目录），
+增量运行时提交没有变化的学生直接沿用上次的结果，只有新增或修改了代码的学生重新评价
+"""
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from dedup import code_hash
+
+
+class EvaluationManifest:
+    """评价清单（学生标识 -> 各题代码哈希和结果行）"""
+
+    def __init__(self, output_dir: str = "./output", week: str = "02"):
+        """
+        初始化评价清单，并加载输出目录中本周已有的清单
+
+        Args:
+            output_dir: 输出目录
+            week: 周次
+        """
+        self.manifest_path = os.path.join(output_dir, f"第{week}周_评价清单.json")
+        self.entries: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+        if os.path.exists(self.manifest_path):
+            try:
+                with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"⚠ 评价清单加载失败，将重新建立: {str(e)}")
+                self.entries = {}
+
+    @staticmethod
+    def problem_hashes(all_problems: List[Dict]) -> Dict[str, str]:
+        """
+        计算一个学生各题代码的规范化内容哈希
+
+        按主文件相对学生文件夹的路径（而不是题目名称）区分各题：
+        多道题可能对应同一个题目名称，按名称记录时会互相覆盖，修改其中一道也检测不到。
+
+        Args:
+            all_problems: 题目列表（_read_student_problems 的返回值）
+
+        Returns:
+            题目文件路径 -> 内容哈希
+        """
+        return {
+            problem['unit_path']: code_hash(problem['problem_name'], problem['code'])
+            for problem in all_problems
+        }
+
+    def lookup(self, student_key: str, hashes: Dict[str, str]) -> Optional[List[Dict]]:
+        """
+        查找提交没有变化的学生上次的结果行
+
+        Args:
+            student_key: 学生标识
+            hashes: 本次各题的内容哈希（problem_hashes 的返回值）
+
+        Returns:
+            上次的结果行；没有记录、新增/删除/修改了题目时返回None
+        """
+        with self._lock:
+            entry = self.entries.get(student_key)
+        if entry is None or entry.get('problems') != hashes:
+            return None
+        return entry['rows']
+
+    def lookup_signature(self, student_key: str, signature: Optional[str]) -> Optional[List[Dict]]:
+        """
+        按ZIP文件列表计算的签名查找上次的结果行（无需读取代码）
+
+        Args:
+            student_key: 学生标识
+            signature: 本次的签名，None表示没有签名
+
+        Returns:
+            签名相同时返回上次的结果行，否则返回None
+        """
+        if not signature:
+            return None
+        with self._lock:
+            entry = self.entries.get(student_key)
+        if entry is None or entry.get('signature') != signature:
+            return None
+        return entry['rows']
+
+    def changes(self, student_key: str, hashes: Dict[str, str]) -> Dict[str, int]:
+        """
+        统计学生相对上次新增和修改的题目数
+
+        Returns:
+            {'added': 新增的题目数, 'changed': 代码有变化的题目数}
+        """
+        with self._lock:
+            previous = (self.entries.get(student_key) or {}).get('problems', {})
+        return {
+            'added': sum(1 for path in hashes if path not in previous),
+            'changed': sum(1 for path, digest in hashes.items() if path in previous and previous[path] != digest),
+        }
+
+    def record(self, student_key: str, hashes: Dict[str, str], rows: List[Dict], signature: Optional[str] = None):
+        """
+        记录一个学生本次的代码哈希和结果行（有失败或没有解析出分数的题目时不记录，下次运行重新评价）
+
+        Args:
+            student_key: 学生标识
+            hashes: 各题的内容哈希
+            rows: 结果行
+            signature: ZIP文件列表计算的签名（可选）
+        """
+        if not rows or any(row.get('status') != 'evaluated' or row.get('score') is None for row in rows):
+            return
+        with self._lock:
+            self.entries[student_key] = {
+                'problems': hashes,
+                'signature': signature,
+                'rows': rows,
+                'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            }
+
+    def save(self) -> str:
+        """
+        保存清单到输出目录
+
+        Returns:
+            清单文件路径
+        """
+        with self._lock:
+            os.makedirs(os.path.dirname(self.manifest_path) or '.', exist_ok=True)
+            with open(self.manifest_path, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f, ensure_ascii=False, indent=2)
+        print(f"✓ 已保存评价清单: {self.manifest_path} ({len(self.entries)} 个学生)")
+        return self.manifest_path
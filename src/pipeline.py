@@ -0,0 +1,170 @@
+"""
+流水线模块
+将评价流程拆分为多个阶段（读取 → 提示词 → 调用模型 → 整理结果 → 生成PDF → 保存），
+阶段之间使用有界队列连接，每个阶段有独立的工作线程数，
+使后续学生的读取和提示词生成可以与正在进行的API调用、PDF渲染同时进行
+"""
+import queue
+import threading
+import time
+from typing import Callable, Dict, Iterable, List
+
+
+# 结束信号
+_STOP = object()
+
+
+class Stage:
+    """流水线中的一个阶段"""
+
+    def __init__(self, name: str, func: Callable[[dict], dict], workers: int = 1, handle_errors: bool = False):
+        """
+        初始化阶段
+
+        Args:
+            name: 阶段名称
+            func: 处理函数，接收任务字典并返回（通常是同一个）任务字典
+            workers: 工作线程数
+            handle_errors: 前面阶段出错的任务是否仍交给该阶段处理（用于记录失败结果）
+        """
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+        self.handle_errors = handle_errors
+
+        # 统计
+        self.processed = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.max_depth = 0
+        self._lock = threading.Lock()
+
+    def record(self, elapsed: float, failed: bool):
+        """记录一次处理"""
+        with self._lock:
+            self.processed += 1
+            self.busy_seconds += elapsed
+            if failed:
+                self.errors += 1
+
+
+class Pipeline:
+    """有界队列流水线"""
+
+    def __init__(self, stages: List[Stage], queue_size: int = 4, monitor_interval: float = 0):
+        """
+        初始化流水线
+
+        Args:
+            stages: 阶段列表（按顺序）
+            queue_size: 每个阶段输入队列的容量（队列满时上游阻塞，形成背压）
+            monitor_interval: 定期打印队列深度的间隔（秒），0表示不打印
+        """
+        self.stages = stages
+        self.queue_size = max(1, queue_size)
+        self.monitor_interval = monitor_interval
+        self.queues = [queue.Queue(maxsize=self.queue_size) for _ in stages]
+
+    def queue_depths(self) -> Dict[str, int]:
+        """
+        当前各阶段输入队列中等待的任务数
+
+        Returns:
+            {阶段名称: 队列深度}
+        """
+        return {stage.name: q.qsize() for stage, q in zip(self.stages, self.queues)}
+
+    def _put(self, index: int, item):
+        """放入第index个阶段的输入队列（队列满时阻塞），并记录最大深度"""
+        self.queues[index].put(item)
+        stage = self.stages[index]
+        depth = self.queues[index].qsize()
+        if depth > stage.max_depth:
+            stage.max_depth = depth
+
+    def _worker(self, index: int):
+        """阶段工作线程：从输入队列取任务，处理后放入下一阶段"""
+        stage = self.stages[index]
+        in_queue = self.queues[index]
+        is_last = index == len(self.stages) - 1
+
+        while True:
+            job = in_queue.get()
+            if job is _STOP:
+                break
+
+            if job.get('error') is None or stage.handle_errors:
+                start = time.time()
+                try:
+                    job = stage.func(job) or job
+                    failed = False
+                except Exception as e:
+                    job['error'] = e
+                    job['error_stage'] = stage.name
+                    failed = True
+                stage.record(time.time() - start, failed)
+
+            if not is_last:
+                self._put(index + 1, job)
+
+    def _monitor(self, stop_event: threading.Event):
+        """定期打印各阶段队列深度"""
+        while not stop_event.wait(self.monitor_interval):
+            depths = self.queue_depths()
+            print("   📊 队列深度: " + " | ".join(
+                f"{name} {depth}/{self.queue_size}" for name, depth in depths.items()
+            ))
+
+    def run(self, items: Iterable[dict]):
+        """
+        运行流水线，直到所有任务经过全部阶段
+
+        Args:
+            items: 任务字典（按顺序送入第一个阶段，队列满时等待）
+        """
+        threads = []
+        for index, stage in enumerate(self.stages):
+            stage_threads = [
+                threading.Thread(target=self._worker, args=(index,), name=f"{stage.name}-{n}", daemon=True)
+                for n in range(stage.workers)
+            ]
+            for thread in stage_threads:
+                thread.start()
+            threads.append(stage_threads)
+
+        stop_event = threading.Event()
+        monitor = None
+        if self.monitor_interval > 0:
+            monitor = threading.Thread(target=self._monitor, args=(stop_event,), daemon=True)
+            monitor.start()
+
+        try:
+            for item in items:
+                self._put(0, item)
+
+            # 逐个阶段发送结束信号：上游全部结束后，下游队列中不会再有新任务
+            for index, stage in enumerate(self.stages):
+                for _ in range(stage.workers):
+                    self.queues[index].put(_STOP)
+                for thread in threads[index]:
+                    thread.join()
+        finally:
+            stop_event.set()
+            if monitor is not None:
+                monitor.join()
+
+    def summary(self) -> List[Dict]:
+        """
+        各阶段的统计信息
+
+        Returns:
+            [{'name', 'workers', 'processed', 'errors', 'busy_seconds', 'max_depth'}, ...]
+        """
+        return [{
+            'name': stage.name,
+            'workers': stage.workers,
+            'processed': stage.processed,
+            'errors': stage.errors,
+            'busy_seconds': stage.busy_seconds,
+            'max_depth': stage.max_depth
+        } for stage in self.stages]
@@ -0,0 +1,72 @@
+"""
+评价计划模块（--dry-run）
+在不调用模型、不加载任何模型SDK的情况下，估算本次评价的请求数、token用量、各提供商费用和总耗时
+"""
+import heapq
+from typing import Dict, List
+
+
+# 各提供商默认模型的参考价格（每百万token），仅用于估算，实际以提供商官网价格为准
+PROVIDER_PRICING = {
+    'deepseek': {'model': 'deepseek-chat', 'currency': '¥', 'input': 2.0, 'output': 8.0},
+    'qwen': {'model': 'qwen-turbo', 'currency': '¥', 'input': 0.3, 'output': 0.6},
+    'openai': {'model': 'gpt-4-turbo', 'currency': '$', 'input': 10.0, 'output': 30.0},
+    'claude': {'model': 'claude-3-5-sonnet', 'currency': '$', 'input': 3.0, 'output': 15.0},
+}
+
+
+def estimate_costs(prompt_tokens: int, output_tokens: int) -> List[Dict]:
+    """
+    估算各提供商的费用
+
+    Args:
+        prompt_tokens: 提示词token总数
+        output_tokens: 输出token总数
+
+    Returns:
+        [{'provider', 'model', 'currency', 'cost'}, ...]
+    """
+    return [{
+        'provider': provider,
+        'model': pricing['model'],
+        'currency': pricing['currency'],
+        'cost': prompt_tokens / 1e6 * pricing['input'] + output_tokens / 1e6 * pricing['output']
+    } for provider, pricing in PROVIDER_PRICING.items()]
+
+
+def simulate_wall_time(latencies: List[float], workers: int, rate_limit: float = 0) -> float:
+    """
+    模拟并发执行所有请求的总耗时（最长任务优先，受并发数和每分钟请求数限制）
+
+    Args:
+        latencies: 每个请求的预估耗时（秒）
+        workers: 并发数
+        rate_limit: 每分钟最多发起的请求数，0表示不限制
+
+    Returns:
+        预估总耗时（秒）
+    """
+    if not latencies:
+        return 0.0
+
+    interval = 60.0 / rate_limit if rate_limit > 0 else 0.0
+    free_at = [0.0] * max(1, workers)
+    heapq.heapify(free_at)
+
+    finish = 0.0
+    for n, latency in enumerate(sorted(latencies, reverse=True)):
+        start = max(heapq.heappop(free_at), n * interval)
+        end = start + latency
+        heapq.heappush(free_at, end)
+        finish = max(finish, end)
+    return finish
+
+
+def format_duration(seconds: float) -> str:
+    """将秒数格式化为 X时X分X秒"""
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    if hours:
+        return f"{hours}时{minutes}分{secs}秒"
+    return f"{minutes}分{secs}秒"
@@ -0,0 +1,203 @@
+"""
+题目目录模块
+扫描完成后一次性把原始的题目文件夹名称（如 "第1关-求三位数-186949483"）映射为稳定的题目编号、
+关卡序号和显示名称（按文件拆分的题目使用文件名），后续的排序、分组和统计都使用整数编号，不再逐个学生重复解析字符串；
+目录保存在输出目录中，同一周次的后续运行沿用已有的编号
+"""
+import json
+import os
+import re
+import threading
+from typing import Dict, List, Optional
+
+
+# 题目文件夹名称末尾的平台编号（如 -186949483）
+_TRAILING_ID_PATTERN = re.compile(r'-\d+$')
+
+# 关卡序号
+_ORDINAL_PATTERN = re.compile(r'第(\d+)关')
+
+# 显示名称开头的关卡序号（"第1关-求三位数" -> "求三位数"）
+_ORDINAL_PREFIX_PATTERN = re.compile(r'^第\d+关[-_\s]*')
+
+# 无法从路径中得到题目文件夹时使用的名称
+UNKNOWN_PROBLEM = "未知题目"
+
+
+def parse_problem_folder(raw_name: str) -> tuple:
+    """
+    解析题目文件夹名称
+
+    Args:
+        raw_name: 原始文件夹名称，如 "第1关-求三位数-186949483"
+
+    Returns:
+        (显示名称, 关卡序号)，如 ("第1关-求三位数", 1)；没有"第N关"时序号为None
+    """
+    name = _TRAILING_ID_PATTERN.sub('', raw_name) or raw_name
+    match = _ORDINAL_PATTERN.search(name)
+    return name, int(match.group(1)) if match else None
+
+
+def problem_folder(relative_path: str) -> str:
+    """
+    从相对路径中取出题目文件夹名称（倒数第二级目录）
+
+    Args:
+        relative_path: 如 "未分班/学号+姓名/代码文件/第1关-求三位数-186949483/main.cpp"
+
+    Returns:
+        如 "第1关-求三位数-186949483"，路径只有一级时返回 UNKNOWN_PROBLEM
+    """
+    parts = re.split(r'[\\/]', relative_path)
+    return parts[-2] if len(parts) >= 2 else UNKNOWN_PROBLEM
+
+
+def unit_problem_name(file_info: Dict) -> str:
+    """
+    取出一道题的原始名称
+
+    按文件拆分的题目（直接放在学生文件夹中的文件、同一文件夹中有多个main函数）取主文件名，
+    否则取所在的题目文件夹名称。
+
+    Args:
+        file_info: 一道题的文件信息（HomeworkExtractor._collect_problem_files 的一项）
+
+    Returns:
+        原始名称，如 "第1关-求三位数-186949483" 或 "a"
+    """
+    return file_info.get('problem_hint') or problem_folder(file_info['relative_path'])
+
+
+class ProblemCatalog:
+    """题目目录（持久化到输出目录，同一周次多次运行的题目编号保持不变）"""
+
+    def __init__(self, output_dir: str = "./output", week: str = "02"):
+        """
+        初始化题目目录，并加载输出目录中本周已有的目录
+
+        Args:
+            output_dir: 输出目录
+            week: 周次
+        """
+        self.catalog_path = os.path.join(output_dir, f"第{week}周_题目目录.json")
+        self.problems: Dict[int, Dict] = {}  # 题目编号 -> {'id', 'ordinal', 'name', 'raw_names'}
+        self._by_raw: Dict[str, int] = {}
+        self._by_name: Dict[str, int] = {}
+        self._rank: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+        if os.path.exists(self.catalog_path):
+            try:
+                with open(self.catalog_path, 'r', encoding='utf-8') as f:
+                    for entry in json.load(f):
+                        self._add(dict(entry, raw_names=list(entry.get('raw_names', []))))
+            except (OSError, ValueError, KeyError, TypeError):
+                self.problems, self._by_raw, self._by_name = {}, {}, {}
+            self._update_rank()
+
+    def _add(self, entry: Dict):
+        """加入一道题（调用方持有锁或处于单线程阶段）"""
+        self.problems[entry['id']] = entry
+        self._by_name[entry['name']] = entry['id']
+        for raw_name in entry['raw_names']:
+            self._by_raw[raw_name] = entry['id']
+
+    def _update_rank(self):
+        """按关卡序号排序（没有序号的按名称排在最后）"""
+        ordered = sorted(
+            self.problems.values(),
+            key=lambda p: (p['ordinal'] is None, p['ordinal'] or 0, p['name'])
+        )
+        self._rank = {entry['id']: rank for rank, entry in enumerate(ordered)}
+
+    def _match_title(self, name: str, ordinal: Optional[int]) -> Optional[int]:
+        """按关卡序号或题目标题（去掉"第N关-"后的部分）查找唯一匹配的已有题目"""
+        matches = [
+            entry['id'] for entry in self.problems.values()
+            if (ordinal is not None and entry['ordinal'] == ordinal)
+            or _ORDINAL_PREFIX_PATTERN.sub('', entry['name']) == name
+        ]
+        return matches[0] if len(matches) == 1 else None
+
+    def register(self, raw_name: str, match_title: bool = False) -> int:
+        """
+        登记一个题目文件夹名称，返回题目编号（显示名称相同的文件夹对应同一道题）
+
+        Args:
+            raw_name: 原始文件夹名称（或按文件拆分的题目的文件名）
+            match_title: 是否按关卡序号或题目标题匹配已有题目（用于文件名，如 "第2关.cpp"、"求三位数.cpp"）
+
+        Returns:
+            题目编号
+        """
+        problem_id = self._by_raw.get(raw_name)
+        if problem_id is not None:
+            return problem_id
+
+        with self._lock:
+            if raw_name in self._by_raw:
+                return self._by_raw[raw_name]
+            name, ordinal = parse_problem_folder(raw_name)
+            problem_id = self._by_name.get(name)
+            if problem_id is None and match_title:
+                problem_id = self._match_title(name, ordinal)
+            if problem_id is None:
+                problem_id = max(self.problems, default=0) + 1
+                self._add({'id': problem_id, 'ordinal': ordinal, 'name': name, 'raw_names': [raw_name]})
+            else:
+                self.problems[problem_id]['raw_names'].append(raw_name)
+                self._by_raw[raw_name] = problem_id
+            self._update_rank()
+            return problem_id
+
+    def build(self, students: List[Dict]):
+        """
+        扫描完成后登记所有学生的题目文件夹（新题目按关卡序号依次编号），
+        再登记按文件拆分的题目的文件名（可以按序号或标题匹配到题目文件夹登记的题目）
+
+        Args:
+            students: get_all_students 返回的学生列表
+        """
+        units = [file_info for student in students for file_info in student.get('files', [])]
+        new_folders = {unit_problem_name(u) for u in units if not u.get('problem_hint')} - set(self._by_raw)
+        new_hints = {unit_problem_name(u) for u in units if u.get('problem_hint')} - set(self._by_raw) - new_folders
+        for names, match_title in ((new_folders, False), (new_hints, True)):
+            ordinals = {raw: parse_problem_folder(raw)[1] for raw in names}
+            for raw_name in sorted(names, key=lambda raw: (ordinals[raw] is None, ordinals[raw] or 0, raw)):
+                self.register(raw_name, match_title)
+        new_folders |= new_hints
+        print(f"✓ 题目目录: {len(self.problems)} 道题" + (f"（新增 {len(new_folders)} 个题目文件夹）" if new_folders else ""))
+
+    def resolve(self, file_info: Dict) -> Dict:
+        """
+        查找一道题对应的题目
+
+        Args:
+            file_info: 一道题的文件信息（含 'relative_path'，按文件拆分时还有 'problem_hint'）
+
+        Returns:
+            题目信息 {'id', 'ordinal', 'name', 'raw_names'}
+        """
+        return self.problems[self.register(unit_problem_name(file_info), bool(file_info.get('problem_hint')))]
+
+    def get(self, problem_id: int) -> Optional[Dict]:
+        """按编号查找题目"""
+        return self.problems.get(problem_id)
+
+    def find(self, name: str) -> Optional[Dict]:
+        """按显示名称或原始文件夹名称查找题目"""
+        problem_id = self._by_name.get(name, self._by_raw.get(name))
+        return self.problems.get(problem_id) if problem_id is not None else None
+
+    def sort_key(self, problem_id: int) -> int:
+        """题目的排序位置（按关卡序号）"""
+        return self._rank.get(problem_id, len(self._rank))
+
+    def save(self):
+        """保存题目目录到输出目录"""
+        with self._lock:
+            os.makedirs(os.path.dirname(self.catalog_path) or '.', exist_ok=True)
+            entries = sorted(self.problems.values(), key=lambda p: self._rank.get(p['id'], 0))
+            with open(self.catalog_path, 'w', encoding='utf-8') as f:
+                json.dump(entries, f, ensure_ascii=False, indent=2)
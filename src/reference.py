@@ -0,0 +1,176 @@
+"""
+参考答案差异模块
+每道题可以提供一份或多份参考答案，学生代码与最接近的参考答案计算规范化的差异，
+与参考答案高度相似的代码在提示词中只发送差异和少量上下文，而不是整份代码（PDF中仍展示完整代码）
+"""
+import difflib
+import os
+import re
+from typing import Dict, List, Optional
+
+from token_estimator import estimate_tokens
+
+
+# 参考答案文件的扩展名
+REFERENCE_EXTENSIONS = ('.cpp', '.cc', '.cxx', '.c', '.h', '.hpp')
+
+# 词法单元（标识符、数字、运算符和标点）
+_TOKEN_PATTERN = re.compile(r'\w+|[^\w\s]')
+
+# 字符串字面量或注释（字符串保留，注释去掉但保留换行，使行号不变）
+_STRING_OR_COMMENT_PATTERN = re.compile(
+    r'"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'|//[^\n]*|/\*.*?\*/',
+    re.DOTALL
+)
+
+
+def _strip_comments(code: str) -> str:
+    """去掉注释，保留字符串字面量和行号"""
+    def replace(match):
+        text = match.group(0)
+        if text[0] in '"\'':
+            return text
+        return '\n' * text.count('\n') or ' '
+    return _STRING_OR_COMMENT_PATTERN.sub(replace, code)
+
+
+def _normalize_lines(code: str) -> List[tuple]:
+    """
+    规范化代码：去掉注释，每行按词法单元重新拼接（只有空白和注释差异的行规范化后相同）
+
+    Returns:
+        [(规范化后的行, 原始行, 行号), ...]，不包含空行
+    """
+    code = (code or '').replace('\r\n', '\n').replace('\r', '\n')
+    original_lines = code.split('\n')
+    stripped_lines = _strip_comments(code).split('\n')
+
+    lines = []
+    for number, (stripped, original) in enumerate(zip(stripped_lines, original_lines), 1):
+        tokens = _TOKEN_PATTERN.findall(stripped)
+        if tokens:
+            lines.append((' '.join(tokens), original.rstrip(), number))
+    return lines
+
+
+class ReferenceSolutions:
+    """参考答案集合"""
+
+    def __init__(self, reference_dir: str, max_ratio: float = 0.5, context: int = 2):
+        """
+        初始化参考答案集合
+
+        参考答案目录中，每道题可以是一个与题目名称同名的文件（如 "第1关-求三位数.cpp"），
+        也可以是一个同名目录（其中的每个文件都是一份参考答案）；名称不同时按"第N关"序号匹配。
+
+        Args:
+            reference_dir: 参考答案目录
+            max_ratio: 差异的token数不超过完整代码的该比例时才使用差异提示词
+            context: 每处差异前后保留的上下文行数
+        """
+        self.reference_dir = reference_dir
+        self.max_ratio = max_ratio
+        self.context = context
+        self._references: Dict[str, list] = {}
+        self.entries = sorted(os.listdir(reference_dir)) if os.path.isdir(reference_dir) else []
+
+    def _find_entry(self, problem_name: str) -> Optional[str]:
+        """查找题目对应的参考答案文件或目录"""
+        for entry in self.entries:
+            if os.path.splitext(entry)[0] == problem_name or entry == problem_name:
+                return os.path.join(self.reference_dir, entry)
+
+        match = re.search(r'第(\d+)关', problem_name)
+        if match:
+            for entry in self.entries:
+                other = re.search(r'第(\d+)关', entry)
+                if other and other.group(1) == match.group(1):
+                    return os.path.join(self.reference_dir, entry)
+        return None
+
+    def load(self, problem_name: str) -> list:
+        """
+        加载一道题的参考答案
+
+        Args:
+            problem_name: 题目名称
+
+        Returns:
+            [(参考答案名称, 规范化的行, 词法单元列表), ...]
+        """
+        if problem_name in self._references:
+            return self._references[problem_name]
+
+        path = self._find_entry(problem_name)
+        if path is None:
+            files = []
+        elif os.path.isdir(path):
+            files = [
+                os.path.join(path, name) for name in sorted(os.listdir(path))
+                if name.lower().endswith(REFERENCE_EXTENSIONS)
+            ]
+        else:
+            files = [path] if path.lower().endswith(REFERENCE_EXTENSIONS) else []
+
+        references = []
+        for file_path in files:
+            try:
+                with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
+                    lines = _normalize_lines(f.read())
+            except OSError:
+                continue
+            tokens = [token for line, _, _ in lines for token in line.split(' ')]
+            references.append((os.path.basename(file_path), lines, tokens))
+
+        self._references[problem_name] = references
+        return references
+
+    def diff(self, problem_name: str, code: str) -> Optional[Dict]:
+        """
+        计算学生代码与最接近的参考答案的差异
+
+        Args:
+            problem_name: 题目名称
+            code: 学生代码
+
+        Returns:
+            {'reference': 参考答案名称, 'similarity': 词法单元相似度, 'diff': 差异文本}，
+            没有参考答案或差异不够小（不如直接发送完整代码）时返回None
+        """
+        references = self.load(problem_name)
+        if not references:
+            return None
+
+        lines = _normalize_lines(code)
+        tokens = [token for line, _, _ in lines for token in line.split(' ')]
+
+        # 按词法单元相似度选择最接近的参考答案
+        best = None
+        for name, ref_lines, ref_tokens in references:
+            similarity = difflib.SequenceMatcher(None, ref_tokens, tokens, autojunk=False).ratio()
+            if best is None or similarity > best[0]:
+                best = (similarity, name, ref_lines)
+        similarity, name, ref_lines = best
+
+        matcher = difflib.SequenceMatcher(
+            None, [line for line, _, _ in ref_lines], [line for line, _, _ in lines], autojunk=False
+        )
+        hunks = []
+        for group in matcher.get_grouped_opcodes(self.context):
+            covered = lines[group[0][3]:group[-1][4]]
+            hunk = [f"@@ 学生代码第{covered[0][2]}-{covered[-1][2]}行 @@" if covered else "@@ 学生代码缺少的部分 @@"]
+            for tag, i1, i2, j1, j2 in group:
+                if tag == 'equal':
+                    hunk.extend(f"  {original}" for _, original, _ in lines[j1:j2])
+                    continue
+                if tag in ('replace', 'delete'):
+                    hunk.extend(f"- {original}" for _, original, _ in ref_lines[i1:i2])
+                if tag in ('replace', 'insert'):
+                    hunk.extend(f"+ {original}" for _, original, _ in lines[j1:j2])
+            hunks.append('\n'.join(hunk))
+
+        diff = '\n\n'.join(hunks) if hunks else '（与参考答案相同）'
+        if estimate_tokens(diff) > estimate_tokens(code) * self.max_ratio:
+            return None
+
+        return {'reference': name, 'similarity': similarity, 'diff': diff}
@@ -13,6 +13,18 @@ import re
 class ResultSaver:
     """评价结果保存器"""
 
+    # 汇总表格的可选列 (表头, 结果字段, 列宽)
+    OPTIONAL_COLUMNS = [
+        ('测试结果', 'judge', 16),
+        ('有效行数', 'loc', 10),
+        ('函数数', 'functions', 8),
+        ('嵌套深度', 'max_nesting', 10),
+        ('圈复杂度', 'complexity', 10),
+        ('魔法数字', 'magic_numbers', 10),
+        ('命名不规范', 'naming_violations', 10),
+        ('using namespace std', 'using_namespace_std', 12),
+    ]
+
     def __init__(self, output_dir: str = "./output"):
         """
         初始化保存器
@@ -151,6 +163,7 @@ C++作业评价报告
         try:
             from openpyxl import Workbook
             from openpyxl.styles import Font, Alignment, PatternFill
+            from openpyxl.utils import get_column_letter
         except ImportError:
             raise Exception("请安装openpyxl库: pip install openpyxl")
 
@@ -166,8 +179,16 @@ C++作业评价报告
         ws = wb.active
         ws.title = f"第{week}周评价汇总"
 
+        # 可选列（只有结果中包含对应字段时才输出），放在评价内容之前
+        optional_columns = [
+            (header, key, width) for header, key, width in self.OPTIONAL_COLUMNS
+            if any(key in result for result in results)
+        ]
+
         # 设置表头
-        headers = ['序号', '学号', '学生姓名', '文件名', '评分', '状态', '评价时间', '评价内容']
+        headers = ['序号', '学号', '学生姓名', '文件名', '评分', '状态', '评价时间']
+        headers += [header for header, _, _ in optional_columns]
+        headers.append('评价内容')
         ws.append(headers)
 
         # 设置表头样式
@@ -197,6 +218,7 @@ C++作业评价报告
                 result.get('score', ''),
                 status_text,
                 result.get('timestamp', ''),
+                *[result.get(key, '') for _, key, _ in optional_columns],
                 result.get('evaluation', '')
             ])
 
@@ -208,7 +230,9 @@ C++作业评价报告
         ws.column_dimensions['E'].width = 10  # 评分
         ws.column_dimensions['F'].width = 12  # 状态
         ws.column_dimensions['G'].width = 20  # 评价时间
-        ws.column_dimensions['H'].width = 60  # 评价内容
+        for offset, (_, _, width) in enumerate(optional_columns):
+            ws.column_dimensions[get_column_letter(8 + offset)].width = width
+        ws.column_dimensions[get_column_letter(len(headers))].width = 60  # 评价内容
 
         # 设置文本对齐
         for row in ws.iter_rows(min_row=2):
@@ -218,7 +242,9 @@ C++作业评价报告
             row[4].alignment = Alignment(horizontal='center')  # 评分
             row[5].alignment = Alignment(horizontal='center')  # 状态
             row[6].alignment = Alignment(horizontal='center')  # 时间
-            row[7].alignment = Alignment(wrap_text=True, vertical='top')  # 评价内容
+            for cell in row[7:-1]:
+                cell.alignment = Alignment(horizontal='center')  # 可选列
+            row[-1].alignment = Alignment(wrap_text=True, vertical='top')  # 评价内容
 
         # 保存文件
         wb.save(file_path)
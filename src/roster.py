@@ -0,0 +1,95 @@
+"""
+学生名单模块
+从CSV名单（学号、姓名）建立哈希索引，扫描ZIP时按学号直接匹配学生文件夹，
+并在不遍历整个目录树的情况下找出压缩包中缺少的学生
+"""
+import csv
+import re
+from typing import Dict, List, Optional
+
+
+# 表头中可以识别的列名
+ID_HEADERS = ('学号', 'student_id', 'id', '编号')
+NAME_HEADERS = ('姓名', 'student_name', 'name', '名字')
+
+# 文件夹名称中可能是学号的数字串
+_ID_CANDIDATE_PATTERN = re.compile(r'\d{4,}')
+
+
+class Roster:
+    """学生名单（学号 -> 学生，姓名 -> 学生）"""
+
+    def __init__(self, path: str):
+        """
+        加载CSV名单
+
+        第一行包含"学号"/"姓名"（或 student_id/name）时按表头取列，否则第一列为学号、第二列为姓名。
+
+        Args:
+            path: CSV文件路径（UTF-8或GBK编码）
+        """
+        self.path = path
+        self.students: List[Dict[str, str]] = []
+        self.by_id: Dict[str, Dict[str, str]] = {}
+        self.by_name: Dict[str, List[Dict[str, str]]] = {}
+
+        rows = self._read_rows(path)
+        id_col, name_col = 0, 1
+        if rows:
+            header = [cell.strip().lower() for cell in rows[0]]
+            if any(h in header for h in ID_HEADERS + NAME_HEADERS):
+                id_col = next((header.index(h) for h in ID_HEADERS if h in header), None)
+                name_col = next((header.index(h) for h in NAME_HEADERS if h in header), None)
+                rows = rows[1:]
+
+        for row in rows:
+            student_id = row[id_col].strip() if id_col is not None and id_col < len(row) else ''
+            student_name = row[name_col].strip() if name_col is not None and name_col < len(row) else ''
+            if not student_id and not student_name:
+                continue
+            student = {'student_id': student_id, 'student_name': student_name or student_id}
+            self.students.append(student)
+            if student_id:
+                self.by_id[student_id] = student
+            self.by_name.setdefault(student['student_name'], []).append(student)
+
+        print(f"✓ 已加载学生名单: {path} ({len(self.students)} 人)")
+
+    @staticmethod
+    def _read_rows(path: str) -> List[List[str]]:
+        """读取CSV的所有行（依次尝试常见编码）"""
+        for encoding in ('utf-8-sig', 'gbk', 'gb18030'):
+            try:
+                with open(path, 'r', encoding=encoding, newline='') as f:
+                    return [row for row in csv.reader(f) if any(cell.strip() for cell in row)]
+            except UnicodeDecodeError:
+                continue
+        raise ValueError(f"无法识别名单文件的编码: {path}")
+
+    def match(self, folder_name: str) -> Optional[Dict[str, str]]:
+        """
+        按文件夹名称查找学生
+
+        依次尝试：学号+姓名格式中的学号、名称中的数字串（学号）、整个名称或"+"后的部分（名单中唯一的姓名）。
+
+        Args:
+            folder_name: 文件夹名称，如 "52********00+泮妍竹"、"2024001_张三" 或 "张三"
+
+        Returns:
+            名单中的学生 {'student_id', 'student_name'}，没有匹配时返回None
+        """
+        if '+' in folder_name:
+            student = self.by_id.get(folder_name.split('+')[0].strip())
+            if student is not None:
+                return student
+
+        for candidate in _ID_CANDIDATE_PATTERN.findall(folder_name):
+            student = self.by_id.get(candidate)
+            if student is not None:
+                return student
+
+        for name in (folder_name.strip(), folder_name.split('+')[-1].strip()):
+            students = self.by_name.get(name)
+            if students and len(students) == 1:
+                return students[0]
+        return None
@@ -0,0 +1,202 @@
+"""
+评价调度模块
+根据提示词token数、题目数和以往运行的时间统计估算每个学生的评价耗时，
+按最长任务优先（LPT）排列评价顺序，并为小任务保留一条快速通道，缩短整体完成时间（makespan）
+"""
+import glob
+import heapq
+import json
+import os
+import statistics
+from typing import Dict, List, Optional
+
+from token_estimator import OUTPUT_TOKENS_PER_PROBLEM
+
+
+class LatencyModel:
+    """评价耗时估算模型：耗时 ≈ a + b × 基础估算，再乘以该学生的历史修正系数"""
+
+    # 没有历史数据时的默认处理速度（token/秒）
+    DEFAULT_PROMPT_RATE = 2000
+    DEFAULT_OUTPUT_RATE = 40
+
+    # 历史修正系数的范围
+    MIN_FACTOR = 0.5
+    MAX_FACTOR = 2.0
+
+    def __init__(self, history: Optional[List[Dict]] = None):
+        """
+        初始化模型，并用历史记录拟合参数
+
+        Args:
+            history: 以往的时间记录 [{'student_name', 'student_id', 'prompt_tokens', 'num_problems', 'llm_seconds'}, ...]
+        """
+        self.a = 0.0
+        self.b = 1.0
+        self.student_factors: Dict[str, float] = {}
+        self.history_size = 0
+
+        records = [
+            r for r in (history or [])
+            if r.get('status', 'success') == 'success' and r.get('prompt_tokens') and r.get('llm_seconds')
+        ]
+        self.history_size = len(records)
+        if not records:
+            return
+
+        xs = [self.base_estimate(r['prompt_tokens'], r.get('num_problems', 1)) for r in records]
+        ys = [r['llm_seconds'] for r in records]
+
+        # 最小二乘拟合 y = a + b·x（记录太少或x没有变化时只拟合比例）
+        if len(records) >= 3 and len(set(xs)) > 1:
+            mean_x, mean_y = statistics.fmean(xs), statistics.fmean(ys)
+            var_x = sum((x - mean_x) ** 2 for x in xs)
+            b = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / var_x
+            if b > 0:
+                self.b = b
+                self.a = max(0.0, mean_y - b * mean_x)
+            else:
+                self.b = sum(ys) / sum(xs)
+        else:
+            self.b = sum(ys) / sum(xs)
+
+        # 每个学生的历史修正系数（实际耗时 / 模型估算的中位数）
+        ratios: Dict[str, List[float]] = {}
+        for record, x, y in zip(records, xs, ys):
+            predicted = self.a + self.b * x
+            if predicted > 0:
+                ratios.setdefault(self.student_key(record), []).append(y / predicted)
+        self.student_factors = {
+            key: min(self.MAX_FACTOR, max(self.MIN_FACTOR, statistics.median(values)))
+            for key, values in ratios.items()
+        }
+
+    @staticmethod
+    def student_key(record: Dict) -> str:
+        """学生标识（学号+姓名）"""
+        student_id = record.get('student_id', '')
+        return f"{student_id}+{record['student_name']}" if student_id else record['student_name']
+
+    @classmethod
+    def base_estimate(cls, prompt_tokens: int, num_problems: int) -> float:
+        """按默认处理速度估算的耗时（秒）"""
+        output_tokens = OUTPUT_TOKENS_PER_PROBLEM * max(1, num_problems)
+        return prompt_tokens / cls.DEFAULT_PROMPT_RATE + output_tokens / cls.DEFAULT_OUTPUT_RATE
+
+    def predict(self, student: Dict, prompt_tokens: int, num_problems: int) -> float:
+        """
+        估算一个学生的评价耗时
+
+        Args:
+            student: 学生信息（包含student_name和student_id）
+            prompt_tokens: 提示词token数
+            num_problems: 题目数
+
+        Returns:
+            预估耗时（秒）
+        """
+        seconds = self.a + self.b * self.base_estimate(prompt_tokens, num_problems)
+        return seconds * self.student_factors.get(self.student_key(student), 1.0)
+
+    @classmethod
+    def from_time_reports(cls, output_dir: str) -> 'LatencyModel':
+        """
+        从输出目录中以往运行的时间统计（JSON）建立模型
+
+        Args:
+            output_dir: 输出目录
+
+        Returns:
+            耗时估算模型
+        """
+        history = []
+        for path in sorted(glob.glob(os.path.join(output_dir, '*_时间统计_*.json'))):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    history.extend(json.load(f).get('records', []))
+            except (OSError, ValueError, AttributeError):
+                continue
+        return cls(history)
+
+
+def simulate(costs: List[float], lanes: List[List[int]]) -> float:
+    """
+    模拟按通道分配的执行：每条通道内按顺序执行
+
+    Args:
+        costs: 每个任务的耗时
+        lanes: 每条通道的任务下标列表
+
+    Returns:
+        最晚完成时间
+    """
+    return max((sum(costs[i] for i in lane) for lane in lanes), default=0.0)
+
+
+def _lpt_lanes(indices: List[int], costs: List[float], workers: int) -> List[List[int]]:
+    """最长任务优先：按耗时从大到小，依次分配给当前最早空闲的通道"""
+    lanes = [[] for _ in range(workers)]
+    heap = [(0.0, lane) for lane in range(workers)]
+    for i in sorted(indices, key=lambda i: costs[i], reverse=True):
+        finish, lane = heapq.heappop(heap)
+        lanes[lane].append(i)
+        heapq.heappush(heap, (finish + costs[i], lane))
+    return lanes
+
+
+def plan_schedule(
+    costs: List[float],
+    workers: int,
+    fast_lane_ratio: float = 0.25,
+    tolerance: float = 0.05
+) -> Dict:
+    """
+    生成评价顺序
+
+    大任务按LPT分配给 workers-1 条通道，耗时不超过最大任务 fast_lane_ratio 倍的小任务从小到大放入快速通道，
+    使小任务尽早完成、不被大任务阻塞；若快速通道使预计完成时间比纯LPT长出 tolerance 以上，则退回纯LPT。
+
+    Args:
+        costs: 每个任务的预估耗时
+        workers: 并发数
+        fast_lane_ratio: 小任务阈值（相对最大任务耗时）
+        tolerance: 允许快速通道增加的预计完成时间比例
+
+    Returns:
+        {
+            'order': 任务下标的执行顺序（按模拟的开始时间排列，供单一队列按顺序领取）,
+            'projected_makespan': 预计完成时间,
+            'fast_lane': 快速通道中的任务数
+        }
+    """
+    indices = list(range(len(costs)))
+    workers = max(1, workers)
+
+    lanes = _lpt_lanes(indices, costs, workers)
+    fast_lane_size = 0
+
+    if workers > 1 and costs:
+        threshold = max(costs) * fast_lane_ratio
+        small = [i for i in indices if costs[i] <= threshold]
+        large = [i for i in indices if costs[i] > threshold]
+        if small and large:
+            candidate = _lpt_lanes(large, costs, workers - 1)
+            candidate.append(sorted(small, key=lambda i: costs[i]))
+            if simulate(costs, candidate) <= simulate(costs, lanes) * (1 + tolerance):
+                lanes = candidate
+                fast_lane_size = len(small)
+
+    # 按模拟的开始时间排列，使共享队列的领取顺序与模拟一致
+    starts = []
+    for lane in lanes:
+        elapsed = 0.0
+        for i in lane:
+            starts.append((elapsed, -costs[i], i))
+            elapsed += costs[i]
+    order = [i for _, _, i in sorted(starts)]
+
+    return {
+        'order': order,
+        'projected_makespan': simulate(costs, lanes),
+        'fast_lane': fast_lane_size
+    }
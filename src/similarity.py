@@ -0,0 +1,228 @@
+"""
+代码相似度模块
+基于词法单元分片（shingling）+ MinHash + LSH 对同一道题的提交进行近似重复聚类，
+时间复杂度近似线性，无需两两比较
+"""
+import re
+import zlib
+import random
+from typing import Dict, Hashable, List, Set
+
+from code_compactor import split_comments
+
+
+# C++词法单元：字符串/字符字面量、标识符、数字、运算符
+_TOKEN_PATTERN = re.compile(
+    r'"(?:\\.|[^"\\\n])*"'
+    r"|'(?:\\.|[^'\\\n])*'"
+    r'|[A-Za-z_]\w*'
+    r'|\d+(?:\.\d+)?(?:[eE][+-]?\d+)?\w*'
+    r'|<<=|>>=|->|\+\+|--|<<|>>|<=|>=|==|!=|&&|\|\||::|[+\-*/%=<>!&|^~?:;,.(){}\[\]#]'
+)
+
+# 保留原样的关键字和常用标准库名称，其余标识符统一替换为 ID（使变量重命名不影响相似度）
+_KEEP_WORDS = {
+    'auto', 'bool', 'break', 'case', 'char', 'class', 'const', 'continue', 'default', 'delete',
+    'do', 'double', 'else', 'enum', 'false', 'float', 'for', 'if', 'include', 'inline', 'int',
+    'long', 'namespace', 'new', 'nullptr', 'private', 'protected', 'public', 'return', 'short',
+    'signed', 'sizeof', 'static', 'struct', 'switch', 'template', 'this', 'true', 'typedef',
+    'unsigned', 'using', 'void', 'while', 'std', 'cin', 'cout', 'endl', 'printf', 'scanf',
+    'string', 'vector', 'map', 'set', 'main', 'iostream', 'cmath', 'algorithm', 'sort',
+}
+
+# 梅森素数，用于MinHash的通用哈希函数
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def tokenize_cpp(code: str) -> List[str]:
+    """
+    将C++代码切分为规范化的词法单元（去掉注释，标识符、数字、字符串分别归一）
+
+    Args:
+        code: 原始代码
+
+    Returns:
+        词法单元列表
+    """
+    without_comments = ''.join(
+        text for kind, text in split_comments(code or '') if kind == 'code'
+    )
+    tokens = []
+    for token in _TOKEN_PATTERN.findall(without_comments):
+        first = token[0]
+        if first == '"' or first == "'":
+            tokens.append('STR')
+        elif first.isdigit():
+            tokens.append('NUM')
+        elif first.isalpha() or first == '_':
+            tokens.append(token if token in _KEEP_WORDS else 'ID')
+        else:
+            tokens.append(token)
+    return tokens
+
+
+def shingle(tokens: List[str], k: int = 5) -> Set[int]:
+    """
+    生成k元词法单元分片的哈希集合
+
+    Args:
+        tokens: 词法单元列表
+        k: 分片长度
+
+    Returns:
+        分片哈希集合
+    """
+    if len(tokens) < k:
+        return {zlib.crc32(' '.join(tokens).encode('utf-8'))} if tokens else set()
+    return {
+        zlib.crc32(' '.join(tokens[i:i + k]).encode('utf-8'))
+        for i in range(len(tokens) - k + 1)
+    }
+
+
+class MinHasher:
+    """MinHash签名生成器"""
+
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        """
+        初始化签名生成器
+
+        Args:
+            num_perm: 哈希函数个数（签名长度）
+            seed: 随机种子（同一索引中必须保持一致）
+        """
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self.params = [
+            (rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME))
+            for _ in range(num_perm)
+        ]
+
+    def signature(self, shingles: Set[int]) -> List[int]:
+        """
+        计算分片集合的MinHash签名
+
+        Args:
+            shingles: 分片哈希集合
+
+        Returns:
+            长度为num_perm的签名
+        """
+        if not shingles:
+            return [_MAX_HASH] * self.num_perm
+        return [
+            min(((a * x + b) % _MERSENNE_PRIME) & _MAX_HASH for x in shingles)
+            for a, b in self.params
+        ]
+
+    def code_signature(self, code: str) -> List[int]:
+        """计算代码的MinHash签名"""
+        return self.signature(shingle(tokenize_cpp(code)))
+
+
+def estimate_similarity(sig_a: List[int], sig_b: List[int]) -> float:
+    """
+    根据两个MinHash签名估算Jaccard相似度
+
+    Args:
+        sig_a: 签名A
+        sig_b: 签名B
+
+    Returns:
+        相似度（0-1）
+    """
+    if not sig_a or len(sig_a) != len(sig_b):
+        return 0.0
+    return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / len(sig_a)
+
+
+class LSHIndex:
+    """MinHash签名的局部敏感哈希（LSH）分带索引"""
+
+    def __init__(self, bands: int = 16, rows: int = 4):
+        """
+        初始化索引
+
+        Args:
+            bands: 分带数
+            rows: 每带的行数（bands * rows 必须等于签名长度）
+        """
+        self.bands = bands
+        self.rows = rows
+        self.buckets: Dict[tuple, List[Hashable]] = {}
+
+    def band_keys(self, signature: List[int]) -> List[tuple]:
+        """计算签名每一带的桶键"""
+        return [
+            (band, tuple(signature[band * self.rows:(band + 1) * self.rows]))
+            for band in range(self.bands)
+        ]
+
+    def add(self, key: Hashable, signature: List[int]) -> Set[Hashable]:
+        """
+        加入一个签名，并返回与之落入同一桶的候选键
+
+        Args:
+            key: 条目标识
+            signature: MinHash签名
+
+        Returns:
+            候选相似条目的键集合
+        """
+        candidates = set()
+        for band_key in self.band_keys(signature):
+            bucket = self.buckets.setdefault(band_key, [])
+            candidates.update(bucket)
+            bucket.append(key)
+        return candidates
+
+
+def cluster_near_duplicates(
+    codes: Dict[Hashable, str],
+    threshold: float = 0.85,
+    hasher: MinHasher = None
+) -> List[List[Hashable]]:
+    """
+    对同一道题的所有提交进行近似重复聚类
+
+    Args:
+        codes: 条目键 -> 代码（按处理顺序排列，每个簇的第一个条目作为代表）
+        threshold: 估算相似度达到该值视为近似重复
+        hasher: MinHash签名生成器（默认64个哈希函数，对应16带×4行）
+
+    Returns:
+        簇列表（只包含两个及以上条目的簇），每个簇按原顺序排列，第一个为代表
+    """
+    hasher = hasher or MinHasher()
+    bands = 16
+    index = LSHIndex(bands=bands, rows=hasher.num_perm // bands)
+
+    order = {key: pos for pos, key in enumerate(codes)}
+    signatures = {}
+    parent = {key: key for key in codes}
+
+    def find(key):
+        while parent[key] != key:
+            parent[key] = parent[parent[key]]
+            key = parent[key]
+        return key
+
+    for key, code in codes.items():
+        signature = hasher.code_signature(code)
+        signatures[key] = signature
+        for candidate in index.add(key, signature):
+            if estimate_similarity(signature, signatures[candidate]) >= threshold:
+                root_a, root_b = find(key), find(candidate)
+                if root_a != root_b:
+                    # 保证根节点始终是顺序最靠前的条目（即代表）
+                    if order[root_a] < order[root_b]:
+                        parent[root_b] = root_a
+                    else:
+                        parent[root_a] = root_b
+
+    clusters: Dict[Hashable, List[Hashable]] = {}
+    for key in codes:
+        clusters.setdefault(find(key), []).append(key)
+
+    return [members for members in clusters.values() if len(members) > 1]
@@ -0,0 +1,194 @@
+"""
+持久化代码相似度索引模块
+将每道题每份提交的 MinHash 签名及 LSH 分带保存在 SQLite 中，跨周次、跨学期增量累积，
+无需重新扫描历史ZIP即可快速查询相似提交
+"""
+import hashlib
+import sqlite3
+import threading
+import zlib
+from array import array
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from dedup import normalize_code
+from similarity import MinHasher, estimate_similarity
+
+
+class SimilarityIndex:
+    """持久化相似度索引"""
+
+    DB_FILENAME = "similarity_index.sqlite3"
+
+    def __init__(self, db_path: str, num_perm: int = 64, bands: int = 16):
+        """
+        打开（或创建）相似度索引
+
+        Args:
+            db_path: SQLite数据库路径
+            num_perm: MinHash签名长度
+            bands: LSH分带数（num_perm必须能被bands整除）
+        """
+        if num_perm % bands:
+            raise ValueError(f"num_perm({num_perm}) 必须能被 bands({bands}) 整除")
+
+        self.db_path = db_path
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.hasher = MinHasher(num_perm=num_perm)
+        self._lock = threading.Lock()
+
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._init_schema()
+
+    def _init_schema(self):
+        """创建数据表，并检查签名参数与已有索引一致"""
+        with self.conn:
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                );
+                CREATE TABLE IF NOT EXISTS submissions (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    problem TEXT NOT NULL,
+                    week TEXT NOT NULL,
+                    student_id TEXT NOT NULL,
+                    student_name TEXT NOT NULL,
+                    code_hash TEXT NOT NULL,
+                    signature BLOB NOT NULL,
+                    created_at TEXT NOT NULL,
+                    UNIQUE(problem, week, student_id, student_name, code_hash)
+                );
+                CREATE TABLE IF NOT EXISTS bands (
+                    problem TEXT NOT NULL,
+                    band INTEGER NOT NULL,
+                    band_hash INTEGER NOT NULL,
+                    submission_id INTEGER NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_bands_lookup ON bands(problem, band, band_hash);
+            """)
+
+            params = f"{self.num_perm}x{self.bands}"
+            row = self.conn.execute("SELECT value FROM meta WHERE key = 'params'").fetchone()
+            if row is None:
+                self.conn.execute("INSERT INTO meta(key, value) VALUES ('params', ?)", (params,))
+            elif row[0] != params:
+                raise ValueError(f"相似度索引参数不一致: 已有 {row[0]}，当前 {params}")
+
+    def _band_hashes(self, signature: List[int]) -> List[int]:
+        """计算签名每一带的哈希（使用crc32，保证跨进程稳定）"""
+        return [
+            zlib.crc32(array('I', signature[band * self.rows:(band + 1) * self.rows]).tobytes())
+            for band in range(self.bands)
+        ]
+
+    def add(self, problem: str, week: str, student_id: str, student_name: str, code: str) -> int:
+        """
+        加入一份提交（同一学生同一周相同的代码只记录一次）
+
+        Args:
+            problem: 题目名称
+            week: 周次（可包含学期前缀，如"2024秋-02"）
+            student_id: 学号
+            student_name: 学生姓名
+            code: 原始代码
+
+        Returns:
+            提交记录id
+        """
+        code_hash = hashlib.sha1(normalize_code(code).encode('utf-8')).hexdigest()
+        key = (problem, week, student_id or '', student_name, code_hash)
+
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT id FROM submissions WHERE problem = ? AND week = ? AND student_id = ? "
+                "AND student_name = ? AND code_hash = ?", key
+            ).fetchone()
+            if row:
+                return row[0]
+
+        signature = self.hasher.code_signature(code)
+        with self._lock, self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO submissions(problem, week, student_id, student_name, code_hash, signature, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                key + (array('I', signature).tobytes(), datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+            )
+            submission_id = cursor.lastrowid
+            self.conn.executemany(
+                "INSERT INTO bands(problem, band, band_hash, submission_id) VALUES (?, ?, ?, ?)",
+                [(problem, band, band_hash, submission_id)
+                 for band, band_hash in enumerate(self._band_hashes(signature))]
+            )
+        return submission_id
+
+    def query(
+        self,
+        problem: str,
+        code: str,
+        top_k: int = 5,
+        min_similarity: float = 0.0,
+        exclude_student: Optional[tuple] = None
+    ) -> List[Dict]:
+        """
+        查询与给定代码最相似的历史提交（只比较LSH候选，不扫描全表）
+
+        Args:
+            problem: 题目名称
+            code: 待查询的代码
+            top_k: 最多返回的条数
+            min_similarity: 最低相似度
+            exclude_student: 需要排除的学生 (学号, 姓名)，通常为查询者本人
+
+        Returns:
+            相似提交列表（按相似度从高到低）
+            [{'week': '02', 'student_id': '...', 'student_name': '...', 'similarity': 0.92}, ...]
+        """
+        signature = self.hasher.code_signature(code)
+
+        with self._lock:
+            candidate_ids = set()
+            for band, band_hash in enumerate(self._band_hashes(signature)):
+                rows = self.conn.execute(
+                    "SELECT submission_id FROM bands WHERE problem = ? AND band = ? AND band_hash = ?",
+                    (problem, band, band_hash)
+                ).fetchall()
+                candidate_ids.update(row[0] for row in rows)
+
+            candidates = []
+            for submission_id in candidate_ids:
+                candidates.append(self.conn.execute(
+                    "SELECT week, student_id, student_name, signature FROM submissions WHERE id = ?",
+                    (submission_id,)
+                ).fetchone())
+
+        best = {}
+        for week, student_id, student_name, blob in candidates:
+            if exclude_student and (student_id, student_name) == tuple(exclude_student):
+                continue
+            similarity = estimate_similarity(signature, list(array('I', blob)))
+            if similarity < min_similarity:
+                continue
+            # 同一学生同一周只保留最相似的一份
+            key = (week, student_id, student_name)
+            if key not in best or similarity > best[key]['similarity']:
+                best[key] = {
+                    'week': week,
+                    'student_id': student_id,
+                    'student_name': student_name,
+                    'similarity': similarity
+                }
+
+        return sorted(best.values(), key=lambda m: m['similarity'], reverse=True)[:top_k]
+
+    def count(self) -> int:
+        """索引中的提交总数"""
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM submissions").fetchone()[0]
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self.conn.close()
@@ -0,0 +1,138 @@
+"""
+Token估算模块
+在调用API之前粗略估算文本的token数量（不依赖任何模型的分词器）
+"""
+import re
+from typing import List
+
+
+# 中日韩字符（含全角标点），大多数模型的分词器中约1个字符对应1个token
+_CJK_PATTERN = re.compile(r'[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uff00-\uffef]')
+
+# 其他字符（英文、代码、空白等）平均每个token对应的字符数
+CHARS_PER_TOKEN = 3.0
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    估算文本的token数量
+
+    Args:
+        text: 任意文本（提示词、代码等）
+
+    Returns:
+        估算的token数量
+    """
+    if not text:
+        return 0
+
+    cjk_count = len(_CJK_PATTERN.findall(text))
+    other_count = len(text) - cjk_count
+    return cjk_count + int(other_count / CHARS_PER_TOKEN + 0.5)
+
+
+# 每道题评价输出的预估token数（评价文字 + 改进示范代码）
+OUTPUT_TOKENS_PER_PROBLEM = 700
+
+
+def estimate_output_tokens(num_problems: int) -> int:
+    """
+    估算评价若干道题时模型输出的token数量
+
+    Args:
+        num_problems: 题目数量
+
+    Returns:
+        估算的输出token数量
+    """
+    return num_problems * OUTPUT_TOKENS_PER_PROBLEM
+
+
+def split_into_shards(
+    items: List,
+    item_tokens: List[int],
+    overhead_tokens: int,
+    max_prompt_tokens: int,
+    max_output_tokens: int
+) -> List[List]:
+    """
+    按token预算将列表按原顺序切分为若干连续分片
+
+    每个分片的提示词（overhead + 各项token之和）不超过 max_prompt_tokens，
+    预估输出不超过 max_output_tokens。单项本身超出预算时单独成为一个分片。
+
+    Args:
+        items: 待切分的列表（如一个学生的所有题目）
+        item_tokens: 每一项在提示词中占用的token数
+        overhead_tokens: 每个请求固定的提示词开销（模板、评分标准等）
+        max_prompt_tokens: 单个请求的提示词token预算，0表示不限制
+        max_output_tokens: 单个请求的输出token预算，0表示不限制
+
+    Returns:
+        分片列表，每个分片是items的一个连续子列表
+    """
+    shards = []
+    current = []
+    current_tokens = overhead_tokens
+
+    for item, tokens in zip(items, item_tokens):
+        over_prompt = max_prompt_tokens and current_tokens + tokens > max_prompt_tokens
+        over_output = max_output_tokens and estimate_output_tokens(len(current) + 1) > max_output_tokens
+        if current and (over_prompt or over_output):
+            shards.append(current)
+            current = []
+            current_tokens = overhead_tokens
+
+        current.append(item)
+        current_tokens += tokens
+
+    if current:
+        shards.append(current)
+
+    return shards
+
+
+def pack_into_bins(
+    items: List,
+    item_tokens: List[int],
+    item_problems: List[int],
+    overhead_tokens: int,
+    max_prompt_tokens: int,
+    max_output_tokens: int,
+    max_items_per_bin: int = 0
+) -> List[List]:
+    """
+    按token预算将若干小条目装箱（首次适应递减算法），用于把多个小请求合并为一个请求
+
+    Args:
+        items: 待装箱的条目（如多个学生）
+        item_tokens: 每个条目在提示词中占用的token数
+        item_problems: 每个条目包含的题目数（用于估算输出token）
+        overhead_tokens: 每个请求固定的提示词开销
+        max_prompt_tokens: 单个请求的提示词token预算，0表示不限制
+        max_output_tokens: 单个请求的输出token预算，0表示不限制
+        max_items_per_bin: 每个箱子最多容纳的条目数，0表示不限制
+
+    Returns:
+        箱子列表，每个箱子是若干条目组成的列表（箱内保持条目的原始顺序）
+    """
+    order = sorted(range(len(items)), key=lambda i: item_tokens[i], reverse=True)
+    bins = []  # [下标列表, 提示词token, 题目数]
+
+    for i in order:
+        for bin_ in bins:
+            indices, tokens, problems = bin_
+            if max_items_per_bin and len(indices) >= max_items_per_bin:
+                continue
+            if max_prompt_tokens and tokens + item_tokens[i] > max_prompt_tokens:
+                continue
+            if max_output_tokens and estimate_output_tokens(problems + item_problems[i]) > max_output_tokens:
+                continue
+            indices.append(i)
+            bin_[1] += item_tokens[i]
+            bin_[2] += item_problems[i]
+            break
+        else:
+            bins.append([[i], overhead_tokens + item_tokens[i], item_problems[i]])
+
+    return [[items[i] for i in sorted(indices)] for indices, _, _ in bins]
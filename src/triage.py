@@ -0,0 +1,150 @@
+"""
+提交快速判定模块
+在调用模型之前识别空文件、未修改的起始模板、没有实际代码的程序和非代码内容，
+直接给出规则评价和分数，这些题目不再调用API
+"""
+import os
+import re
+from typing import Dict, Optional
+
+from dedup import normalize_code
+
+
+# 判定类别 -> (说明, 分数, 改进建议)
+TRIAGE_RULES = {
+    'empty': ('空文件', 0, '提交的文件为空，请补充完整的程序代码后重新提交。'),
+    'non_code': ('非代码内容', 0, '提交的内容不是C++程序代码，请检查是否上传了正确的文件。'),
+    'template': ('未修改的起始模板', 0, '提交的代码与题目提供的起始模板相同，请在模板的指定位置完成代码后重新提交。'),
+    'trivial': ('没有实际代码', 0, '程序中没有实现任何功能（只有空的main函数或头文件），请完成题目要求的代码后重新提交。'),
+}
+
+# 注释和字符串字面量（判断是否有实际代码时去掉）
+_COMMENT_PATTERN = re.compile(r'//[^\n]*|/\*.*?\*/', re.DOTALL)
+_STRING_PATTERN = re.compile(r'"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'')
+
+# 在线评测平台模板中的答题区域（如头歌的 Begin/End 标记）
+_ANSWER_REGION_PATTERN = re.compile(
+    r'/\*+\s*Begin\s*\*+/(.*?)/\*+\s*End\s*\*+/',
+    re.DOTALL | re.IGNORECASE
+)
+
+# 预处理指令和 using 声明
+_DIRECTIVE_PATTERN = re.compile(r'^\s*(#.*|using\s+namespace\s+\w+\s*;)\s*$', re.MULTILINE)
+
+# 空的main函数（最多只有 return 0;）
+_EMPTY_MAIN_PATTERN = re.compile(
+    r'^\s*(int\s+)?main\s*\(\s*(void)?\s*\)\s*\{\s*(return\s+0\s*;)?\s*\}\s*$'
+)
+
+
+def strip_comments(code: str) -> str:
+    """去掉注释（先替换字符串字面量，避免字符串中的 // 被当作注释）"""
+    code = _STRING_PATTERN.sub('""', code)
+    return _COMMENT_PATTERN.sub(' ', code)
+
+
+class SubmissionTriage:
+    """提交快速判定器"""
+
+    def __init__(self, template_dir: Optional[str] = None):
+        """
+        初始化判定器
+
+        Args:
+            template_dir: 起始模板目录（文件名为题目名称，如 "第1关-求三位数.cpp"），
+                          与模板规范化后相同的提交判定为未修改的模板，None表示只使用内置规则
+        """
+        self.templates: Dict[str, str] = {}
+        self.skeletons: Dict[str, str] = {}  # 模板中答题区域以外的部分（规范化后）
+        if template_dir and os.path.isdir(template_dir):
+            for file_name in sorted(os.listdir(template_dir)):
+                problem_name, ext = os.path.splitext(file_name)
+                if ext.lower() not in ('.cpp', '.cc', '.cxx', '.c', '.h', '.hpp'):
+                    continue
+                try:
+                    with open(os.path.join(template_dir, file_name), 'r', encoding='utf-8', errors='replace') as f:
+                        template = f.read()
+                except OSError:
+                    continue
+                self.templates[problem_name] = normalize_code(strip_comments(template))
+                self.skeletons[problem_name] = self._skeleton(template)
+            print(f"✓ 已加载起始模板: {template_dir} ({len(self.templates)} 个)")
+
+    @staticmethod
+    def _skeleton(code: str) -> str:
+        """去掉答题区域和注释后的规范化代码"""
+        return normalize_code(strip_comments(_ANSWER_REGION_PATTERN.sub('', code)))
+
+    @staticmethod
+    def _is_trivial(stripped: str) -> bool:
+        """去掉注释的代码是否只有预处理指令和空的main函数"""
+        body = _DIRECTIVE_PATTERN.sub('', stripped)
+        return not body.strip() or bool(_EMPTY_MAIN_PATTERN.match(body))
+
+    def classify(self, problem_name: str, code: str) -> Optional[str]:
+        """
+        判定一份提交是否无需调用模型
+
+        Args:
+            problem_name: 题目名称
+            code: 原始代码
+
+        Returns:
+            判定类别（TRIAGE_RULES 的键），需要正常评价时返回None
+        """
+        if not code or not code.strip():
+            return 'empty'
+        if '\x00' in code:
+            return 'non_code'
+
+        # 答题区域为空时，只有区域以外的代码也与起始模板相同（没有模板时只是空的main函数）才判定为模板，
+        # 在区域以外完成了代码的提交仍交给模型评价
+        regions = _ANSWER_REGION_PATTERN.findall(code)
+        if regions and not any(strip_comments(region).strip() for region in regions):
+            skeleton = self.skeletons.get(problem_name)
+            if skeleton is not None:
+                if self._skeleton(code) == skeleton:
+                    return 'template'
+            elif self._is_trivial(strip_comments(_ANSWER_REGION_PATTERN.sub('', code))):
+                return 'template'
+
+        stripped = strip_comments(code)
+        template = self.templates.get(problem_name)
+        if template is not None and normalize_code(stripped) == template:
+            return 'template'
+
+        if self._is_trivial(stripped):
+            return 'trivial'
+
+        body = _DIRECTIVE_PATTERN.sub('', stripped)
+        if '{' not in body and ';' not in body:
+            return 'non_code'
+        return None
+
+    @staticmethod
+    def evaluation(problem_name: str, category: str) -> Dict:
+        """
+        生成规则评价（格式与模型评价相同，PDF中正常展示）
+
+        Args:
+            problem_name: 题目名称
+            category: 判定类别
+
+        Returns:
+            评价数据 {'evaluation', 'score', 'parsed', 'score_confidence', 'triage'}
+        """
+        label, score, advice = TRIAGE_RULES[category]
+        evaluation = (
+            f"### {problem_name}\n"
+            f"**分数**: {score}/100\n\n"
+            f"**判定**: {label}（规则判定，未调用模型评价）\n\n"
+            f"**需要改进**:\n"
+            f"- {advice}"
+        )
+        return {
+            'evaluation': evaluation,
+            'score': score,
+            'parsed': True,
+            'score_confidence': 1.0,
+            'triage': category
+        }
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+自适应详略测试
+检查启用阈值时提示词末尾附加输出详略要求、未启用时提示词不变，输出token统计和节省量估算，
+以及简短的段落（没有改进示范）正常解析
+
+用法:
+    python -m pytest test_adaptive_detail.py
+"""
+import os
+import sys
+import tempfile
+
+# 添加src路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from config.prompts import get_adaptive_verbosity_note
+from main import HomeworkEvaluationSystem
+
+
+class EchoEvaluator:
+    """记录提示词并返回固定回复的模型"""
+
+    def __init__(self, reply: str):
+        self.reply = reply
+        self.prompts = []
+
+    def evaluate(self, prompt: str) -> str:
+        self.prompts.append(prompt)
+        return self.reply
+
+
+def make_system(tmp: str, detail_threshold=None) -> HomeworkEvaluationSystem:
+    system = HomeworkEvaluationSystem('unused.zip', output_dir=tmp, dry_run=True, triage=False,
+                                      detail_threshold=detail_threshold)
+    system.evaluator = EchoEvaluator('**分数**: 90/100')
+    return system
+
+
+def test_note_appended_only_with_threshold():
+    """设置阈值时附加详略要求（包含阈值），不设置时提示词保持原样"""
+    with tempfile.TemporaryDirectory() as tmp:
+        plain = make_system(tmp)
+        plain._call_model('PROMPT', 1)
+        assert plain.evaluator.prompts == ['PROMPT']
+
+        adaptive = make_system(tmp, detail_threshold=85)
+        adaptive._call_model('PROMPT', 3)
+        assert adaptive.evaluator.prompts == ['PROMPT' + get_adaptive_verbosity_note(85)]
+        assert '85 分' in adaptive.evaluator.prompts[0]
+        assert adaptive.output_stats['requests'] == 1
+        assert adaptive.output_stats['problems'] == 3
+        assert adaptive.output_stats['output_tokens'] > 0
+
+
+def test_summary_estimates_saved_tokens(capsys):
+    """只统计本次由模型评价的题目：按低于阈值的完整评价的平均长度估算节省的输出token，并标明是估算值"""
+    with tempfile.TemporaryDirectory() as tmp:
+        system = make_system(tmp, detail_threshold=85)
+        full = "改进示范代码 " * 200
+        for evaluation_data in [
+            {'score': 60, 'evaluation': full, 'parsed': True},
+            {'score': 95, 'evaluation': '简短评价', 'parsed': True},
+            {'score': 90, 'evaluation': '简短评价', 'parsed': True},
+            {'score': 0, 'evaluation': '空文件', 'triage': 'empty'},
+            {'score': 95, 'evaluation': '简短评价', 'duplicate_of': '001 张三'},
+            {'score': 95, 'evaluation': '简短评价', 'near_duplicate_of': '001 张三'},
+            {'score': 92, 'evaluation': '上次的评价', 'parsed': True, 'previous': True},
+            {'score': 75, 'evaluation': '', 'parsed': False},
+            {'score': None, 'evaluation': '', 'error': 'timeout'},
+        ]:
+            system._count_output_detail(evaluation_data)
+        # 沿用上次结果的学生（增量评价）只出现在结果行中，不影响统计
+        system.results = [{'status': 'evaluated', 'score': 95, 'evaluation': '简短评价'}] * 5
+
+        system._print_adaptive_detail_summary()
+        output = capsys.readouterr().out
+        assert '本次模型评价的 2/3 道题省略改进示范' in output
+        assert '估算值' in output
+        assert '节省约 0 tokens' not in output
+
+
+def test_brief_section_parsed():
+    """分数不低于阈值的简短段落（没有改进示范）正常解析，也不需要补充评价"""
+    from evaluation_parser import parse_batch_evaluation
+
+    reply = ("### 题目1: 第1关-求和\n**分数**: 95/100\n**总评**: 完全正确。\n\n===\n\n"
+             "### 题目2: 第2关-排序\n**分数**: 60/100\n**总评**: 边界处理有误。\n\n**需要改进**:\n- 数组越界\n\n"
+             "**改进示范**:\n```cpp\nfor (int i = 0; i < n; i++) {}\n```\n")
+    problems = [{'problem_name': '第1关-求和'}, {'problem_name': '第2关-排序'}]
+    evaluations = parse_batch_evaluation(reply, problems)['evaluations']
+    assert [e['parsed'] for e in evaluations] == [True, True]
+    assert [e['score'] for e in evaluations] == [95, 60]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        system = make_system(tmp, detail_threshold=85)
+        assert not system._needs_followup(evaluations[0])
+        assert system._needs_followup({'evaluation': '略', 'score': 75, 'parsed': True})
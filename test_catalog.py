@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+题目目录测试
+检查题目文件夹名称的解析、编号和排序，按文件拆分的题目（直接放在学生文件夹中的文件、
+同一文件夹中有多个main函数）按文件名确定题目，以及目录在同一周次多次运行之间保持编号不变
+
+用法:
+    python -m pytest test_catalog.py
+"""
+import os
+import sys
+import tempfile
+
+# 添加src路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from extractor import HomeworkExtractor
+from problem_catalog import ProblemCatalog, parse_problem_folder, problem_folder
+
+
+def write_files(root: str, files: dict):
+    """在root下创建文件 {相对路径: 内容}"""
+    for relative_path, content in files.items():
+        path = os.path.join(root, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+
+
+def scan(root: str) -> list:
+    """扫描root下的学生文件夹"""
+    return HomeworkExtractor('unused.zip', root).get_all_students(root)
+
+
+MAIN = "int main() { return 0; }\n"
+
+
+def test_parse_problem_folder():
+    """去掉平台编号，取出关卡序号"""
+    assert parse_problem_folder('第1关-求三位数-186949483') == ('第1关-求三位数', 1)
+    assert parse_problem_folder('附加题') == ('附加题', None)
+    assert problem_folder('未分班/001+张三/代码文件/第2关-排序-42/main.cpp') == '第2关-排序-42'
+
+
+def test_folders_numbered_by_ordinal():
+    """不同平台编号的同一关卡对应同一道题，编号和排序按关卡序号"""
+    with tempfile.TemporaryDirectory() as root, tempfile.TemporaryDirectory() as output_dir:
+        write_files(root, {
+            '001+张三/代码文件/第10关-附加-3/main.cpp': MAIN,
+            '001+张三/代码文件/第2关-排序-2/main.cpp': MAIN,
+            '002+李四/代码文件/第2关-排序-99/main.cpp': MAIN,
+        })
+        students = scan(root)
+        catalog = ProblemCatalog(output_dir, '02')
+        catalog.build(students)
+
+        entries = {f['relative_path']: catalog.resolve(f) for s in students for f in s['files']}
+        assert len(catalog.problems) == 2
+        sort_entry = catalog.find('第2关-排序')
+        assert sort_entry['ordinal'] == 2
+        assert sort_entry['id'] == 1 and catalog.find('第10关-附加')['id'] == 2
+        assert {e['name'] for e in entries.values()} == {'第2关-排序', '第10关-附加'}
+        assert catalog.sort_key(1) < catalog.sort_key(2)
+
+
+def test_split_units_use_file_name():
+    """直接放在学生文件夹中的文件和多main文件夹中的文件按文件名各自成为一道题"""
+    with tempfile.TemporaryDirectory() as root, tempfile.TemporaryDirectory() as output_dir:
+        write_files(root, {
+            '张三/a.cpp': MAIN,
+            '张三/b.cpp': MAIN,
+            '张三/b.h': "int f();\n",
+            '张三/代码文件/x.cpp': MAIN,
+            '张三/代码文件/y.cpp': MAIN,
+        })
+        students = scan(root)
+        catalog = ProblemCatalog(output_dir, '02')
+        catalog.build(students)
+
+        names = sorted(catalog.resolve(f)['name'] for f in students[0]['files'])
+        assert names == ['a', 'b', 'x', 'y']
+        assert len({catalog.resolve(f)['id'] for f in students[0]['files']}) == 4
+
+
+def test_split_units_match_problem_title():
+    """文件名与题目文件夹的关卡序号或标题相同时归入该题"""
+    with tempfile.TemporaryDirectory() as root, tempfile.TemporaryDirectory() as output_dir:
+        write_files(root, {
+            '001+张三/代码文件/第1关-求三位数-1/main.cpp': MAIN,
+            '001+张三/代码文件/第2关-排序-2/main.cpp': MAIN,
+            '002+李四/第1关.cpp': MAIN,
+            '002+李四/排序.cpp': MAIN,
+        })
+        students = scan(root)
+        catalog = ProblemCatalog(output_dir, '02')
+        catalog.build(students)
+
+        lisi = next(s for s in students if s['student_name'] == '李四')
+        assert sorted(catalog.resolve(f)['name'] for f in lisi['files']) == ['第1关-求三位数', '第2关-排序']
+        assert len(catalog.problems) == 2
+
+
+def test_catalog_persists_ids():
+    """保存后同一周次再次运行时沿用已有的编号"""
+    with tempfile.TemporaryDirectory() as output_dir:
+        catalog = ProblemCatalog(output_dir, '02')
+        first = catalog.register('第3关-求和-7')
+        catalog.register('第1关-输出-5')
+        catalog.save()
+
+        reloaded = ProblemCatalog(output_dir, '02')
+        assert reloaded.register('第3关-求和-7') == first
+        assert reloaded.find('第3关-求和')['id'] == first
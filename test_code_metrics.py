@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+代码静态指标测试
+检查有效行数、函数数、嵌套深度、圈复杂度、魔法数字、命名和 using namespace std 的统计
+
+用法:
+    python -m pytest test_code_metrics.py
+"""
+import os
+import sys
+
+# 添加src路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from code_metrics import compute_metrics, compute_all, format_metrics_summary
+
+
+CODE = """#include <iostream>
+using namespace std;
+
+// 判断素数
+bool isPrime(int n) {
+    if (n < 2) return false;
+    for (int i = 2; i * i <= n; i++) {
+        if (n % i == 0) {
+            return false;
+        }
+    }
+    return true;
+}
+
+int main() {
+    int n;
+    cin >> n;
+    cout << (isPrime(n) ? "yes" : "no") << endl;
+    return 0;
+}
+"""
+
+
+def test_metrics():
+    metrics = compute_metrics(CODE)
+    assert metrics['functions'] == 2
+    assert metrics['max_nesting'] == 2
+    assert metrics['complexity'] >= 4
+    assert metrics['using_namespace_std']
+    assert metrics['loc'] == 13  # 不含空行、注释和单独的花括号
+
+
+def test_comments_not_counted():
+    """注释中的代码不计入指标"""
+    assert compute_metrics("// int f() { if (a) {} }\nint main() { return 0; }")['functions'] == 1
+
+
+def test_compute_all_matches_single():
+    codes = [CODE, "int main() { return 0; }"]
+    assert compute_all(codes) == [compute_metrics(code) for code in codes]
+
+
+def test_summary():
+    summary = format_metrics_summary(compute_metrics(CODE))
+    assert summary.startswith("代码统计: 有效代码 13 行，2 个函数")
+    assert summary.endswith("使用了 using namespace std")
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+代码压缩测试
+检查死注释识别（被注释掉的代码删除、以控制语句关键字开头的说明性注释保留）、样板行删除和截断
+
+用法:
+    python -m pytest test_compactor.py
+"""
+import os
+import sys
+
+# 添加src路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from code_compactor import CodeCompactor, split_comments
+
+
+def test_commented_out_code_removed():
+    """被注释掉的代码（带分号、括号条件或花括号）被删除"""
+    code = (
+        "int main() {\n"
+        "    // int x = 0;\n"
+        "    // if (n < 0) return -1;\n"
+        "    // for (int i = 0; i < n; i++)\n"
+        "    // cout << x << endl;\n"
+        "    /* while (x > 0) {\n"
+        "       x--;\n"
+        "    } */\n"
+        "    return 0;\n"
+        "}"
+    )
+    compacted = CodeCompactor().compact(code)
+    for line in ("int x = 0", "if (n < 0)", "for (int i", "cout << x", "while (x > 0)"):
+        assert line not in compacted
+    assert "return 0;" in compacted
+
+
+def test_explanatory_comments_kept():
+    """以 if/for/while/return 开头但没有代码语法的说明性注释保留"""
+    comments = [
+        "// if the input is negative, print an error",
+        "// for each digit we add it to the sum",
+        "// while reading, skip spaces",
+        "// return the sum of a and b",
+        "/* for every row:\n   compare with the previous one */",
+    ]
+    code = "\n".join(comments) + "\nint main() { return 0; }"
+    compacted = CodeCompactor().compact(code)
+    for comment in comments:
+        assert comment in compacted
+
+
+def test_boilerplate_removed():
+    """头歌模板的 Begin/End 标记被删除"""
+    code = "/********** Begin **********/\nint a;\n/********** End **********/"
+    assert CodeCompactor().compact(code) == "int a;"
+
+
+def test_truncate_marks_omitted_lines():
+    """超出行数限制时截断并添加标记"""
+    code = "\n".join(f"int a{i};" for i in range(10))
+    compacted = CodeCompactor(max_lines=3).compact(code)
+    assert compacted.split("\n")[:3] == ["int a0;", "int a1;", "int a2;"]
+    assert "已省略后 7 行" in compacted
+
+
+def test_no_truncation_by_default():
+    """默认只做无损的精简，不截断过长的代码"""
+    code = "\n".join(f"int a{i};" for i in range(2000))
+    assert CodeCompactor().compact(code) == code
+
+
+def test_split_comments_skips_literals():
+    """字符串中的 // 和 /* 不会被当作注释"""
+    code = 'cout << "http://a /* b";  // 输出\nint a; /* 块 */'
+    parts = list(split_comments(code))
+    assert [kind for kind, _ in parts] == ['code', 'line_comment', 'code', 'block_comment']
+    assert ''.join(text for _, text in parts) == code
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+重复提交去重测试
+检查代码规范化（只有空白差异的代码视为相同，字面量中的差异必须保留）和去重索引的记录与复用
+
+用法:
+    python -m pytest test_dedup.py
+"""
+import os
+import sys
+import tempfile
+
+# 添加src路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from dedup import normalize_code, code_hash, DedupIndex, evaluation_fingerprint
+
+
+def test_whitespace_only_difference():
+    """只有缩进、换行和运算符两侧空白不同的代码规范化后相同"""
+    a = "int main() {\r\n    int a = 1;\r\n    return a ;\r\n}\r\n"
+    b = "int main(){\n\tint a=1;\n\n  return a;}"
+    assert normalize_code(a) == normalize_code(b)
+    assert code_hash('第1关', a) == code_hash('第1关', b)
+
+
+def test_string_literal_whitespace_kept():
+    """字符串字面量中的空白差异会改变输出，规范化后必须不同"""
+    assert normalize_code('printf("%d %d\\n", a, b);') != normalize_code('printf("%d%d\\n", a, b);')
+    assert normalize_code('cout << " ";') != normalize_code('cout << "";')
+    assert normalize_code('cout << "a  b";') == 'cout<<"a  b";'
+
+
+def test_char_literal_whitespace_kept():
+    """字符字面量 ' ' 与 '' 规范化后不同"""
+    assert normalize_code("char c = ' ';") != normalize_code("char c = '';")
+    assert normalize_code("char c = ' ';") == "char c=' ';"
+
+
+def test_escaped_quote_in_literal():
+    """字面量中的转义引号不会提前结束字面量"""
+    assert normalize_code('s = "a\\"  b";') == 's="a\\"  b";'
+
+
+def test_hash_depends_on_problem():
+    """相同代码在不同题目下的哈希不同"""
+    assert code_hash('第1关', 'int a;') != code_hash('第2关', 'int a;')
+
+
+def test_index_record_and_lookup():
+    """记录后可按规范化代码查找，默认保留最早的记录，replace=True 时替换"""
+    with tempfile.TemporaryDirectory() as output_dir:
+        index = DedupIndex(output_dir)
+        index.record('第1关', 'int a = 1;', {'evaluation': '第一份', 'score': 80}, '001 张三')
+        index.record('第1关', 'int a=1;', {'evaluation': '第二份', 'score': 90}, '002 李四')
+        assert index.lookup('第1关', 'int  a = 1 ;')['source'] == '001 张三'
+        assert index.lookup('第1关', 'int a = 2;') is None
+
+        index.record('第1关', 'int a=1;', {'evaluation': '重新评价', 'score': 85}, '002 李四', replace=True)
+        assert index.lookup('第1关', 'int a=1;')['score'] == 85
+
+        index.save()
+        assert DedupIndex(output_dir).lookup('第1关', 'int a = 1;')['evaluation'] == '重新评价'
+
+
+def test_index_scoped_by_week_and_fingerprint():
+    """其他周次、其他模型或提示词下的评价不会被复用"""
+    with tempfile.TemporaryDirectory() as output_dir:
+        fingerprint = evaluation_fingerprint('model-a', '模板')
+        index = DedupIndex(output_dir, '02', fingerprint)
+        index.record('第1关', 'int a = 1;', {'evaluation': '旧评价', 'score': 80}, '001 张三')
+        index.save()
+
+        assert DedupIndex(output_dir, '02', fingerprint).lookup('第1关', 'int a = 1;')['score'] == 80
+        assert DedupIndex(output_dir, '03', fingerprint).lookup('第1关', 'int a = 1;') is None
+        assert DedupIndex(output_dir, '02', evaluation_fingerprint('model-b', '模板')).lookup('第1关', 'int a = 1;') is None
+        assert DedupIndex(output_dir, '02', evaluation_fingerprint('model-a', '新模板')).lookup('第1关', 'int a = 1;') is None
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+作业文件分组测试
+检查同一题目文件夹中的多个文件合并为一道题（头文件在前、含main函数的文件在最后），
+学生文件夹中直接放置的文件和多main文件夹按文件拆分，以及合并后的代码格式
+
+用法:
+    python -m pytest test_extractor.py
+"""
+import os
+import sys
+import tempfile
+
+# 添加src路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from extractor import HomeworkExtractor, combine_sources
+
+
+MAIN = "#include \"util.h\"\nint main() { return add(1, 2); }\n"
+
+
+def scan(files: dict) -> tuple:
+    """在临时目录中创建 {相对路径: 内容} 并扫描，返回 (临时目录对象, 提取器, 学生列表)"""
+    tmp = tempfile.TemporaryDirectory()
+    for relative_path, content in files.items():
+        path = os.path.join(tmp.name, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+    extractor = HomeworkExtractor('unused.zip', tmp.name)
+    return tmp, extractor, extractor.get_all_students(tmp.name)
+
+
+def test_folder_files_grouped():
+    """题目文件夹中的 main.cpp + util.h + util.cpp 合并为一道题，main文件为主文件并排在最后"""
+    tmp, extractor, students = scan({
+        '001+张三/代码文件/第1关-a-1/main.cpp': MAIN,
+        '001+张三/代码文件/第1关-a-1/util.h': "int add(int a, int b);\n",
+        '001+张三/代码文件/第1关-a-1/util.cpp': "int add(int a, int b) { return a + b; }\n",
+    })
+    with tmp:
+        [unit] = students[0]['files']
+        assert students[0]['file_count'] == 1
+        assert unit['file_name'] == 'util.h + util.cpp + main.cpp'
+        assert unit['file_path'].endswith('main.cpp')
+        assert unit['unit_path'] == '代码文件/第1关-a-1/main.cpp'
+        assert 'problem_hint' not in unit
+
+        sources = extractor.read_problem_sources(unit)
+        assert [name for name, _ in sources] == ['util.h', 'util.cpp', 'main.cpp']
+        combined = combine_sources(sources)
+        assert combined.startswith('// ===== util.h =====\nint add(int a, int b);\n')
+        assert '// ===== main.cpp =====\n#include "util.h"' in combined
+
+
+def test_multiple_mains_split():
+    """同一文件夹中有多个main函数时按源文件拆分，头文件附加到同名的源文件"""
+    tmp, _, students = scan({
+        '001+张三/代码文件/x.cpp': "int main() { return 0; }\n",
+        '001+张三/代码文件/y.cpp': "#include \"y.h\"\nint main() { return Y; }\n",
+        '001+张三/代码文件/y.h': "#define Y 1\n",
+    })
+    with tmp:
+        units = {unit['file_name']: unit for unit in students[0]['files']}
+        assert set(units) == {'x.cpp', 'y.h + y.cpp'}
+        assert units['y.h + y.cpp']['problem_hint'] == 'y'
+
+
+def test_loose_files_split():
+    """直接放在学生文件夹中的文件各自成为一道题"""
+    tmp, _, students = scan({
+        '张三/a.cpp': "int main() { return 0; }\n",
+        '张三/b.cpp': "int helper() { return 1; }\n",
+    })
+    with tmp:
+        assert sorted(unit['problem_hint'] for unit in students[0]['files']) == ['a', 'b']
+
+
+def test_single_file_unchanged():
+    """只有一个文件时合并后的代码与原文件相同"""
+    assert combine_sources([('main.cpp', 'int main() {}\n')]) == 'int main() {}\n'
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+补充评价测试
+检查批量回复被截断或部分段落无法解析时，只对缺失的题目各发起一次单题请求，并把结果合并回原位置
+
+用法:
+    python -m pytest test_followup.py
+"""
+import os
+import re
+import sys
+import tempfile
+import threading
+
+# 添加src路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from main import HomeworkEvaluationSystem
+
+
+SECTION = ("### 题目{idx}: 第{idx}关-题目{idx}\n**分数**: {score}/100\n\n"
+           "**优点**:\n- 思路清晰，输入输出格式正确\n\n**需要改进**:\n- 变量命名可以更有意义\n")
+
+PROBLEMS = [
+    {'problem_name': f'第{idx}关-题目{idx}', 'file_name': 'main.cpp', 'unit_path': f'第{idx}关/main.cpp',
+     'code': f'int main() {{ return {idx}; }}'}
+    for idx in (1, 2, 3, 4)
+]
+
+
+class ScriptedEvaluator:
+    """批量请求返回预先设定的回复，单题请求按代码返回该题的评价"""
+
+    def __init__(self, batch_reply: str):
+        self.batch_reply = batch_reply
+        self.single_prompts = []
+        self._lock = threading.Lock()
+
+    def evaluate(self, prompt: str) -> str:
+        returns = re.findall(r'return (\d+);', prompt)
+        if len(returns) > 1:
+            return self.batch_reply
+        with self._lock:
+            self.single_prompts.append(prompt)
+        idx = int(returns[0])
+        return SECTION.format(idx=idx, score=90 + idx)
+
+
+def evaluate(batch_reply: str, **options) -> tuple:
+    """用脚本化的模型评价一个学生的四道题，返回 (评价列表, 模型, 评价系统)"""
+    with tempfile.TemporaryDirectory() as tmp:
+        system = HomeworkEvaluationSystem('unused.zip', output_dir=tmp, dry_run=True, triage=False,
+                                          dedup=False, **options)
+        system.evaluator = ScriptedEvaluator(batch_reply)
+        evaluations = system._evaluate_student_problems('张三', '001', [dict(p) for p in PROBLEMS])
+    return evaluations, system.evaluator, system
+
+
+def test_truncated_reply_follows_up_missing_problems():
+    """回复在第二道题之后被截断：第3、4题各补充一次单题请求，结果合并回原位置"""
+    reply = "\n===\n\n".join(SECTION.format(idx=idx, score=80 + idx) for idx in (1, 2))
+    evaluations, evaluator, system = evaluate(reply)
+
+    assert len(evaluator.single_prompts) == 2
+    assert sorted(re.search(r'return (\d+);', p).group(1) for p in evaluator.single_prompts) == ['3', '4']
+    assert [e['score'] for e in evaluations] == [81, 82, 93, 94]
+    assert all(e['parsed'] for e in evaluations)
+    assert system.followup_stats == {'requests': 2, 'recovered': 2}
+
+
+def test_unparseable_section_replaced_in_place():
+    """中间一道题的段落过短无法解析，只补充该题"""
+    sections = [SECTION.format(idx=idx, score=80 + idx) for idx in (1, 2, 3, 4)]
+    sections[1] = "### 题目2: 第2关-题目2\n略"
+    evaluations, evaluator, _ = evaluate("\n===\n\n".join(sections))
+
+    assert len(evaluator.single_prompts) == 1
+    assert 'return 2;' in evaluator.single_prompts[0]
+    assert [e['score'] for e in evaluations] == [81, 92, 83, 84]
+
+
+def test_followup_disabled():
+    """关闭补充评价时不发起单题请求，缺失的题目保持未解析"""
+    reply = SECTION.format(idx=1, score=81)
+    evaluations, evaluator, _ = evaluate(reply, followup=False)
+
+    assert evaluator.single_prompts == []
+    assert evaluations[0]['parsed'] and not any(e['parsed'] for e in evaluations[1:])
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+评价粒度测试
+检查逐题并发评价（每道题一次单题请求，单题失败不影响其他题目），
+以及按题目跨学生批量评价（同一道题的多名学生合并为一次请求，解析后按学生重新组合）
+
+用法:
+    python -m pytest test_granularity.py
+"""
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+
+# 添加src路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from extractor import HomeworkExtractor
+from main import HomeworkEvaluationSystem
+
+
+EVALUATION = ("**分数**: {score}/100\n**总评**: 思路清晰，输入输出格式正确。\n"
+              "**优点**: 逻辑简洁，边界情况处理完整。\n**需要改进**: 变量命名可以更有意义，适当添加注释。\n")
+
+
+class FakeEvaluator:
+    """记录提示词并按提示词内容返回评价的模型"""
+
+    def __init__(self, reply):
+        self.reply = reply
+        self.prompts = []
+        self._lock = threading.Lock()
+
+    def evaluate(self, prompt: str) -> str:
+        with self._lock:
+            self.prompts.append(prompt)
+        return self.reply(prompt)
+
+
+def make_system(tmp: str, reply, **options) -> tuple:
+    """创建使用假模型的评价系统，返回 (评价系统, 假模型)"""
+    system = HomeworkEvaluationSystem('unused.zip', output_dir=tmp, dry_run=True, triage=False, **options)
+    system.evaluator = FakeEvaluator(reply)
+    return system, system.evaluator
+
+
+PROBLEMS = [
+    {'problem_name': f'第{idx}关-题目{idx}', 'file_name': 'main.cpp', 'code': f'int main() {{ return {idx}; }}'}
+    for idx in (1, 2, 3)
+]
+
+
+def test_problem_granularity_one_request_per_problem():
+    """每道题单独请求，回复无需分割，结果与题目一一对应"""
+    def reply(prompt):
+        idx = next(i for i in (1, 2, 3) if f'return {i};' in prompt)
+        return EVALUATION.format(score=80 + idx)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        system, evaluator = make_system(tmp, reply, granularity='problem')
+        evaluations = system._evaluate_problems_concurrently('张三', '001', PROBLEMS)
+
+        assert len(evaluator.prompts) == 3
+        assert all(prompt.count('int main()') == 1 for prompt in evaluator.prompts)
+        assert [e['score'] for e in evaluations] == [81, 82, 83]
+        assert all(e['parsed'] for e in evaluations)
+        assert system.output_stats['requests'] == 3
+
+
+def test_problem_granularity_isolates_failures():
+    """单题请求失败只影响该题；所有题目都失败时整个学生失败"""
+    def reply(prompt):
+        if 'return 2;' in prompt:
+            raise RuntimeError('timeout')
+        return EVALUATION.format(score=90)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        system, _ = make_system(tmp, reply, granularity='problem')
+        evaluations = system._evaluate_problems_concurrently('张三', '001', PROBLEMS)
+        assert [e.get('error') for e in evaluations] == [None, 'timeout', None]
+        assert evaluations[2]['score'] == 90
+
+        try:
+            system._evaluate_problems_concurrently('张三', '001', PROBLEMS[1:2])
+        except Exception as e:
+            assert str(e) == 'timeout'
+        else:
+            raise AssertionError('全部题目失败时应抛出异常')
+
+
+def test_problem_major_packs_students_per_problem():
+    """同一道题的所有学生合并为一次请求，按 "### 学生N:" 段落解析后回到各自学生；相同代码只评价一次"""
+    def reply(prompt):
+        labels = re.findall(r'^### 学生(\d+): (\d+) ', prompt, re.MULTILINE)
+        return '\n'.join(
+            f"### 学生{n}: {student_id}\n" + EVALUATION.format(score=60 + int(student_id))
+            for n, student_id in labels
+        )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = os.path.join(tmp, 'hw')
+        codes = {'001+张三': (1, 2), '002+李四': (5, 6), '003+王五': (1, 7)}
+        for student, returns in codes.items():
+            for problem, value in zip(('第1关-a-1', '第2关-b-2'), returns):
+                folder = os.path.join(root, student, '代码文件', problem)
+                os.makedirs(folder)
+                with open(os.path.join(folder, 'main.cpp'), 'w', encoding='utf-8') as f:
+                    f.write(f"int main() {{ return {value}; }}\n")
+
+        system, evaluator = make_system(os.path.join(tmp, 'out'), reply, granularity='problem-major')
+        system.extractor = HomeworkExtractor('unused.zip', root)
+        students = system.extractor.get_all_students(root)
+        system.catalog.build(students)
+        precomputed = system._evaluate_problem_major(students)
+
+        assert len(evaluator.prompts) == 2
+        scores = {
+            key: [e['score'] for e in evaluations]
+            for key, (_, evaluations) in precomputed.items()
+        }
+        assert sorted(scores.values()) == [[61, 61], [61, 63], [62, 62]]
+        duplicate = [e for _, evaluations in precomputed.values() for e in evaluations if e.get('duplicate_of')]
+        assert [e['duplicate_of'] for e in duplicate] == ['001 张三']
+
+
+def test_grouped_evaluation_missing_section():
+    """回复中缺少某名学生的段落时，该学生标记为未解析（交给后续单题追问）"""
+    with tempfile.TemporaryDirectory() as tmp:
+        system, _ = make_system(tmp, lambda prompt: '')
+        text = "### 学生1: 001 张三\n" + EVALUATION.format(score=88) + "\n### 学生3: 003 王五\n" + EVALUATION.format(score=70)
+        evaluations = system._parse_grouped_evaluation(text, [{}, {}, {}], label='学生')
+        assert [e['parsed'] for e in evaluations] == [True, False, True]
+        assert [evaluations[0]['score'], evaluations[2]['score']] == [88, 70]
+
+
+def test_nested_requests_share_worker_limit():
+    """多个学生同时逐题并发评价时，同时进行的模型请求不超过 max_workers"""
+    state = {'active': 0, 'peak': 0}
+    lock = threading.Lock()
+
+    def reply(prompt):
+        with lock:
+            state['active'] += 1
+            state['peak'] = max(state['peak'], state['active'])
+        time.sleep(0.05)
+        with lock:
+            state['active'] -= 1
+        return EVALUATION.format(score=80)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        system, evaluator = make_system(tmp, reply, granularity='problem', max_workers=2)
+        threads = [
+            threading.Thread(target=system._evaluate_problems_concurrently, args=(f'学生{n}', f'00{n}', PROBLEMS))
+            for n in range(3)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(evaluator.prompts) == 9
+        assert state['peak'] == 2
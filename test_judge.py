@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+编译测试模块测试
+检查 g++ 编译和运行结果的判定（通过、答案错误、运行错误、编译失败）、按"第N关"序号匹配测试用例目录，
+相同代码按哈希缓存只测试一次，以及学生程序看不到评价程序的环境变量、超时后fork出的子进程也被杀死（没有 g++ 时跳过）
+
+用法:
+    python -m pytest test_judge.py
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import pytest
+
+# 添加src路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from judge import CompileJudge, format_judge_label, format_judge_summary
+
+
+pytestmark = pytest.mark.skipif(shutil.which('g++') is None, reason="未找到 g++")
+
+CORRECT = """#include <iostream>
+int main() { int a, b; std::cin >> a >> b; std::cout << a + b << std::endl; return 0; }
+"""
+WRONG = CORRECT.replace('a + b', 'a - b')
+CRASH = "int main() { return 3; }\n"
+LEAK = """#include <cstdio>
+#include <cstdlib>
+int main() { int a, b; std::scanf("%d %d", &a, &b); std::printf("%d\\n", std::getenv("JUDGE_TEST_SECRET") ? -1 : a + b); }
+"""
+FORK_LOOP = """#include <unistd.h>
+int main() { fork(); for (;;) {} }
+"""
+BROKEN = "int main() { return 0 }\n"
+
+
+def make_judge(tmp: str) -> CompileJudge:
+    """在临时目录中写入"第1关"的两组测试用例，返回编译测试器"""
+    case_dir = os.path.join(tmp, 'testcases', '第1关-求和')
+    os.makedirs(case_dir)
+    for name, test_input, expected in (('1', '1 2\n', '3\n'), ('2', '5 5\n', '10')):
+        with open(os.path.join(case_dir, f'{name}.in'), 'w', encoding='utf-8') as f:
+            f.write(test_input)
+        with open(os.path.join(case_dir, f'{name}.out'), 'w', encoding='utf-8') as f:
+            f.write(expected)
+    return CompileJudge(os.path.join(tmp, 'out'), testcase_dir=os.path.join(tmp, 'testcases'), workers=2)
+
+
+def test_outcomes():
+    """按"第N关"序号找到测试用例，逐个用例判定结果"""
+    with tempfile.TemporaryDirectory() as tmp:
+        judge = make_judge(tmp)
+        problem = '第1关-求和-186949483'
+        correct, wrong, crash, broken = judge.judge_all([
+            {'problem_name': problem, 'code': code} for code in (CORRECT, WRONG, CRASH, BROKEN)
+        ])
+
+        assert (correct['passed'], correct['total']) == (2, 2)
+        assert format_judge_label(correct) == '2/2'
+        assert [case['status'] for case in wrong['cases']] == ['WA', 'WA']
+        assert '正确性建议约 0/50 分' in format_judge_summary(wrong)
+        assert [case['status'] for case in crash['cases']] == ['RE', 'RE']
+        assert not broken['compiled'] and broken['compile_error']
+        assert format_judge_label(broken) == '编译失败'
+
+
+def test_cache_by_code_hash():
+    """相同代码只编译测试一次，缓存保存后下次运行直接复用"""
+    with tempfile.TemporaryDirectory() as tmp:
+        judge = make_judge(tmp)
+        submissions = [{'problem_name': '第1关-求和', 'code': CORRECT}] * 3
+        results = judge.judge_all(submissions)
+        assert len(judge.cache) == 1 and judge.cached_hits == 2
+        assert results[0] is results[2]
+        judge.save()
+
+        again = CompileJudge(os.path.join(tmp, 'out'), testcase_dir=os.path.join(tmp, 'testcases'))
+        assert again.judge_all(submissions[:1])[0]['passed'] == 2
+        assert again.cached_hits == 1
+
+
+def test_problem_without_tests():
+    """没有测试用例的题目只检查能否编译"""
+    with tempfile.TemporaryDirectory() as tmp:
+        judge = make_judge(tmp)
+        result = judge.judge_all([{'problem_name': '第2关-求积', 'code': CORRECT}])[0]
+        assert result['compiled'] and result['total'] == 0
+        assert format_judge_label(result) == '编译通过'
+
+
+def test_environment_not_inherited():
+    """评价程序的环境变量（如 API 密钥）不传给学生程序"""
+    with tempfile.TemporaryDirectory() as tmp:
+        judge = make_judge(tmp)
+        os.environ['JUDGE_TEST_SECRET'] = 'sk-test'
+        try:
+            result = judge.judge_all([{'problem_name': '第1关-求和', 'code': LEAK}])[0]
+        finally:
+            del os.environ['JUDGE_TEST_SECRET']
+        assert (result['passed'], result['total']) == (2, 2)
+
+
+def _sandboxed_processes() -> list:
+    """仍在运行的学生程序（可执行文件位于 judge_ 临时目录中）"""
+    pids = []
+    for pid in filter(str.isdigit, os.listdir('/proc')):
+        try:
+            if f'{os.sep}judge_' in os.readlink(f'/proc/{pid}/exe'):
+                pids.append(pid)
+        except OSError:
+            continue
+    return pids
+
+
+@pytest.mark.skipif(not os.path.isdir('/proc'), reason="需要 /proc")
+def test_timeout_kills_forked_children():
+    """超时后整个进程组（包括fork出的子进程）都被杀死"""
+    with tempfile.TemporaryDirectory() as tmp:
+        judge = make_judge(tmp)
+        judge.time_limit = 0.5
+        result = judge.judge_all([{'problem_name': '第1关-求和', 'code': FORK_LOOP}])[0]
+        assert [case['status'] for case in result['cases']] == ['TLE', 'TLE']
+        # PID 命名空间中剩余的进程由内核异步回收
+        deadline = time.time() + 2
+        while _sandboxed_processes() and time.time() < deadline:
+            time.sleep(0.05)
+        assert _sandboxed_processes() == []
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+评价清单测试
+检查增量运行时按题目文件区分各题的代码哈希（同名题目互不覆盖）、没有变化的学生沿用结果、
+有失败题目时不记录，以及按ZIP签名查找
+
+用法:
+    python -m pytest test_manifest.py
+"""
+import os
+import sys
+import tempfile
+
+# 添加src路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from extractor import HomeworkExtractor, combine_sources
+from manifest import EvaluationManifest
+from problem_catalog import ProblemCatalog
+
+
+def make_problem(unit_path: str, code: str, problem_name: str = '代码文件') -> dict:
+    """构造 _read_student_problems 返回的一道题（只包含清单用到的字段）"""
+    return {'problem_name': problem_name, 'unit_path': unit_path, 'code': code}
+
+
+def make_rows(count: int, status: str = 'evaluated') -> list:
+    return [{'problem_name': f'题目{i}', 'score': 90, 'status': status} for i in range(count)]
+
+
+def test_same_problem_name_kept_apart():
+    """同名的两道题分别记录，只修改其中一道也会被检测到"""
+    with tempfile.TemporaryDirectory() as output_dir:
+        manifest = EvaluationManifest(output_dir, '02')
+        before = [make_problem('LOOSE/a.cpp', 'int main() { return 1; }'),
+                  make_problem('LOOSE/b.cpp', 'int main() { return 2; }')]
+        hashes = EvaluationManifest.problem_hashes(before)
+        assert len(hashes) == 2
+        manifest.record('001+张三', hashes, make_rows(2))
+
+        after = [make_problem('LOOSE/a.cpp', 'int main() { return 3; }'), before[1]]
+        changed = EvaluationManifest.problem_hashes(after)
+        assert manifest.lookup('001+张三', changed) is None
+        assert manifest.changes('001+张三', changed) == {'added': 0, 'changed': 1}
+
+
+def test_edit_one_loose_file_detected():
+    """学生文件夹中直接放置的多个文件，只修改一个时该学生需要重新评价"""
+    main = "int main() { return %d; }\n"
+    with tempfile.TemporaryDirectory() as root, tempfile.TemporaryDirectory() as output_dir:
+        student_dir = os.path.join(root, '001+张三', 'LOOSE')
+        os.makedirs(student_dir)
+        for name, value in (('a.cpp', 1), ('b.cpp', 2)):
+            with open(os.path.join(student_dir, name), 'w', encoding='utf-8') as f:
+                f.write(main % value)
+
+        extractor = HomeworkExtractor('unused.zip', root)
+        catalog = ProblemCatalog(output_dir, '02')
+
+        def read_problems():
+            students = extractor.get_all_students(root)
+            catalog.build(students)
+            return [make_problem(unit['unit_path'], combine_sources(extractor.read_problem_sources(unit)),
+                                 catalog.resolve(unit)['name'])
+                    for unit in students[0]['files']]
+
+        manifest = EvaluationManifest(output_dir, '02')
+        manifest.record('001+张三', EvaluationManifest.problem_hashes(read_problems()), make_rows(2))
+        assert manifest.lookup('001+张三', EvaluationManifest.problem_hashes(read_problems())) is not None
+
+        with open(os.path.join(student_dir, 'a.cpp'), 'w', encoding='utf-8') as f:
+            f.write(main % 42)
+        assert manifest.lookup('001+张三', EvaluationManifest.problem_hashes(read_problems())) is None
+
+
+def test_whitespace_change_carried():
+    """只有空白变化时沿用上次的结果"""
+    with tempfile.TemporaryDirectory() as output_dir:
+        manifest = EvaluationManifest(output_dir, '02')
+        rows = make_rows(1)
+        manifest.record('001+张三', EvaluationManifest.problem_hashes([make_problem('main.cpp', 'int a=1;')]), rows)
+        hashes = EvaluationManifest.problem_hashes([make_problem('main.cpp', 'int a = 1;\n')])
+        assert manifest.lookup('001+张三', hashes) == rows
+
+
+def test_failed_rows_not_recorded():
+    """有失败题目的学生不记录，下次运行重新评价"""
+    with tempfile.TemporaryDirectory() as output_dir:
+        manifest = EvaluationManifest(output_dir, '02')
+        hashes = EvaluationManifest.problem_hashes([make_problem('main.cpp', 'int a;')])
+        manifest.record('001+张三', hashes, make_rows(1, status='failed'))
+        assert manifest.lookup('001+张三', hashes) is None
+
+
+def test_unparsed_rows_not_recorded():
+    """没有解析出分数的题目（score 为 None）与失败的题目一样不记录，下次运行重新评价"""
+    with tempfile.TemporaryDirectory() as output_dir:
+        manifest = EvaluationManifest(output_dir, '02')
+        hashes = EvaluationManifest.problem_hashes([make_problem('a.cpp', 'int a;'), make_problem('b.cpp', 'int b;')])
+        rows = make_rows(2)
+        rows[1]['score'] = None
+        manifest.record('001+张三', hashes, rows)
+        assert manifest.lookup('001+张三', hashes) is None
+
+
+def test_signature_lookup_and_persistence():
+    """按ZIP签名查找，保存后重新加载仍然有效"""
+    with tempfile.TemporaryDirectory() as output_dir:
+        manifest = EvaluationManifest(output_dir, '02')
+        hashes = EvaluationManifest.problem_hashes([make_problem('main.cpp', 'int a;')])
+        manifest.record('001+张三', hashes, make_rows(1), signature='abc')
+        manifest.save()
+
+        reloaded = EvaluationManifest(output_dir, '02')
+        assert reloaded.lookup_signature('001+张三', 'abc') is not None
+        assert reloaded.lookup_signature('001+张三', 'def') is None
+        assert reloaded.lookup_signature('001+张三', None) is None
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+多个ZIP叠加测试
+检查补交ZIP整体覆盖前面ZIP中的同一学生、文件列表签名、只解压最终采用的文件，
+以及签名没有变化的学生不解压、不读取代码
+
+用法:
+    python -m pytest test_multi_zip.py
+"""
+import os
+import sys
+import tempfile
+import zipfile
+
+# 添加src路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from extractor import HomeworkExtractor
+
+
+MAIN = "int main() { return %d; }\n"
+
+
+def write_zip(path: str, files: dict):
+    """创建ZIP文件 {ZIP内路径: 内容}"""
+    with zipfile.ZipFile(path, 'w') as zip_ref:
+        for name, content in files.items():
+            zip_ref.writestr(name, content)
+
+
+def make_zips(tmp: str) -> tuple:
+    """主导出（张三、李四）和补交导出（李四重新提交、孙七补交）"""
+    main_zip = os.path.join(tmp, 'main.zip')
+    late_zip = os.path.join(tmp, 'late.zip')
+    write_zip(main_zip, {
+        '第02周/001+张三/代码文件/第1关-a-1/main.cpp': MAIN % 1,
+        '第02周/002+李四/代码文件/第1关-a-1/main.cpp': MAIN % 2,
+        '第02周/002+李四/代码文件/第2关-b-2/main.cpp': MAIN % 3,
+    })
+    write_zip(late_zip, {
+        '补交/002+李四/代码文件/第1关-a-1/main.cpp': MAIN % 20,
+        '补交/003+孙七/代码文件/第1关-a-1/main.cpp': MAIN % 4,
+    })
+    return main_zip, late_zip
+
+
+def test_later_zip_overrides_student():
+    """后面的ZIP中出现的学生整体覆盖前面的提交（李四的第2关不再保留）"""
+    with tempfile.TemporaryDirectory() as tmp:
+        main_zip, late_zip = make_zips(tmp)
+        extractor = HomeworkExtractor([main_zip, late_zip], os.path.join(tmp, 'out'))
+        index = extractor.build_index()
+        assert {key: entry['layer'] for key, entry in index.items()} == {'001+张三': 0, '002+李四': 1, '003+孙七': 1}
+
+        extractor.extract_zip()
+        students = {s['student_name']: s for s in extractor.get_all_students()}
+        assert students['李四']['file_count'] == 1
+        assert students['李四']['source_zip'] == late_zip
+        assert not os.path.exists(os.path.join(tmp, 'out', '第02周', '002+李四'))
+
+
+def test_signature_ignores_top_folder():
+    """内容相同的提交在不同导出中签名相同，内容变化时签名不同"""
+    with tempfile.TemporaryDirectory() as tmp:
+        a, b, c = (os.path.join(tmp, name) for name in ('a.zip', 'b.zip', 'c.zip'))
+        write_zip(a, {'第02周/001+张三/代码文件/第1关-a-1/main.cpp': MAIN % 1})
+        write_zip(b, {'补交/001+张三/代码文件/第1关-a-1/main.cpp': MAIN % 1})
+        write_zip(c, {'补交/001+张三/代码文件/第1关-a-1/main.cpp': MAIN % 9})
+        signatures = [HomeworkExtractor(path).build_index()['001+张三']['signature'] for path in (a, b, c)]
+        assert signatures[0] == signatures[1] != signatures[2]
+
+
+def test_skipped_students_not_extracted():
+    """签名没有变化的学生不解压，仍然出现在学生列表中（没有文件，标记为unchanged）"""
+    with tempfile.TemporaryDirectory() as tmp:
+        main_zip, late_zip = make_zips(tmp)
+        out = os.path.join(tmp, 'out')
+        extractor = HomeworkExtractor([main_zip, late_zip], out)
+        extractor.extract_zip(skip=lambda key, signature: key == '001+张三')
+
+        assert not os.path.exists(os.path.join(out, '第02周', '001+张三'))
+        students = {s['student_name']: s for s in extractor.get_all_students()}
+        assert students['张三']['unchanged'] and students['张三']['files'] == []
+        assert students['张三']['signature'] == extractor.index['001+张三']['signature']
+        assert students['孙七']['file_count'] == 1 and 'unchanged' not in students['孙七']
+
+
+def test_single_zip_skip():
+    """只有一个ZIP时同样跳过没有变化的学生"""
+    with tempfile.TemporaryDirectory() as tmp:
+        main_zip, _ = make_zips(tmp)
+        out = os.path.join(tmp, 'out')
+        extractor = HomeworkExtractor(main_zip, out)
+        extractor.extract_zip(skip=lambda key, signature: key == '002+李四')
+
+        assert os.path.exists(os.path.join(out, '第02周', '001+张三'))
+        assert not os.path.exists(os.path.join(out, '第02周', '002+李四'))
+        assert {s['student_name'] for s in extractor.get_all_students()} == {'张三', '李四'}
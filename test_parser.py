@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+评价结果解析器回归测试与性能基准
+使用 parser_corpus/ 中的模型回复样例（每个样例包含期望的分割方式、各题分数和内容），
+检查解析准确率，并可选地测量每秒解析次数，用于客观比较解析器的改动
+
+用法:
+    python test_parser.py                  # 回归测试
+    python test_parser.py --bench          # 回归测试 + 性能基准
+    python -m pytest test_parser.py        # 使用pytest运行
+"""
+import argparse
+import importlib
+import json
+import os
+import sys
+import time
+
+# 添加src路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'parser_corpus')
+
+DEFAULT_PARSER = 'evaluation_parser:parse_batch_evaluation'
+
+
+def load_parser(spec: str = DEFAULT_PARSER):
+    """
+    加载解析函数
+
+    Args:
+        spec: "模块:函数"，函数签名为 parse(text, problems) -> {'method', 'evaluations'}
+
+    Returns:
+        解析函数
+    """
+    module_name, func_name = spec.split(':')
+    return getattr(importlib.import_module(module_name), func_name)
+
+
+def load_corpus(corpus_dir: str = CORPUS_DIR) -> list:
+    """加载所有样例（按文件名排序）"""
+    corpus = []
+    for file_name in sorted(os.listdir(corpus_dir)):
+        if file_name.endswith('.json'):
+            with open(os.path.join(corpus_dir, file_name), 'r', encoding='utf-8') as f:
+                corpus.append(json.load(f))
+    return corpus
+
+
+def check_case(case: dict, parse) -> list:
+    """
+    解析一个样例并与期望结果比较
+
+    Args:
+        case: 样例
+        parse: 解析函数
+
+    Returns:
+        每道题的错误列表（与期望的题目一一对应，空列表表示该题正确）
+    """
+    problems = [{'problem_name': name} for name in case['problems']]
+    parsed = parse(case['reply'], problems)
+    evaluations = parsed['evaluations']
+    expected = case['expected']
+
+    errors = []
+    for idx, want in enumerate(expected['sections']):
+        problem_errors = []
+        if idx >= len(evaluations):
+            errors.append(['缺少该题的评价'])
+            continue
+        got = evaluations[idx]
+
+        if want.get('score') is not None and got['score'] != want['score']:
+            problem_errors.append(f"分数 {got['score']}，期望 {want['score']}")
+        if 'confidence' in want and abs(got.get('score_confidence', -1) - want['confidence']) > 1e-6:
+            problem_errors.append(f"置信度 {got.get('score_confidence')}，期望 {want['confidence']}")
+        if got['parsed'] != want['parsed']:
+            problem_errors.append(f"parsed={got['parsed']}，期望 {want['parsed']}")
+        if want.get('contains') and want['contains'] not in got['evaluation']:
+            problem_errors.append(f"评价中缺少 '{want['contains']}'")
+        if want.get('not_contains') and want['not_contains'] in got['evaluation']:
+            problem_errors.append(f"评价中不应包含 '{want['not_contains']}'")
+        errors.append(problem_errors)
+
+    if expected.get('method') and parsed.get('method') != expected['method'] and errors:
+        errors[0] = errors[0] + [f"分割方式 {parsed.get('method')}，期望 {expected['method']}"]
+    return errors
+
+
+def run_regression(parse, corpus: list, verbose: bool = True) -> float:
+    """
+    运行回归测试
+
+    Returns:
+        解析准确率（完全正确的题目数 / 题目总数）
+    """
+    total = correct = 0
+    for case in corpus:
+        errors = check_case(case, parse)
+        total += len(errors)
+        correct += sum(1 for e in errors if not e)
+        if verbose:
+            mark = '✓' if not any(errors) else '✗'
+            print(f"{mark} {case['name']}")
+            for idx, problem_errors in enumerate(errors, 1):
+                for error in problem_errors:
+                    print(f"     题目{idx}: {error}")
+
+    accuracy = correct / total if total else 0.0
+    if verbose:
+        print(f"\n解析准确率: {correct}/{total} ({accuracy * 100:.1f}%)")
+    return accuracy
+
+
+def make_long_reply(corpus: list, target_chars: int = 100_000) -> tuple:
+    """将标准格式样例重复拼接为一个长回复（模拟推理模型的超长输出）"""
+    base = next(case for case in corpus if case['name'] == 'standard_separator')
+    reply = base['reply'].strip()
+    copies = max(1, target_chars // len(reply))
+    problems = [{'problem_name': name} for _ in range(copies) for name in base['problems']]
+    return '\n\n===\n\n'.join([reply] * copies), problems
+
+
+def run_benchmark(parse, corpus: list, iterations: int = 200):
+    """测量每个样例及100KB长回复的解析速度"""
+    print(f"\n性能基准（每个样例 {iterations} 次）:")
+    print(f"{'样例':<30} {'字符数':>8} {'次/秒':>10}")
+    print("-" * 50)
+
+    total_time = 0.0
+    total_parses = 0
+    for case in corpus:
+        problems = [{'problem_name': name} for name in case['problems']]
+        start = time.perf_counter()
+        for _ in range(iterations):
+            parse(case['reply'], problems)
+        elapsed = time.perf_counter() - start
+        total_time += elapsed
+        total_parses += iterations
+        print(f"{case['name']:<30} {len(case['reply']):>8} {iterations / elapsed:>10.0f}")
+
+    print("-" * 50)
+    print(f"{'样例合计':<30} {'':>8} {total_parses / total_time:>10.0f}")
+
+    reply, problems = make_long_reply(corpus)
+    rounds = max(1, iterations // 20)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        parse(reply, problems)
+    elapsed = (time.perf_counter() - start) / rounds
+    print(f"\n长回复: {len(reply)} 字符，{len(problems)} 道题，每次 {elapsed * 1000:.1f} 毫秒 "
+          f"({len(reply) / elapsed / 1e6:.2f} M字符/秒)")
+
+
+def test_parser_corpus():
+    """pytest入口：所有样例必须完全解析正确"""
+    parse = load_parser()
+    for case in load_corpus():
+        errors = check_case(case, parse)
+        assert not any(errors), f"{case['name']}: {errors}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='评价结果解析器回归测试与性能基准')
+    parser.add_argument('--bench', action='store_true', help='同时运行性能基准')
+    parser.add_argument('--iterations', type=int, default=200, help='基准测试中每个样例的解析次数 (默认: 200)')
+    parser.add_argument('--parser', default=DEFAULT_PARSER,
+                        help=f'要测试的解析函数 "模块:函数" (默认: {DEFAULT_PARSER})')
+    args = parser.parse_args()
+
+    parse = load_parser(args.parser)
+    corpus = load_corpus()
+
+    print("=" * 60)
+    print(f"解析器回归测试 ({args.parser}，{len(corpus)} 个样例)")
+    print("=" * 60)
+    accuracy = run_regression(parse, corpus)
+
+    if args.bench:
+        run_benchmark(parse, corpus, args.iterations)
+
+    sys.exit(0 if accuracy == 1.0 else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+流水线测试
+检查任务按顺序经过所有阶段、出错的任务只交给记录失败的阶段、有界队列和多线程阶段的统计
+
+用法:
+    python -m pytest test_pipeline.py
+"""
+import os
+import sys
+import threading
+import time
+
+# 添加src路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from pipeline import Pipeline, Stage
+
+
+def test_jobs_pass_all_stages():
+    """每个任务依次经过所有阶段"""
+    done = []
+    stages = [
+        Stage('read', lambda job: dict(job, read=True)),
+        Stage('double', lambda job: dict(job, value=job['value'] * 2), workers=3),
+        Stage('persist', lambda job: done.append(job)),
+    ]
+    pipeline = Pipeline(stages, queue_size=2)
+    pipeline.run({'value': i} for i in range(10))
+
+    assert sorted(job['value'] for job in done) == [i * 2 for i in range(10)]
+    assert all(job['read'] for job in done)
+    assert [s['processed'] for s in pipeline.summary()] == [10, 10, 10]
+    assert all(s['max_depth'] <= 2 for s in pipeline.summary())
+
+
+def test_errors_skip_to_handling_stage():
+    """出错的任务跳过后续普通阶段，只交给 handle_errors 阶段"""
+    seen = []
+    failed = []
+
+    def fail_odd(job):
+        if job['value'] % 2:
+            raise ValueError('odd')
+        return job
+
+    stages = [
+        Stage('check', fail_odd),
+        Stage('evaluate', lambda job: seen.append(job['value'])),
+        Stage('persist', lambda job: failed.append(job['error_stage']) if job.get('error') else None,
+              handle_errors=True),
+    ]
+    pipeline = Pipeline(stages)
+    pipeline.run({'value': i} for i in range(6))
+
+    assert sorted(seen) == [0, 2, 4]
+    assert failed == ['check'] * 3
+    assert pipeline.summary()[0]['errors'] == 3
+
+
+def test_stage_workers_run_concurrently():
+    """多个工作线程的阶段同时处理多个任务"""
+    state = {'current': 0, 'peak': 0}
+    lock = threading.Lock()
+
+    def slow(job):
+        with lock:
+            state['current'] += 1
+            state['peak'] = max(state['peak'], state['current'])
+        time.sleep(0.05)
+        with lock:
+            state['current'] -= 1
+        return job
+
+    Pipeline([Stage('llm', slow, workers=4)], queue_size=4).run({'n': i} for i in range(8))
+    assert state['peak'] == 4
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+评价计划测试
+检查 --dry-run 使用的费用估算、并发与限速下的总耗时模拟和时长格式
+
+用法:
+    python -m pytest test_planner.py
+"""
+import os
+import sys
+
+# 添加src路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from planner import estimate_costs, simulate_wall_time, format_duration, PROVIDER_PRICING
+
+
+def test_costs_per_provider():
+    """每个提供商按百万token单价计算费用"""
+    costs = estimate_costs(2_000_000, 500_000)
+    assert [c['provider'] for c in costs] == list(PROVIDER_PRICING)
+    for cost in costs:
+        pricing = PROVIDER_PRICING[cost['provider']]
+        assert abs(cost['cost'] - (2 * pricing['input'] + 0.5 * pricing['output'])) < 1e-9
+    assert all(c['cost'] == 0 for c in estimate_costs(0, 0))
+
+
+def test_wall_time_workers():
+    """并发数越大总耗时越短，不会短于最长的单个请求"""
+    latencies = [10, 8, 6, 4, 2]
+    assert simulate_wall_time(latencies, 1) == 30
+    assert simulate_wall_time(latencies, 2) == 16
+    assert simulate_wall_time(latencies, 10) == 10
+    assert simulate_wall_time([], 4) == 0.0
+
+
+def test_wall_time_rate_limit():
+    """每分钟请求数限制使请求按间隔依次发起"""
+    # 每分钟6次：第n个请求最早在 10n 秒发起
+    assert simulate_wall_time([1, 1, 1], 10, rate_limit=6) == 21
+
+
+def test_format_duration():
+    assert format_duration(59.6) == "1分0秒"
+    assert format_duration(3725) == "1时2分5秒"
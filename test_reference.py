@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+参考答案差异测试
+检查按题目名称和"第N关"序号匹配参考答案、只有注释和空白差异的代码视为相同，
+以及差异过大时不使用差异提示词
+
+用法:
+    python -m pytest test_reference.py
+"""
+import os
+import sys
+import tempfile
+
+# 添加src路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from reference import ReferenceSolutions
+
+
+REFERENCE = """#include <iostream>
+using namespace std;
+
+int main() {
+    int n;
+    cin >> n;
+    int a = n / 100;
+    int b = n / 10 % 10;
+    int c = n % 10;
+    cout << a << " " << b << " " << c << endl;
+    return 0;
+}
+"""
+
+
+def _write_references(root):
+    """在临时目录中写入一道题的参考答案"""
+    with open(os.path.join(root, '第1关-求三位数.cpp'), 'w', encoding='utf-8') as f:
+        f.write(REFERENCE)
+
+
+def test_comment_and_whitespace_only_changes():
+    """只有注释和空白不同的代码与参考答案相同"""
+    with tempfile.TemporaryDirectory() as root:
+        _write_references(root)
+        references = ReferenceSolutions(root)
+        code = REFERENCE.replace('int a = n / 100;', 'int a=n/100;  // 百位')
+        result = references.diff('第1关-求三位数', code)
+        assert result['reference'] == '第1关-求三位数.cpp'
+        assert result['similarity'] == 1.0
+        assert result['diff'] == '（与参考答案相同）'
+
+
+def test_small_change_sends_diff():
+    """按"第N关"序号匹配参考答案，差异只包含修改的行和上下文"""
+    with tempfile.TemporaryDirectory() as root:
+        _write_references(root)
+        references = ReferenceSolutions(root, max_ratio=1.0, context=1)
+        code = REFERENCE.replace('int c = n % 10;', 'int c = n - a * 100 - b * 10;')
+        result = references.diff('第1关-求三位数-186949483', code)
+        assert result is not None
+        assert '- int c = n % 10;' in result['diff'].replace('    ', '')
+        assert '+ int c = n - a * 100 - b * 10;' in result['diff'].replace('    ', '')
+        assert 'cin >> n;' not in result['diff']
+
+
+def test_unrelated_code_or_missing_reference():
+    """差异过大或没有参考答案时返回None（发送完整代码）"""
+    with tempfile.TemporaryDirectory() as root:
+        _write_references(root)
+        references = ReferenceSolutions(root)
+        unrelated = "#include <cstdio>\nint main() {\n    printf(\"hello\\n\");\n}\n"
+        assert references.diff('第1关-求三位数', unrelated) is None
+        assert references.diff('第2关-求和', REFERENCE) is None
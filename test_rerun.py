@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+选择性重新评价测试
+检查 --only-students / --only-problems / --only-status 的选择、未选中的题目沿用上次的评价，
+以及重新评价的学生在上次的结果中原地替换
+
+用法:
+    python -m pytest test_rerun.py
+"""
+import json
+import os
+import sys
+import tempfile
+
+# 添加src路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from extractor import HomeworkExtractor
+from main import HomeworkEvaluationSystem
+
+
+MAIN = "int main() { return %d; }\n"
+UNIT_1 = os.path.join('代码文件', '第1关-a-1', 'main.cpp')
+UNIT_2 = os.path.join('代码文件', '第2关-b-2', 'main.cpp')
+
+
+def make_row(student_id: str, name: str, problem: str, score=85, status='evaluated') -> dict:
+    return {'student_id': student_id, 'student_name': name, 'problem_name': problem,
+            'evaluation': f'{name} {problem} 的评价', 'score': score, 'status': status}
+
+
+PREVIOUS_ROWS = [
+    make_row('001', '张三', '第1关-a'),
+    make_row('001', '张三', '第2关-b', score=None, status='failed'),
+    make_row('002', '李四', '第1关-a'),
+    make_row('002', '李四', '第2关-b'),
+]
+
+
+def setup_system(tmp: str, **filters) -> tuple:
+    """创建两个学生的提交和上次的JSON结果，返回 (评价系统, 已提交的学生列表)"""
+    root = os.path.join(tmp, 'hw')
+    for student in ('001+张三', '002+李四'):
+        for idx, problem in enumerate(('第1关-a-1', '第2关-b-2'), 1):
+            folder = os.path.join(root, student, '代码文件', problem)
+            os.makedirs(folder)
+            with open(os.path.join(folder, 'main.cpp'), 'w', encoding='utf-8') as f:
+                f.write(MAIN % idx)
+
+    output_dir = os.path.join(tmp, 'out')
+    os.makedirs(output_dir)
+    with open(os.path.join(output_dir, '第02周_评价结果_20260101_000000.json'), 'w', encoding='utf-8') as f:
+        json.dump(PREVIOUS_ROWS, f, ensure_ascii=False)
+
+    system = HomeworkEvaluationSystem('unused.zip', output_dir=output_dir, dry_run=True, triage=False, **filters)
+    system.extractor = HomeworkExtractor('unused.zip', root)
+    students = system.extractor.get_all_students(root)
+    system.catalog.build(students)
+    return system, students
+
+
+def test_only_problems_selects_matching_problem():
+    """--only-problems 按"第N关"匹配，所有学生只重新评价该题"""
+    with tempfile.TemporaryDirectory() as tmp:
+        system, students = setup_system(tmp, only_problems=['第2关'])
+        path, rows = system._select_rerun(students)
+        assert path.endswith('第02周_评价结果_20260101_000000.json') and len(rows) == 4
+        assert system._rerun_selection == {'001+张三': {UNIT_2}, '002+李四': {UNIT_2}}
+
+
+def test_only_status_failed_with_student_filter():
+    """--only-status failed 只选上次失败的题目；--only-students 按学号或姓名筛选"""
+    with tempfile.TemporaryDirectory() as tmp:
+        system, students = setup_system(tmp, only_status='failed')
+        system._select_rerun(students)
+        assert system._rerun_selection == {'001+张三': {UNIT_2}}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        system, students = setup_system(tmp, only_students=['002'])
+        system._select_rerun(students)
+        assert system._rerun_selection == {'002+李四': {UNIT_1, UNIT_2}}
+
+
+def test_unselected_problems_reuse_previous():
+    """未选中的题目沿用上次的评价，选中的题目需要重新评价"""
+    with tempfile.TemporaryDirectory() as tmp:
+        system, students = setup_system(tmp, only_problems=['第2关'])
+        system._select_rerun(students)
+        zhangsan = next(s for s in students if s['student_name'] == '张三')
+        problems = system._read_student_problems(zhangsan)
+        previous = system._lookup_previous('张三', '001', problems)
+        assert list(previous) == [0]
+        assert previous[0]['previous'] and previous[0]['evaluation'] == '张三 第1关-a 的评价'
+
+
+def test_merge_keeps_order():
+    """重新评价的学生在原位置替换，新出现的学生追加在末尾"""
+    new_rows = {
+        '001+张三': [make_row('001', '张三', '第1关-a', score=95), make_row('001', '张三', '第2关-b', score=90)],
+        '003+王五': [make_row('003', '王五', '第1关-a')],
+    }
+    merged = HomeworkEvaluationSystem._merge_rerun_rows(PREVIOUS_ROWS, new_rows)
+    assert [(r['student_name'], r['score']) for r in merged] == [
+        ('张三', 95), ('张三', 90), ('李四', 85), ('李四', 85), ('王五', 85)
+    ]
+
+
+def test_failed_student_rows_keep_problem_id():
+    """读取失败的学生记录为失败时，结果行仍带有题目编号（供之后按题目重新评价）"""
+    with tempfile.TemporaryDirectory() as tmp:
+        system, students = setup_system(tmp)
+        system._persisted = {}
+        system._stage_persist({'student': students[0], 'order': 0, 'precomputed': None,
+                               'error': RuntimeError('读取失败')})
+        rows = system._persisted[0][0]
+        assert [row['status'] for row in rows] == ['failed', 'failed']
+        assert [row['problem_id'] for row in rows] == [system.catalog.resolve(f)['id'] for f in students[0]['files']]
+        assert None not in [row['problem_id'] for row in rows]
+
+
+def test_problems_with_same_name_keyed_by_path():
+    """两道题对应同一个题目名称时，按题目文件路径分别对应上次的结果行"""
+    with tempfile.TemporaryDirectory() as tmp:
+        system, students = setup_system(tmp, only_status='failed')
+        folder = os.path.join(tmp, 'hw', '001+张三', '代码文件', '第2关-b-9')
+        os.makedirs(folder)
+        with open(os.path.join(folder, 'main.cpp'), 'w', encoding='utf-8') as f:
+            f.write(MAIN % 9)
+        unit_9 = os.path.join('代码文件', '第2关-b-9', 'main.cpp')
+        students = system.extractor.get_all_students(os.path.join(tmp, 'hw'))
+        system.catalog.build(students)
+        zhangsan = next(s for s in students if s['student_name'] == '张三')
+        problems = system._read_student_problems(zhangsan)
+        assert [p['problem_name'] for p in problems if p['unit_path'] in (UNIT_2, unit_9)] == ['第2关-b', '第2关-b']
+
+        rows = [dict(make_row('001', '张三', '第1关-a'), unit_path=UNIT_1),
+                dict(make_row('001', '张三', '第2关-b', score=None, status='failed'), unit_path=UNIT_2),
+                dict(make_row('001', '张三', '第2关-b', score=70), unit_path=unit_9)]
+        with open(os.path.join(system.output_dir, '第02周_评价结果_20260102_000000.json'), 'w', encoding='utf-8') as f:
+            json.dump(rows, f, ensure_ascii=False)
+
+        system._select_rerun([zhangsan])
+        assert system._rerun_selection == {'001+张三': {UNIT_2}}
+        previous = system._lookup_previous('张三', '001', problems)
+        assert sorted(previous[idx]['score'] for idx in previous) == [70, 85]
+        assert all(problems[idx]['unit_path'] != UNIT_2 for idx in previous)
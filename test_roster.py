@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+学生名单测试
+检查CSV名单的加载（有无表头、GBK编码）、按学号/姓名匹配学生文件夹，
+以及扫描时标记名单中有但压缩包中没有的学生
+
+用法:
+    python -m pytest test_roster.py
+"""
+import os
+import sys
+import tempfile
+import zipfile
+
+# 添加src路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from extractor import HomeworkExtractor
+from roster import Roster
+
+
+def write_roster(directory: str, text: str, encoding: str = 'utf-8') -> str:
+    path = os.path.join(directory, 'roster.csv')
+    with open(path, 'w', encoding=encoding, newline='') as f:
+        f.write(text)
+    return path
+
+
+def test_load_with_header():
+    """按表头取列（列顺序任意），跳过空行"""
+    with tempfile.TemporaryDirectory() as tmp:
+        roster = Roster(write_roster(tmp, "姓名,学号\n张三,2024001\n\n李四,2024002\n"))
+        assert [s['student_id'] for s in roster.students] == ['2024001', '2024002']
+        assert roster.by_id['2024002']['student_name'] == '李四'
+
+
+def test_load_without_header_gbk():
+    """没有表头时第一列为学号、第二列为姓名；支持GBK编码"""
+    with tempfile.TemporaryDirectory() as tmp:
+        roster = Roster(write_roster(tmp, "2024001,张三\r\n2024002,李四\r\n", encoding='gbk'))
+        assert roster.by_id['2024001']['student_name'] == '张三'
+        assert len(roster.students) == 2
+
+
+def test_match_folder_names():
+    """按"学号+姓名"中的学号、名称中的数字串或唯一的姓名匹配"""
+    with tempfile.TemporaryDirectory() as tmp:
+        roster = Roster(write_roster(tmp, "学号,姓名\n2024001,张三\n2024002,李四\n2024003,李四\n"))
+        assert roster.match('2024001+张三改名')['student_name'] == '张三'
+        assert roster.match('2024002_李四')['student_id'] == '2024002'
+        assert roster.match('张三')['student_id'] == '2024001'
+        assert roster.match('9999+张三')['student_id'] == '2024001'
+        # 重名的学生不能只按姓名匹配
+        assert roster.match('李四') is None
+        assert roster.match('王五') is None
+
+
+def test_scan_marks_missing_students():
+    """扫描时按名单识别不含"+"的文件夹，名单中没有文件夹的学生标记为 missing"""
+    with tempfile.TemporaryDirectory() as tmp:
+        roster = Roster(write_roster(tmp, "学号,姓名\n2024001,张三\n2024002,李四\n"))
+        root = os.path.join(tmp, 'hw')
+        folder = os.path.join(root, '第02周', '2024001_张三', '第1关-a-1')
+        os.makedirs(folder)
+        with open(os.path.join(folder, 'main.cpp'), 'w', encoding='utf-8') as f:
+            f.write("int main() { return 0; }\n")
+
+        students = {s['student_name']: s for s in HomeworkExtractor('unused.zip', root).get_all_students(roster=roster)}
+        assert students['张三']['has_submission'] and students['张三']['student_id'] == '2024001'
+        assert students['李四']['missing'] and not students['李四']['has_submission']
+
+
+def test_zip_students_from_file_list():
+    """解压ZIP后按文件列表确定学生（不遍历目录树），不在名单中的"学号+姓名"文件夹单独列出"""
+    with tempfile.TemporaryDirectory() as tmp:
+        roster = Roster(write_roster(tmp, "学号,姓名\n2024001,张三\n2024002,李四\n2024003,王五\n"))
+        zip_path = os.path.join(tmp, 'hw.zip')
+        with zipfile.ZipFile(zip_path, 'w') as zip_ref:
+            zip_ref.writestr('第02周/2024001_张三/第1关-a-1/main.cpp', "int main() { return 0; }\n")
+            zip_ref.writestr('第02周/2024002+李四/readme.txt', "没有代码\n")
+            zip_ref.writestr('第02周/9999+赵六/第1关-a-1/main.cpp', "int main() { return 1; }\n")
+            zip_ref.writestr('第02周/说明/要求.txt', "作业要求\n")
+
+        extractor = HomeworkExtractor(zip_path, os.path.join(tmp, 'out'))
+        extractor.extract_zip(roster=roster)
+        extractor._scan_student_folders = None  # 不应再遍历目录树
+        students = {s['student_name']: s for s in extractor.get_all_students(roster=roster)}
+
+        assert sorted(students) == ['张三', '李四', '王五', '赵六']
+        assert students['张三']['file_count'] == 1 and students['张三']['student_id'] == '2024001'
+        assert not students['李四']['has_submission'] and 'missing' not in students['李四']
+        assert students['王五']['missing']
+        assert students['赵六']['has_submission'] and students['赵六']['student_id'] == '9999'
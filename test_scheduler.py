@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+评价调度测试
+检查耗时模型按历史记录拟合、按学生修正，以及最长任务优先调度和小任务快速通道；
+评价系统不预先读取代码，按ZIP文件列表判断完全相同的提交
+
+用法:
+    python -m pytest test_scheduler.py
+"""
+import os
+import sys
+import tempfile
+import threading
+import zipfile
+
+# 添加src路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from extractor import HomeworkExtractor
+from main import HomeworkEvaluationSystem
+from scheduler import LatencyModel, plan_schedule, simulate
+
+
+def test_default_model_without_history():
+    """没有历史记录时按默认处理速度估算，提示词和题目越多耗时越长"""
+    model = LatencyModel()
+    student = {'student_name': '张三', 'student_id': '001'}
+    assert model.history_size == 0
+    assert model.predict(student, 2000, 1) == LatencyModel.base_estimate(2000, 1)
+    assert model.predict(student, 4000, 3) > model.predict(student, 2000, 1)
+
+
+def test_model_fits_history_and_student_factor():
+    """按历史记录拟合整体速度；一贯较慢的学生得到更大的修正系数"""
+    history = []
+    for tokens, problems in ((1000, 1), (3000, 2), (6000, 4)):
+        for student_id, name, slowdown in (('001', '张三', 1.0), ('002', '李四', 1.5)):
+            seconds = 2 * LatencyModel.base_estimate(tokens, problems) * slowdown
+            history.append({'student_name': name, 'student_id': student_id, 'prompt_tokens': tokens,
+                            'num_problems': problems, 'llm_seconds': seconds})
+    history.append({'student_name': '王五', 'student_id': '003', 'prompt_tokens': 1000,
+                    'num_problems': 1, 'llm_seconds': 999, 'status': 'failed'})
+
+    model = LatencyModel(history)
+    assert model.history_size == 6
+    fast = model.predict({'student_name': '张三', 'student_id': '001'}, 3000, 2)
+    slow = model.predict({'student_name': '李四', 'student_id': '002'}, 3000, 2)
+    unknown = model.predict({'student_name': '赵六', 'student_id': '004'}, 3000, 2)
+    assert fast < unknown < slow
+    assert model.student_factors['002+李四'] <= LatencyModel.MAX_FACTOR
+
+
+def test_lpt_balances_workers():
+    """最长任务优先：大任务先开始，预计完成时间接近最优"""
+    costs = [10, 9, 8, 2, 2, 1]
+    plan = plan_schedule(costs, workers=2, fast_lane_ratio=0)
+    assert plan['order'][:2] == [0, 1]
+    assert sorted(plan['order']) == list(range(len(costs)))
+    assert plan['projected_makespan'] == 17  # 最优解 {10, 2, 2, 1} / {9, 8}
+    assert plan['fast_lane'] == 0
+
+
+def test_fast_lane_for_small_jobs():
+    """小任务放入快速通道，尽早完成，且不明显延长预计完成时间"""
+    costs = [30, 28, 25, 1, 1, 1, 1]
+    plan = plan_schedule(costs, workers=4)
+    assert plan['fast_lane'] == 4
+    assert plan['projected_makespan'] == 30
+    # 小任务在模拟中从0时刻开始，领取顺序中排在大任务之间而不是最后
+    assert plan['order'].index(3) < len(costs) - 1
+
+
+def test_single_worker_and_empty():
+    """单个并发时按耗时从大到小顺序执行；没有任务时返回空计划"""
+    plan = plan_schedule([1, 5, 3], workers=1)
+    assert plan['order'] == [1, 2, 0]
+    assert plan['projected_makespan'] == 9
+    assert plan_schedule([], workers=4)['order'] == []
+    assert simulate([], []) == 0.0
+
+
+def make_zip_system(tmp: str, files: dict) -> tuple:
+    """解压 {ZIP内路径: 内容} 并创建评价系统，返回 (评价系统, 已提交的学生列表)"""
+    zip_path = os.path.join(tmp, 'hw.zip')
+    with zipfile.ZipFile(zip_path, 'w') as zip_ref:
+        for name, content in files.items():
+            zip_ref.writestr(name, content)
+    system = HomeworkEvaluationSystem(zip_path, output_dir=os.path.join(tmp, 'out'), dry_run=True, triage=False)
+    system.extractor = HomeworkExtractor(zip_path, os.path.join(tmp, 'extracted'))
+    system.extractor.extract_zip()
+    students = [s for s in system.extractor.get_all_students() if s['has_submission']]
+    system.catalog.build(students)
+    return system, students
+
+
+def test_schedule_defers_identical_zip_submissions():
+    """不读取代码：所有文件都与之前的学生完全相同（ZIP中的CRC和大小）的学生放到最后"""
+    main = "int main() { return %d; }\n"
+    with tempfile.TemporaryDirectory() as tmp:
+        system, students = make_zip_system(tmp, {
+            '第02周/001+张三/代码文件/第1关-a-1/main.cpp': main % 1,
+            '第02周/001+张三/代码文件/第2关-b-2/main.cpp': main % 2,
+            '第02周/002+李四/代码文件/第1关-a-1/main.cpp': main % 1,
+            '第02周/003+王五/代码文件/第1关-a-1/main.cpp': main % 3,
+        })
+        order, costs = system._schedule_students(students, {})
+        names = [students[idx]['student_name'] for idx in order]
+        assert names[-1] == '李四' and costs[order[-1]] == 0.0
+        assert system.schedule_stats['deferred'] == 1
+        assert system._problem_cache == {}
+
+
+def test_deferred_students_wait_for_claims():
+    """排在最后的无需调用模型的学生，等前面的学生都登记了要评价的内容后才送入流水线"""
+    with tempfile.TemporaryDirectory() as tmp:
+        system = HomeworkEvaluationSystem('unused.zip', output_dir=tmp, dry_run=True, triage=False)
+        students = [{'student_name': name, 'student_id': ''} for name in ('张三', '李四', '王五')]
+        jobs = system._pipeline_jobs(students, [0, 1, 2], {}, {}, False, deferred=1)
+        first, second = next(jobs), next(jobs)
+
+        received = []
+        thread = threading.Thread(target=lambda: received.append(next(jobs)))
+        thread.start()
+        thread.join(0.2)
+        assert thread.is_alive()
+
+        system._mark_claimed(first)
+        system._mark_claimed(second)
+        thread.join(2)
+        assert [job['student']['student_name'] for job in received] == ['王五']
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+近似重复检测测试
+检查C++分词（标识符归一化）、MinHash相似度估算、LSH分带候选、近似重复聚类（代表为最先处理的提交），
+以及跨周的SQLite相似度索引
+
+用法:
+    python -m pytest test_similarity.py
+"""
+import os
+import sys
+import tempfile
+
+# 添加src路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from similarity import tokenize_cpp, MinHasher, LSHIndex, estimate_similarity, cluster_near_duplicates
+from similarity_index import SimilarityIndex
+
+
+SUM = """#include <iostream>
+using namespace std;
+int main() {
+    int n, total = 0;
+    cin >> n;
+    for (int i = 1; i <= n; i++) {
+        total += i;
+    }
+    cout << total << endl;
+    return 0;
+}
+"""
+
+# 只改了变量名和注释
+SUM_RENAMED = SUM.replace('total', 's').replace('int main', '// 求和\nint main')
+
+SORT = """#include <algorithm>
+#include <vector>
+int main() {
+    std::vector<int> v(10);
+    for (auto &x : v) std::cin >> x;
+    std::sort(v.begin(), v.end());
+    for (size_t k = 0; k < v.size(); ++k) printf("%d ", v[k]);
+}
+"""
+
+
+def test_tokenize_ignores_identifier_names():
+    """变量名不同、注释不同的代码分词结果相同"""
+    assert tokenize_cpp(SUM) == tokenize_cpp(SUM_RENAMED)
+
+
+def test_minhash_similarity():
+    """相同代码相似度为1，无关代码相似度很低"""
+    hasher = MinHasher()
+    same = estimate_similarity(hasher.code_signature(SUM), hasher.code_signature(SUM_RENAMED))
+    different = estimate_similarity(hasher.code_signature(SUM), hasher.code_signature(SORT))
+    assert same == 1.0
+    assert different < 0.5
+
+
+def test_lsh_candidates():
+    """相同签名落入同一桶，成为彼此的候选"""
+    hasher = MinHasher()
+    index = LSHIndex(bands=16, rows=4)
+    assert index.add('a', hasher.code_signature(SUM)) == set()
+    assert index.add('b', hasher.code_signature(SUM_RENAMED)) == {'a'}
+    assert 'a' not in index.add('c', hasher.code_signature(SORT))
+
+
+def test_cluster_representative_first():
+    """每个簇按处理顺序排列，第一个提交作为代表；不相似的提交不成簇"""
+    codes = {'张三': SORT, '李四': SUM, '王五': SUM_RENAMED, '赵六': SUM + "\n"}
+    clusters = cluster_near_duplicates(codes)
+    assert clusters == [['李四', '王五', '赵六']]
+
+
+def test_cluster_threshold():
+    """阈值为1时只有完全相同（分词后）的代码成簇"""
+    modified = SUM.replace('total += i;', 'total += i * i;\n        total -= 1;')
+    assert cluster_near_duplicates({'a': SUM, 'b': modified}, threshold=1.0) == []
+
+
+def test_similarity_index_across_weeks():
+    """历史提交持久化到SQLite，按题目查询相似提交并排除查询者本人；相同提交只记录一次"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'similarity.db')
+        index = SimilarityIndex(db_path)
+        first = index.add('第1关', '01', '001', '张三', SUM)
+        assert index.add('第1关', '01', '001', '张三', SUM + "\n") == first
+        index.add('第1关', '01', '002', '李四', SORT)
+        index.add('第2关', '01', '003', '王五', SUM)
+        index.close()
+
+        index = SimilarityIndex(db_path)
+        assert index.count() == 3
+        matches = index.query('第1关', SUM_RENAMED, min_similarity=0.8)
+        assert [(m['student_name'], m['week']) for m in matches] == [('张三', '01')]
+        assert index.query('第1关', SUM_RENAMED, exclude_student=('001', '张三'), min_similarity=0.8) == []
+        index.close()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Token估算与分片测试
+检查token估算、按提示词/输出预算切分学生的题目（默认不按输出预算拆分），以及小学生的合并装箱
+
+用法:
+    python -m pytest test_token_estimator.py
+"""
+import os
+import sys
+
+# 添加src路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from token_estimator import (
+    estimate_tokens, estimate_output_tokens, split_into_shards, pack_into_bins, OUTPUT_TOKENS_PER_PROBLEM
+)
+
+
+def test_estimate_tokens():
+    """中文约1字符1个token，其他字符约3字符1个token"""
+    assert estimate_tokens('') == 0
+    assert estimate_tokens('评价代码') == 4
+    assert estimate_tokens('int a = 1;') == 3
+
+
+def test_no_split_within_budget():
+    """预算足够时不拆分（6道题、不限制输出预算时只有一个分片）"""
+    items = list(range(6))
+    shards = split_into_shards(items, [100] * 6, 1000, 24000, 0)
+    assert shards == [items]
+
+
+def test_split_by_prompt_budget():
+    """提示词超出预算时按原顺序切分为连续分片"""
+    shards = split_into_shards(list('abcde'), [400] * 5, 1000, 2000, 0)
+    assert shards == [['a', 'b'], ['c', 'd'], ['e']]
+
+
+def test_split_by_output_budget():
+    """设置了输出预算时，预估输出超出预算才拆分"""
+    budget = OUTPUT_TOKENS_PER_PROBLEM * 3
+    assert estimate_output_tokens(3) <= budget < estimate_output_tokens(4)
+    shards = split_into_shards(list(range(7)), [10] * 7, 1000, 0, budget)
+    assert [len(shard) for shard in shards] == [3, 3, 1]
+
+
+def test_oversized_item_is_own_shard():
+    """单项本身超出预算时单独成为一个分片"""
+    shards = split_into_shards(['small', 'huge', 'small2'], [100, 5000, 100], 1000, 2000, 0)
+    assert shards == [['small'], ['huge'], ['small2']]
+
+
+def test_default_output_budget_disabled():
+    """评价系统默认不按输出预算拆分（只在超出模型实际的输出上限时拆分）"""
+    import inspect
+    from main import HomeworkEvaluationSystem
+    default = inspect.signature(HomeworkEvaluationSystem.__init__).parameters['max_output_tokens'].default
+    assert default == 0
+
+
+def test_pack_within_budget():
+    """装箱不超过提示词预算和每箱条目数，箱内保持原始顺序"""
+    items = ['a', 'b', 'c', 'd', 'e']
+    bins = pack_into_bins(items, [300, 500, 200, 400, 100], [1] * 5, 500, 1500, 0, max_items_per_bin=3)
+    assert sorted(item for bin_ in bins for item in bin_) == items
+    for bin_ in bins:
+        assert len(bin_) <= 3
+        assert 500 + sum({'a': 300, 'b': 500, 'c': 200, 'd': 400, 'e': 100}[i] for i in bin_) <= 1500
+        assert bin_ == sorted(bin_)
+
+
+def test_pack_respects_output_budget():
+    """设置了输出预算时，题目数之和超出预算的条目不放入同一箱"""
+    budget = OUTPUT_TOKENS_PER_PROBLEM * 4
+    bins = pack_into_bins(['a', 'b', 'c'], [10, 10, 10], [3, 2, 1], 0, 0, budget)
+    assert sorted(map(sorted, bins)) == [['a', 'c'], ['b']]
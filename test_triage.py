@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+提交快速判定测试
+检查空文件、非代码内容、未修改的起始模板和只有空main函数的提交被规则判定，正常代码交给模型评价
+
+用法:
+    python -m pytest test_triage.py
+"""
+import os
+import sys
+import tempfile
+
+# 添加src路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from triage import SubmissionTriage, strip_comments
+
+
+TEMPLATE = """#include <iostream>
+using namespace std;
+int main() {
+    /********** Begin **********/
+
+    /********** End **********/
+    return 0;
+}
+"""
+
+SOLUTION = TEMPLATE.replace("\n\n    /****", "\n    int a, b; cin >> a >> b; cout << a + b;\n    /****")
+
+
+def test_empty_and_non_code():
+    triage = SubmissionTriage()
+    assert triage.classify('第1关', '') == 'empty'
+    assert triage.classify('第1关', '  \n\t') == 'empty'
+    assert triage.classify('第1关', '我不会做这道题') == 'non_code'
+    assert triage.classify('第1关', 'abc\x00def') == 'non_code'
+
+
+def test_untouched_answer_region():
+    """Begin/End 之间没有代码的提交判定为模板"""
+    triage = SubmissionTriage()
+    assert triage.classify('第1关', TEMPLATE) == 'template'
+    assert triage.classify('第1关', SOLUTION) is None
+
+
+def test_empty_region_with_solution_outside():
+    """Begin/End 之间为空、但在区域以外写了完整程序的提交仍交给模型评价"""
+    outside = TEMPLATE.replace("    return 0;", "    int n;\n    cin >> n;\n    cout << n * (n + 1) / 2 << endl;\n    return 0;")
+    triage = SubmissionTriage()
+    assert triage.classify('第1关', outside) is None
+
+    with tempfile.TemporaryDirectory() as template_dir:
+        with open(os.path.join(template_dir, '第1关.cpp'), 'w', encoding='utf-8') as f:
+            f.write(TEMPLATE)
+        triage = SubmissionTriage(template_dir)
+        assert triage.classify('第1关', outside) is None
+        assert triage.classify('第1关', TEMPLATE.replace('    ', '\t')) == 'template'
+
+
+def test_template_dir_match():
+    """与起始模板只有空白和注释差异的提交判定为模板"""
+    template = "#include <cstdio>\nint main() {\n    // 在这里写代码\n    printf(\"%d\\n\", 0);\n    return 0;\n}\n"
+    with tempfile.TemporaryDirectory() as template_dir:
+        with open(os.path.join(template_dir, '第1关-输出.cpp'), 'w', encoding='utf-8') as f:
+            f.write(template)
+        triage = SubmissionTriage(template_dir)
+        assert triage.classify('第1关-输出', template.replace('    ', '\t') + '// 没改\n') == 'template'
+        assert triage.classify('第1关-输出', template.replace('0);', '42);')) is None
+
+
+def test_trivial_main():
+    """只有头文件和空main函数的提交判定为没有实际代码"""
+    triage = SubmissionTriage()
+    assert triage.classify('第1关', "#include <iostream>\nusing namespace std;\nint main() {\n    return 0;\n}\n") == 'trivial'
+    assert triage.classify('第1关', "#include <iostream>\n") == 'trivial'
+
+
+def test_evaluation_format():
+    """规则评价包含分数和判定类别"""
+    data = SubmissionTriage.evaluation('第1关-输出', 'empty')
+    assert data['score'] == 0 and data['triage'] == 'empty' and data['parsed']
+    assert '**分数**: 0/100' in data['evaluation']
+
+
+def test_strip_comments_keeps_strings_apart():
+    """字符串中的 // 不被当作注释"""
+    assert strip_comments('printf("http://x"); // 注释').rstrip() == 'printf("");'